@@ -1,5 +1,13 @@
 from app.api.debug import router as debug_router
+from app.api.metrics import router as metrics_router
+from app.api.reports import router as reports_router
+from app.api.snapshots import router as snapshots_router
+from app.api.trimmer import router as trimmer_router
 
 
 def register_routers(app):
     app.include_router(debug_router)
+    app.include_router(trimmer_router)
+    app.include_router(snapshots_router)
+    app.include_router(reports_router)
+    app.include_router(metrics_router)
@@ -0,0 +1,51 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.custom.metrics import CONTENT_TYPE, render_metrics
+from app.services.digipos.parser_service import (
+    get_delta_state_stats,
+    get_flight_stats,
+    get_offload_stats,
+    get_page_cache_stats,
+    get_quota_cache_stats,
+    get_refresher_stats,
+    get_result_cache_stats,
+    get_snapshot_stats,
+    get_upstream_stats,
+)
+from app.services.member.member_reports import REPORTS
+
+router = APIRouter(tags=["metrics"])
+
+
+def collect_gauges() -> dict[str, float]:
+    """Current cache and offload state, read at scrape time."""
+    gauges: dict[str, float] = {}
+    for prefix, stats in (
+        ("result_cache", get_result_cache_stats()),
+        ("quota_cache", get_quota_cache_stats()),
+        ("page_cache", get_page_cache_stats()),
+        ("delta_state", get_delta_state_stats()),
+        ("snapshots", get_snapshot_stats()),
+        ("upstream", get_upstream_stats()),
+        ("refresher", get_refresher_stats()),
+        ("offload", get_offload_stats()),
+        ("reports", REPORTS.stats()),
+    ):
+        for key, value in stats.items():
+            gauges[f"{prefix}_{key}"] = float(value)
+    for name, stats in get_flight_stats().items():
+        gauges[f"singleflight_{name}_in_flight"] = float(stats["in_flight"])
+    return gauges
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    """Expose metrics in Prometheus text format.
+
+    Returns:
+        PlainTextResponse: Counters, histograms and gauges.
+    """
+    return PlainTextResponse(
+        render_metrics(gauges=collect_gauges()), media_type=CONTENT_TYPE
+    )
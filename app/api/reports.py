@@ -0,0 +1,56 @@
+import json
+from typing import Any
+
+from fastapi import APIRouter, Depends, Request
+
+from app.config import get_all_settings
+from app.custom.exceptions import MemberForbiddenError, MemberGenericError
+from app.dependencies import get_client_ip
+from app.services.member.member_reports import REPORTS
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+
+@router.post("/{member}", status_code=202)
+async def queue_report(
+    member: str,
+    request: Request,
+    client_ip: str = Depends(get_client_ip),
+) -> dict[str, Any]:
+    """Queue a report for batched delivery to a member's ``report_url``.
+
+    Only the member's own address, or an address of the admin
+    ``ip_whitelist``, may queue reports for it.
+
+    Args:
+        member (str): Member name.
+        request (Request): The current request object, a JSON report.
+        client_ip (str): Client address.
+
+    Returns:
+        dict: The member and its number of queued reports.
+    """
+    if not REPORTS.allows(member, client_ip) and (
+        client_ip not in get_all_settings().admin.ip_whitelist
+    ):
+        raise MemberForbiddenError(context={"member": member, "client_ip": client_ip})
+    try:
+        report = json.loads(await request.body())
+    except json.JSONDecodeError as e:
+        raise MemberGenericError(
+            message="Invalid report payload.",
+            context={"member": member, "detail": str(e)},
+            cause=e,
+        ) from e
+    queued = await REPORTS.submit(member, report)
+    return {"member": member, "queued": queued}
+
+
+@router.get("")
+def get_report_stats() -> dict[str, dict[str, int | float]]:
+    """Delivery counters and latency of each member.
+
+    Returns:
+        dict: Stats by member name.
+    """
+    return REPORTS.member_stats()
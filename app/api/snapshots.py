@@ -0,0 +1,105 @@
+import json
+from typing import Any
+
+from fastapi import APIRouter, Request
+
+from app.custom.exceptions import (
+    ParserCategoryNotFoundError,
+    ParserInvalidPayloadError,
+)
+from app.services.digipos.factory_parser import ProcessorFactory
+from app.services.digipos.parser_service import (
+    get_snapshot,
+    ingest_catalog_async,
+    list_snapshots,
+    refresh_catalog_async,
+)
+from app.services.digipos.product import Product
+
+router = APIRouter(prefix="/snapshots", tags=["snapshots"])
+
+
+def check_category(category: str) -> None:
+    """Raise ``ParserCategoryNotFoundError`` for unsupported categories."""
+    if category.upper() not in ProcessorFactory.get_supported_categories():
+        raise ParserCategoryNotFoundError(
+            message=f"Unsupported category: {category}",
+            context={"category": category},
+        )
+
+
+@router.post("/{category}", status_code=201)
+async def ingest_snapshot(category: str, request: Request) -> dict[str, Any]:
+    """Parse a raw upstream Digipos catalog into a new snapshot.
+
+    Args:
+        category (str): Category type (DATA, VOICE_SMS, VF, etc.).
+        request (Request): The current request object.
+
+    Returns:
+        dict: The stored snapshot's metadata.
+    """
+    check_category(category)
+    body = await request.body()
+    try:
+        snapshot = await ingest_catalog_async(category, body)
+    except ValueError as e:
+        raise ParserInvalidPayloadError(
+            context={"category": category, "detail": str(e)}, cause=e
+        ) from e
+    return snapshot.info()
+
+
+@router.post("/{category}/refresh", status_code=201)
+async def refresh_snapshot(category: str, account: str | None = None) -> dict[str, Any]:
+    """Fetch a category's catalog upstream into a new snapshot.
+
+    Args:
+        category (str): Category type (DATA, VOICE_SMS, VF, etc.).
+        account (str | None): ``[[digipos]]`` username (default: scheduled).
+
+    Returns:
+        dict: The stored snapshot's metadata.
+    """
+    check_category(category)
+    try:
+        snapshot = await refresh_catalog_async(category, account)
+    except ValueError as e:
+        raise ParserInvalidPayloadError(
+            context={"category": category, "detail": str(e)}, cause=e
+        ) from e
+    return snapshot.info()
+
+
+@router.get("/{category}")
+def get_snapshots(category: str) -> list[dict[str, Any]]:
+    """List the kept snapshots of a category, newest first.
+
+    Args:
+        category (str): Category type (DATA, VOICE_SMS, VF, etc.).
+
+    Returns:
+        list: Snapshot metadata.
+    """
+    check_category(category)
+    return [snapshot.info() for snapshot in list_snapshots(category)]
+
+
+@router.get("/{category}/{version}")
+def get_snapshot_catalog(category: str, version: str) -> dict[str, Any]:
+    """Get a snapshot with its normalized catalog, for replay and debugging.
+
+    Args:
+        category (str): Category type (DATA, VOICE_SMS, VF, etc.).
+        version (str): Snapshot version.
+
+    Returns:
+        dict: Snapshot metadata, product fields and product rows.
+    """
+    check_category(category)
+    snapshot = get_snapshot(category, version)
+    return {
+        **snapshot.info(),
+        "fields": list(Product.__slots__),
+        "products": json.loads(snapshot.encoded()),
+    }
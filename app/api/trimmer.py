@@ -0,0 +1,234 @@
+from collections.abc import AsyncIterator
+
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+from app.custom.exceptions import (
+    MemberForbiddenError,
+    ParserCategoryNotFoundError,
+    ParserGenericError,
+    ParserInvalidPayloadError,
+)
+from app.custom.metrics import UNKNOWN_MEMBER, is_member_address, member_for
+from app.dependencies import get_client_ip
+from app.services.digipos.delta import Delta
+from app.services.digipos.factory_parser import ProcessorFactory
+from app.services.digipos.pagination import Page
+from app.services.digipos.parser_service import (
+    delta_category_response_async,
+    fetch_and_trim_async,
+    get_page,
+    paginate_category_response_async,
+    process_category_response_async,
+    process_snapshot_async,
+    serve_category_async,
+    stream_category_response,
+)
+
+router = APIRouter(prefix="/trim", tags=["trimmer"])
+
+
+def page_response(page: Page) -> PlainTextResponse:
+    """Page text, with its position and the next cursor in headers."""
+    headers = {"X-Page": str(page.number), "X-Page-Count": str(page.count)}
+    if page.next_cursor is not None:
+        headers["X-Next-Cursor"] = page.next_cursor
+    return PlainTextResponse(page.text, headers=headers)
+
+
+def delta_member(member: str | None, client_ip: str) -> str:
+    """Member whose delta state a request uses.
+
+    An explicit ``member`` must be configured with the client's address;
+    without one the address identifies the member (an unconfigured address
+    is its own member).
+
+    Raises:
+        MemberForbiddenError: If ``member`` is not configured at ``client_ip``
+    """
+    if member is not None:
+        if not is_member_address(member, client_ip):
+            raise MemberForbiddenError(
+                context={"member": member, "client_ip": client_ip}
+            )
+        return member
+    name = member_for(client_ip)
+    return client_ip if name == UNKNOWN_MEMBER else name
+
+
+def delta_response(delta: Delta) -> PlainTextResponse:
+    """Delta text, with its kind and product counts in headers."""
+    return PlainTextResponse(
+        delta.text,
+        headers={
+            "X-Delta": "full" if delta.full else "delta",
+            "X-Delta-Added": str(delta.added),
+            "X-Delta-Changed": str(delta.changed),
+            "X-Delta-Removed": str(delta.removed),
+        },
+    )
+
+
+async def stream_trim(category: str, request: Request) -> StreamingResponse:
+    """Trim the request body as it arrives into a streamed response.
+
+    The first output is awaited before responding, so a body that is not
+    JSON at all still gets a 400 instead of a cut-off stream.
+    """
+    size = request.headers.get("content-length")
+    parts = stream_category_response(
+        category, request.stream(), int(size) if size and size.isdigit() else None
+    )
+    try:
+        first = await anext(parts, "")
+    except ValueError as e:
+        raise ParserInvalidPayloadError(
+            context={"category": category, "detail": str(e)}, cause=e
+        ) from e
+
+    async def body() -> AsyncIterator[str]:
+        yield first
+        async for part in parts:
+            yield part
+
+    return StreamingResponse(body(), media_type="text/plain")
+
+
+@router.get("/pages/{cursor}", response_class=PlainTextResponse)
+def trim_page(cursor: str) -> PlainTextResponse:
+    """Get the next page of a paginated trim.
+
+    Args:
+        cursor (str): ``X-Next-Cursor`` of the previous page.
+
+    Returns:
+        PlainTextResponse: The page text.
+    """
+    return page_response(get_page(cursor))
+
+
+@router.get("/{category}", response_class=PlainTextResponse)
+async def trim_snapshot(
+    category: str,
+    version: str | None = None,
+    refresh: bool = False,
+    account: str | None = None,
+    destination: str | None = None,
+) -> PlainTextResponse:
+    """Trim the latest stored catalog snapshot of a category.
+
+    Serves trims without an upstream payload in the request; catalogs are
+    stored with ``POST /snapshots/{category}`` or fetched upstream. A stale
+    snapshot is served as is while the category is refreshed in the
+    background; only a missing or expired one waits for upstream. With
+    ``refresh`` the
+    catalog is fetched upstream and trimmed instead; concurrent identical
+    refreshes share one fetch and one trim.
+
+    Args:
+        category (str): Category type (DATA, VOICE_SMS, VF, etc.).
+        version (str | None): Replay this snapshot version instead.
+        refresh (bool): Fetch the catalog upstream and trim it.
+        account (str | None): With ``refresh``, the ``[[digipos]]`` account.
+        destination (str | None): With ``refresh``, the destination number.
+
+    Returns:
+        PlainTextResponse: The trimmed text.
+    """
+    if category.upper() not in ProcessorFactory.get_supported_categories():
+        raise ParserCategoryNotFoundError(
+            message=f"Unsupported category: {category}",
+            context={"category": category},
+        )
+    if version is not None:
+        return PlainTextResponse(await process_snapshot_async(category, version))
+    try:
+        if refresh:
+            result = await fetch_and_trim_async(category, account, destination)
+        else:
+            result = await serve_category_async(category)
+    except ValueError as e:
+        raise ParserInvalidPayloadError(
+            context={"category": category, "detail": str(e)}, cause=e
+        ) from e
+    return PlainTextResponse(result)
+
+
+@router.post("/{category}", response_class=PlainTextResponse)
+async def trim_category(
+    category: str,
+    request: Request,
+    paginate: bool = False,
+    delta: bool = False,
+    resync: bool = False,
+    stream: bool = False,
+    member: str | None = None,
+    client_ip: str = Depends(get_client_ip),
+) -> Response:
+    """Trim a raw upstream Digipos response for the given category.
+
+    The request body is read as bytes and handed to the parser as-is (no
+    JSON body model, no ``str`` decode), so the only copy between the
+    socket and ``json.loads`` is the body buffer itself.
+
+    With ``paginate`` the output is cut between products into pages of at
+    most ``max_responses`` characters; page 1 is returned, and the
+    ``X-Next-Cursor`` header (absent on the last page) fetches the next
+    one from ``/trim/pages/{cursor}``.
+
+    With ``delta`` only products added or changed since this member's last
+    delta of the category are sent, then ``#id|-`` for removed ones; the
+    first delta, or one with ``resync``, sends the whole catalog. Members
+    sharing an address (behind one NAT) pass ``member`` to keep their own
+    delta state.
+
+    With ``stream`` the body is trimmed as it arrives and the output is
+    streamed back, so memory stays flat for very large catalogs; quotas are
+    then fully optimized whenever the payload exceeds the budget, instead
+    of only as far as the budget needs.
+
+    Args:
+        category (str): Category type (DATA, VOICE_SMS, VF, etc.).
+        request (Request): The current request object.
+        paginate (bool): Return the output page by page.
+        delta (bool): Return only the changes since the last delta.
+        resync (bool): With ``delta``, send the full catalog.
+        stream (bool): Stream the output while reading the body.
+        member (str | None): With ``delta``, the member name (default: the
+            member configured at the client address).
+        client_ip (str): Client address, identifying the member.
+
+    Returns:
+        Response: The trimmed text, its first page, or its stream.
+    """
+    if category.upper() not in ProcessorFactory.get_supported_categories():
+        raise ParserCategoryNotFoundError(
+            message=f"Unsupported category: {category}",
+            context={"category": category},
+        )
+
+    if paginate + delta + stream > 1:
+        raise ParserGenericError(
+            message="paginate, delta and stream cannot be combined",
+            context={"category": category},
+        )
+    if stream:
+        return await stream_trim(category, request)
+
+    body = await request.body()
+    try:
+        if delta:
+            return delta_response(
+                await delta_category_response_async(
+                    delta_member(member, client_ip), category, body, resync=resync
+                )
+            )
+        if paginate:
+            return page_response(await paginate_category_response_async(category, body))
+        result = await process_category_response_async(category, body)
+    except ValueError as e:
+        raise ParserInvalidPayloadError(
+            context={"category": category, "detail": str(e)}, cause=e
+        ) from e
+
+    return PlainTextResponse(result)
@@ -1,4 +1,5 @@
 from app.config.config import get_all_settings
 from app.config.resolver import generate_default_config_file
+from app.config.watcher import ConfigWatcher
 
-__all__ = ["get_all_settings", "generate_default_config_file"]
+__all__ = ["ConfigWatcher", "get_all_settings", "generate_default_config_file"]
@@ -1,6 +1,7 @@
 # ruff: noqa = ARG003
 from functools import lru_cache
 import pathlib
+from typing import Literal
 from loguru import logger
 from pydantic import BaseModel, field_validator
 from pydantic_settings import (
@@ -35,6 +36,9 @@ class ApplicationSettings(BaseModel):
     debug: bool = False
     log_level: str = "info"
     log_file: str = ".logs/app.log"
+    # in-memory timings/counters for hot paths, and share of calls logged
+    instrumentation: bool = True
+    instrumentation_sample_rate: float = 0.0
 
 
 class AdminSettings(BaseModel):
@@ -50,6 +54,32 @@ class DigiposSettings(BaseModel):
     base_url: str
     time_out: int
     retries: int
+    # keep-alive connection pool of this account's upstream client
+    max_connections: int = 10
+    max_keepalive_connections: int = 5
+    keepalive_expiry: float = 30.0
+    # share of the scheduled upstream calls, and calls per second allowed
+    weight: float = 1.0
+    rate_limit: float = 10.0
+    burst: int = 10
+
+    @field_validator("weight", "rate_limit")
+    def validate_positive(cls, v, info):
+        if v <= 0:
+            raise ValueError(f"{info.field_name} must be greater than 0")
+        return v
+
+
+class UpstreamSettings(BaseModel):
+    # per account: open after this many failed/slow calls in a row, then
+    # let one probe through after the cooldown (seconds)
+    breaker_failures: int = 5
+    breaker_cooldown: float = 10.0
+    # duplicate a slow call to a second account after this latency
+    # percentile, at most for hedge_budget of the calls
+    hedge: bool = False
+    hedge_percentile: float = 95.0
+    hedge_budget: float = 0.1
 
 
 class MemberSettings(BaseModel):
@@ -60,8 +90,60 @@ class MemberSettings(BaseModel):
     rate_limiter: str = "5/seconds"
 
 
+class ReportSettings(BaseModel):
+    # reports to a member's report_url are sent in batches of what arrives
+    # within batch_window seconds (at most batch_size)
+    batch_window: float = 0.05
+    batch_size: int = 100
+    # per member; a full queue makes producers wait up to enqueue_timeout
+    queue_size: int = 1000
+    enqueue_timeout: float = 1.0
+    retries: int = 3
+    time_out: float = 5.0
+    # keep-alive connections per member host
+    max_connections: int = 4
+
+
+class ParserExclusionSettings(BaseModel):
+    subcategories: list[str] = []
+    productnames: list[str] = []
+    quota_metadata: list[str] = []
+
+    @field_validator("subcategories", "productnames", "quota_metadata", mode="before")
+    def coerce_numbers(cls, v):
+        # TOML numbers (e.g. a subcategory named 2024) match as text
+        if isinstance(v, list):
+            return [
+                str(item)
+                if isinstance(item, int | float) and not isinstance(item, bool)
+                else item
+                for item in v
+            ]
+        return v
+
+
 class DigiposParserSettings(BaseModel):
     max_responses: int
+    offload_threshold: int = 256_000
+    offload_workers: int = 2
+    offload_max_pending: int = 8
+    # vectorized filtering for large catalogs (needs the numpy extra)
+    columnar: bool = False
+    # parsed catalogs kept per category, compressed with zlib or lzma
+    snapshot_versions: int = 5
+    snapshot_compression: Literal["zlib", "lzma"] = "zlib"
+    # snapshots are stale after snapshot_ttl and refreshed in the background
+    # (ahead of time for categories requested refresh_hot_rate times a
+    # minute); past snapshot_max_age a request waits for upstream
+    snapshot_ttl: float = 300.0
+    snapshot_max_age: float = 3600.0
+    refresh_hot_rate: float = 6.0
+    refresh_jitter: float = 0.1
+    # None keeps the built-in quota rules
+    units: dict[str, str] | None = None
+    abbreviations: dict[str, str] | None = None
+    # keyed by processor type (recharge, activation)
+    exclude: dict[str, ParserExclusionSettings] = {}
 
 
 class TomlSettings(BaseSettings):
@@ -71,7 +153,9 @@ class TomlSettings(BaseSettings):
     application: ApplicationSettings
     admin: AdminSettings
     digipos: list[DigiposSettings] = []
+    upstream: UpstreamSettings = UpstreamSettings()
     members: list[MemberSettings] = []
+    reports: ReportSettings = ReportSettings()
     parser: dict[str, DigiposParserSettings] = {}
 
     @field_validator("digipos", mode="before")
@@ -27,6 +27,9 @@ app_rate_limit = "10/seconds"
 debug = "False"
 log_level = "info"
 log_file = ".logs/app.log"
+# timing/counter di memory untuk hot path, sample_rate = porsi call yang di log (0 - 1)
+instrumentation = true
+instrumentation_sample_rate = 0.0
 
 
 # jika members ada lebih dari satu, tambahkan array of table [[members]]
@@ -38,6 +41,18 @@ rate_limiter = ""
 is_allowed = ""
 description = ""
 
+[reports]
+# laporan ke report_url member di kirim per batch (yang masuk dalam batch_window detik)
+batch_window = 0.05
+batch_size = 100
+# antrian per member, kalau penuh request menunggu maksimal enqueue_timeout detik
+queue_size = 1000
+enqueue_timeout = 1.0
+retries = 3
+time_out = 5.0
+# koneksi keep-alive per host member
+max_connections = 4
+
 # jika akun digipos ada lebih dari satu, tambahkan array of table
 [[digipos]]
 url = ""
@@ -45,10 +60,67 @@ username = ""
 password = ""
 retries = ""
 time_out = ""
+# koneksi keep-alive ke base_url, dipakai ulang antar request
+max_connections = 10
+max_keepalive_connections = 5
+keepalive_expiry = 30
+# porsi pembagian request antar akun, dan batas request per detik akun ini
+weight = 1.0
+rate_limit = 10.0
+burst = 10
+
+[upstream]
+# circuit breaker per akun: buka setelah sekian gagal/lambat berturut-turut,
+# lalu coba satu request lagi setelah cooldown (detik)
+breaker_failures = 5
+breaker_cooldown = 10.0
+# hedging: kirim duplikat ke akun lain kalau request lebih lambat dari
+# persentil latency ini, maksimal hedge_budget (0 - 1) dari semua request
+hedge = false
+hedge_percentile = 95.0
+hedge_budget = 0.1
 
 [parser.digipos]
 # setup untuk parsing data response dari api digipos
 max_response = 7000
+# payload besar (byte) di proses di process pool, bukan di worker api
+offload_threshold = 256000
+offload_workers = 2
+offload_max_pending = 8
+# filter katalog besar per kolom pakai numpy (pip install mkit-trimmer[columnar])
+columnar = false
+# katalog hasil parsing yang disimpan per kategori (zlib cepat, lzma lebih kecil)
+snapshot_versions = 5
+snapshot_compression = "zlib"
+# snapshot basi setelah snapshot_ttl (detik) dan di refresh di background,
+# kategori yang di request >= refresh_hot_rate kali per menit di refresh sebelum basi;
+# lewat snapshot_max_age request menunggu upstream
+snapshot_ttl = 300
+snapshot_max_age = 3600
+refresh_hot_rate = 6.0
+refresh_jitter = 0.1
+
+[parser.digipos.units]
+# angka + satuan di quota, contoh: "30 Days" -> "30D"
+Days = "D"
+GB = "GB"
+MB = "MB"
+
+[parser.digipos.abbreviations]
+# singkatan kata di quota, contoh: "Internet" -> "Net"
+Internet = "Net"
+Nasional = "Nas"
+
+# exclusion per tipe processor, perubahan file ini di reload otomatis
+[parser.digipos.exclude.recharge]
+subcategories = []
+productnames = []
+quota_metadata = ["Music RBT/NSP"]
+
+[parser.digipos.exclude.activation]
+subcategories = []
+productnames = []
+quota_metadata = []
 """
     CONFIG_FILE.write_text(default_config)
     loguru.logger.info(f"Generated default config file at {CONFIG_FILE}")
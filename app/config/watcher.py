@@ -0,0 +1,96 @@
+"""Reload config.toml when it changes on disk.
+
+``ConfigWatcher`` watches the config file with watchdog and, once writes
+have settled, loads it into a fresh ``TomlSettings`` on the observer's own
+thread and hands it to ``on_change``. A file that fails to load or validate
+is logged and ignored, so the running configuration stays in effect.
+"""
+
+import os
+import pathlib
+from collections.abc import Callable
+from threading import Lock, Timer
+
+from loguru import logger
+from watchdog.events import FileSystemEvent, FileSystemEventHandler
+from watchdog.observers import Observer
+
+from app.config.config import CONFIG_FILE, TomlSettings, get_all_settings
+
+# Editors often write a file in several steps; wait for them to finish
+RELOAD_DELAY = 0.5  # seconds
+
+
+class ConfigWatcher(FileSystemEventHandler):
+    """Calls ``on_change`` with the new settings whenever the config changes."""
+
+    def __init__(
+        self,
+        on_change: Callable[[TomlSettings], None],
+        config_file: pathlib.Path = CONFIG_FILE,
+        loader: Callable[[], TomlSettings] = TomlSettings,
+        delay: float = RELOAD_DELAY,
+    ):
+        self.on_change = on_change
+        self.config_file = config_file.resolve()
+        self.loader = loader
+        self.delay = delay
+        self._observer = None
+        self._timer: Timer | None = None
+        self._lock = Lock()
+
+    def start(self) -> None:
+        """Start watching (the directory, so atomic renames are seen too)."""
+        if self._observer is not None:
+            return
+        self._observer = Observer()
+        self._observer.schedule(self, str(self.config_file.parent), recursive=False)
+        self._observer.daemon = True
+        self._observer.start()
+        logger.info(f"Watching {self.config_file} for changes")
+
+    def stop(self) -> None:
+        """Stop watching and drop a pending reload."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        observer, self._observer = self._observer, None
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+    def on_any_event(self, event: FileSystemEvent) -> None:
+        """Schedule a reload if the event touched the config file."""
+        if event.is_directory or event.event_type not in {
+            "created",
+            "modified",
+            "moved",
+        }:
+            return
+        paths = {os.fsdecode(event.src_path), os.fsdecode(event.dest_path or "")}
+        if str(self.config_file) not in paths:
+            return
+
+        # Restart the delay on every event so a burst causes one reload
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = Timer(self.delay, self.reload)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def reload(self) -> None:
+        """Load the config and pass it to ``on_change`` (errors are logged)."""
+        try:
+            settings = self.loader()
+        except Exception:
+            logger.exception("Config reload failed, keeping current settings")
+            return
+
+        get_all_settings.cache_clear()
+        logger.info("Config file changed, applying new settings")
+        try:
+            self.on_change(settings)
+        except Exception:
+            logger.exception("Applying reloaded config failed")
@@ -42,6 +42,20 @@ class MemberNotFoundError(MemberGenericError):
     status_code: int = 404
 
 
+class MemberForbiddenError(MemberGenericError):
+    """Exception raised when a client may not act for a member."""
+
+    default_message: str = "Member access denied."
+    status_code: int = 403
+
+
+class MemberReportQueueFullError(MemberGenericError):
+    """Exception raised when a member's report queue stays full."""
+
+    default_message: str = "Member report queue is full."
+    status_code: int = 503
+
+
 class TargetAPIGenericError(AppExceptionError):
     """Base exception for target API-related errors."""
 
@@ -61,3 +75,80 @@ class TargetAPINotFoundError(TargetAPIGenericError):
 
     default_message: str = "Target API not found."
     status_code: int = 404
+
+
+class ParserGenericError(AppExceptionError):
+    """Base exception for response parser errors."""
+
+    default_message: str = "A parser error occurred."
+    status_code: int = 400
+
+
+class ParserBusyError(ParserGenericError):
+    """Exception raised when the parser cannot accept more large payloads."""
+
+    default_message: str = "Parser is busy, try again later."
+    status_code: int = 503
+
+
+class ParserCategoryNotFoundError(ParserGenericError):
+    """Exception raised when a category has no processor."""
+
+    default_message: str = "Category not supported."
+    status_code: int = 404
+
+
+class ParserCursorNotFoundError(ParserGenericError):
+    """Exception raised when a page cursor is invalid or has expired."""
+
+    default_message: str = "Page cursor is invalid or has expired."
+    status_code: int = 404
+
+
+class ParserSnapshotNotFoundError(ParserGenericError):
+    """Exception raised when a category has no such catalog snapshot."""
+
+    default_message: str = "Catalog snapshot not found."
+    status_code: int = 404
+
+
+class ParserInvalidPayloadError(ParserGenericError):
+    """Exception raised when an upstream payload is not a valid JSON object."""
+
+    default_message: str = "Invalid upstream payload."
+    status_code: int = 400
+
+
+class UpstreamGenericError(AppExceptionError):
+    """Exception raised when an upstream Digipos request fails."""
+
+    default_message: str = "Upstream request failed."
+    status_code: int = 502
+
+
+class UpstreamTimeoutError(UpstreamGenericError):
+    """Exception raised when an upstream Digipos request times out."""
+
+    default_message: str = "Upstream request timed out."
+    status_code: int = 504
+
+
+class UpstreamNotConfiguredError(UpstreamGenericError):
+    """Exception raised when no matching [[digipos]] account is configured."""
+
+    default_message: str = "Upstream account not configured."
+    status_code: int = 404
+
+
+class UpstreamBusyError(UpstreamGenericError):
+    """Exception raised when every upstream account is at its rate limit."""
+
+    default_message: str = "Upstream accounts are busy."
+    status_code: int = 503
+
+
+class UpstreamCircuitOpenError(UpstreamGenericError):
+    """Exception raised when the circuit of every eligible account is open."""
+
+    default_message: str = "Upstream circuit open."
+    status_code: int = 503
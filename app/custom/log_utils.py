@@ -2,10 +2,16 @@
 
 # decorator for calculating execution time of functions
 import functools
+import inspect
+from bisect import bisect_left
 from collections.abc import Callable
+from contextlib import nullcontext
 from functools import wraps
+from math import inf
+from random import random
+from threading import Lock
 from time import perf_counter
-from typing import TypeVar
+from typing import Any, TypeVar
 
 from loguru import logger
 
@@ -46,3 +52,285 @@ def logger_wraps(*, entry=True, exit=True, level="DEBUG"):
         return wrapped
 
     return wrapper
+
+
+# Hot-path instrumentation: timings go to in-memory histograms, not log lines
+
+# Histogram bucket upper bounds, in seconds (a final +Inf bucket is implied)
+TIMING_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Histogram:
+    """Cumulative-friendly timing histogram (count, sum, max, buckets)."""
+
+    __slots__ = ("bounds", "buckets", "count", "max", "total")
+
+    def __init__(self, bounds: tuple[float, ...] = TIMING_BUCKETS):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "Histogram") -> None:
+        """Add the observations of ``other`` (same bounds)."""
+        for i, count in enumerate(other.buckets):
+            self.buckets[i] += count
+        self.count += other.count
+        self.total += other.total
+        if other.max > self.max:
+            self.max = other.max
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "avg": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "buckets": dict(zip((*self.bounds, inf), self.buckets, strict=True)),
+        }
+
+
+# Metric labels as ((name, value), ...); keep them few and low-cardinality
+Labels = tuple[tuple[str, str], ...]
+
+
+def format_labels(name: str, labels: Labels) -> str:
+    """Render ``name{key="value",...}`` (just ``name`` without labels)."""
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class _Timer:
+    """Context manager recording the elapsed time of its block."""
+
+    __slots__ = ("instrumentation", "labels", "name", "start")
+
+    def __init__(self, instrumentation: "Instrumentation", name: str, labels: Labels):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self) -> None:
+        self.start = perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self.instrumentation.observe(
+            self.name, perf_counter() - self.start, self.labels
+        )
+
+
+class Instrumentation:
+    """In-memory counters and timing histograms.
+
+    Recording is two dict lookups and a few additions under one short lock
+    hold, with no string formatting. Metrics are keyed by name, then by a
+    labels tuple, so recording with constant labels allocates nothing.
+    When ``enabled`` is False every call returns immediately. A
+    ``sample_rate`` share of timed calls is also logged at DEBUG, with lazy
+    formatting so nothing is formatted unless a sink accepts it.
+    """
+
+    def __init__(self, enabled: bool = True, sample_rate: float = 0.0):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.counters: dict[str, dict[Labels, int]] = {}
+        self.timings: dict[str, dict[Labels, Histogram]] = {}
+        self._lock = Lock()
+
+    def configure(
+        self, enabled: bool | None = None, sample_rate: float | None = None
+    ) -> None:
+        """Change settings at runtime (None leaves a setting unchanged)."""
+        if enabled is not None:
+            self.enabled = enabled
+        if sample_rate is not None:
+            self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+
+    def incr(self, name: str, value: int = 1, labels: Labels = ()) -> None:
+        """Add ``value`` to counter ``name``."""
+        if not self.enabled:
+            return
+        with self._lock:
+            series = self.counters.get(name)
+            if series is None:
+                series = self.counters[name] = {}
+            series[labels] = series.get(labels, 0) + value
+
+    def observe(self, name: str, seconds: float, labels: Labels = ()) -> None:
+        """Record one duration in histogram ``name``."""
+        if not self.enabled:
+            return
+        with self._lock:
+            series = self.timings.get(name)
+            if series is None:
+                series = self.timings[name] = {}
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram()
+            histogram.observe(seconds)
+        if self.sampled():
+            logger.opt(lazy=True).debug(
+                "{} took {}",
+                lambda: format_labels(name, labels),
+                lambda: f"{seconds:.4f}s",
+            )
+
+    def sampled(self) -> bool:
+        """True for a ``sample_rate`` share of calls (gates per-call logs)."""
+        return self.sample_rate > 0.0 and random() < self.sample_rate
+
+    def timer(self, name: str, labels: Labels = ()) -> _Timer | nullcontext:
+        """Context manager timing its block into histogram ``name``."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def collect(
+        self,
+    ) -> tuple[list[tuple[str, Labels, int]], list[tuple[str, Labels, Histogram]]]:
+        """Return copies of every counter and histogram, for exporters."""
+        with self._lock:
+            counters = [
+                (name, labels, value)
+                for name, series in self.counters.items()
+                for labels, value in series.items()
+            ]
+            timings = []
+            for name, series in self.timings.items():
+                for labels, histogram in series.items():
+                    copy = Histogram(histogram.bounds)
+                    copy.buckets = list(histogram.buckets)
+                    copy.count = histogram.count
+                    copy.total = histogram.total
+                    copy.max = histogram.max
+                    timings.append((name, labels, copy))
+        return counters, timings
+
+    def drain(
+        self,
+    ) -> tuple[list[tuple[str, Labels, int]], list[tuple[str, Labels, Histogram]]]:
+        """Return every counter and histogram and drop them, like ``collect``.
+
+        A worker process sends what it recorded since its last task back to
+        the server this way, to be ``merge``d there.
+        """
+        with self._lock:
+            counters = [
+                (name, labels, value)
+                for name, series in self.counters.items()
+                for labels, value in series.items()
+            ]
+            timings = [
+                (name, labels, histogram)
+                for name, series in self.timings.items()
+                for labels, histogram in series.items()
+            ]
+            self.counters = {}
+            self.timings = {}
+        return counters, timings
+
+    def merge(
+        self,
+        counters: list[tuple[str, Labels, int]],
+        timings: list[tuple[str, Labels, Histogram]],
+    ) -> None:
+        """Add counters and histograms recorded elsewhere (see ``drain``)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            for name, labels, value in counters:
+                series = self.counters.setdefault(name, {})
+                series[labels] = series.get(labels, 0) + value
+            for name, labels, histogram in timings:
+                series = self.timings.setdefault(name, {})
+                own = series.get(labels)
+                if own is None:
+                    own = series[labels] = Histogram(histogram.bounds)
+                own.merge(histogram)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return all counters and histogram summaries keyed by series."""
+        counters, timings = self.collect()
+        return {
+            "counters": {
+                format_labels(name, labels): value for name, labels, value in counters
+            },
+            "timings": {
+                format_labels(name, labels): histogram.snapshot()
+                for name, labels, histogram in timings
+            },
+        }
+
+    def reset(self) -> None:
+        """Drop every recorded value."""
+        with self._lock:
+            self.counters.clear()
+            self.timings.clear()
+
+
+_NULL_TIMER = nullcontext()
+
+# Process-wide instance, configured from [application] at startup
+INSTRUMENTATION = Instrumentation()
+
+
+def instrumented(name: str | None = None, labels: Labels = ()) -> Callable[[F], F]:
+    """Decorator timing every call into ``INSTRUMENTATION``.
+
+    Unlike ``log_execution_time``/``logger_wraps`` it never formats the
+    arguments or the result, so it is safe on functions that receive whole
+    upstream payloads. Failed calls are also counted as ``<name>.errors``.
+
+    Args:
+        name: Histogram name (defaults to the function's qualified name)
+        labels: Constant labels for every call
+    """
+
+    def decorator(func: F) -> F:
+        metric = name or func.__qualname__
+        errors = f"{metric}.errors"
+
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                instrumentation = INSTRUMENTATION
+                if not instrumentation.enabled:
+                    return await func(*args, **kwargs)
+                start = perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    instrumentation.incr(errors, 1, labels)
+                    raise
+                finally:
+                    instrumentation.observe(metric, perf_counter() - start, labels)
+
+            return async_wrapper  # type: ignore
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            instrumentation = INSTRUMENTATION
+            if not instrumentation.enabled:
+                return func(*args, **kwargs)
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                instrumentation.incr(errors, 1, labels)
+                raise
+            finally:
+                instrumentation.observe(metric, perf_counter() - start, labels)
+
+        return wrapper  # type: ignore
+
+    return decorator
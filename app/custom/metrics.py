@@ -0,0 +1,164 @@
+"""Prometheus text exposition for ``INSTRUMENTATION`` and request metrics.
+
+``render_metrics`` turns the in-memory counters and histograms into the
+text format (version 0.0.4) that Prometheus scrapes, so no client library
+or collector process is needed. ``RequestMetricsMiddleware`` records the
+latency of every HTTP request by route template and member.
+"""
+
+import re
+from collections.abc import Iterable, Mapping
+from math import inf
+from time import perf_counter
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config.config import MemberSettings
+from app.custom.log_utils import (
+    INSTRUMENTATION,
+    Histogram,
+    Instrumentation,
+    Labels,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRIC_PREFIX = "mkit_"
+UNKNOWN_MEMBER = "unknown"
+
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_]")
+
+# client ip -> member name, and member name -> client ip, replaced as a
+# whole by ``set_members``
+_member_names: dict[str, str] = {}
+_member_addresses: dict[str, str] = {}
+
+
+def set_members(members: Iterable[MemberSettings]) -> None:
+    """Set the members used for the ``member`` request label."""
+    global _member_names, _member_addresses
+    members = list(members)
+    _member_names = {member.ipaddress: member.name for member in members}
+    _member_addresses = {member.name: member.ipaddress for member in members}
+
+
+def member_for(client_ip: str | None) -> str:
+    """Member name for a client address (``unknown`` if not configured)."""
+    return _member_names.get(client_ip or "", UNKNOWN_MEMBER)
+
+
+def is_member_address(member: str, client_ip: str | None) -> bool:
+    """Whether ``client_ip`` is the configured address of ``member``.
+
+    Members behind one NAT share an address, so this (not ``member_for``)
+    tells whether a client may act as a given one of them.
+    """
+    return client_ip is not None and _member_addresses.get(member) == client_ip
+
+
+def metric_name(name: str, suffix: str = "") -> str:
+    """Prometheus metric name for an instrumentation name."""
+    return METRIC_PREFIX + _INVALID_NAME_CHARS.sub("_", name) + suffix
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _render_histogram(
+    lines: list[str], name: str, labels: Labels, histogram: Histogram
+) -> None:
+    cumulative = 0
+    for bound, count in zip((*histogram.bounds, inf), histogram.buckets, strict=True):
+        cumulative += count
+        le = f'le="{_format_value(bound)}"'
+        lines.append(f"{name}_bucket{_labels(labels, le)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(labels)} {_format_value(histogram.total)}")
+    lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+
+
+def render_metrics(
+    instrumentation: Instrumentation = INSTRUMENTATION,
+    gauges: Mapping[str, float] | None = None,
+) -> str:
+    """Render counters, histograms and ``gauges`` in text exposition format.
+
+    Counters are exported as ``<name>_total``, timing histograms as
+    ``<name>_seconds``; dots in names become underscores.
+    """
+    counters, timings = instrumentation.collect()
+    lines: list[str] = []
+
+    seen: set[str] = set()
+    for name, labels, value in sorted(counters):
+        exported = metric_name(name, "_total")
+        if exported not in seen:
+            seen.add(exported)
+            lines.append(f"# TYPE {exported} counter")
+        lines.append(f"{exported}{_labels(labels)} {value}")
+
+    for name, labels, histogram in sorted(timings, key=lambda item: item[:2]):
+        exported = metric_name(name, "_seconds")
+        if exported not in seen:
+            seen.add(exported)
+            lines.append(f"# TYPE {exported} histogram")
+        _render_histogram(lines, exported, labels, histogram)
+
+    for name, value in sorted((gauges or {}).items()):
+        exported = metric_name(name)
+        lines.append(f"# TYPE {exported} gauge")
+        lines.append(f"{exported} {_format_value(value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware timing requests by route template and member.
+
+    The route template (``/trim/{category}``, not the raw path) keeps the
+    number of series bounded; unmatched paths are grouped as ``unmatched``.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = perf_counter() - start
+            route = scope.get("route")
+            client = scope.get("client")
+            labels = (
+                ("route", getattr(route, "path", "unmatched")),
+                ("member", member_for(client[0] if client else None)),
+            )
+            INSTRUMENTATION.observe("http.request", elapsed, labels)
+            INSTRUMENTATION.incr(
+                "http.responses", 1, (*labels, ("status", str(status)))
+            )
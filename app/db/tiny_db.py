@@ -1,8 +1,11 @@
+from collections.abc import Callable
 from functools import lru_cache
 from pathlib import Path
 
 from tinydb import TinyDB
 
+from app.custom.log_utils import instrumented
+
 
 @lru_cache
 def get_db(db_path: str | None = None) -> TinyDB:
@@ -11,3 +14,8 @@ def get_db(db_path: str | None = None) -> TinyDB:
     db_file.parent.mkdir(parents=True, exist_ok=True)
 
     return TinyDB(db_path)
+
+
+def timed_operation(table: str, op: str) -> Callable:
+    """Decorator recording a repository method as a ``db.operation`` timing."""
+    return instrumented("db.operation", labels=(("table", table), ("op", op)))
@@ -1,6 +1,8 @@
 """fast api application."""
 
+import asyncio
 from contextlib import asynccontextmanager
+from functools import partial
 from pathlib import Path
 
 import uvicorn
@@ -9,29 +11,140 @@ from fastapi.responses import JSONResponse
 from loguru import logger
 
 from app.api import register_routers
-from app.config import generate_default_config_file, get_all_settings
+from app.config import ConfigWatcher, generate_default_config_file, get_all_settings
+from app.config.config import TomlSettings
 from app.custom.exceptions import AppExceptionError
+from app.custom.log_utils import INSTRUMENTATION
+from app.custom.metrics import RequestMetricsMiddleware, set_members
 from app.db.tiny_db import get_db
+from app.repo.concreate.tdb_member import TinyDBMemberRepository
+from app.services.digipos.client import UPSTREAM
+from app.services.digipos.factory_parser import ProcessorFactory
+from app.services.digipos.parser_service import (
+    OFFLOADER,
+    REFRESHER,
+    SNAPSHOTS,
+    refresh_catalog_async,
+    snapshot_age,
+)
+from app.services.digipos.rules import RuleSet
+from app.services.member.member_reports import REPORTS
 
 settings = get_all_settings()
 DB_PATH = Path(settings.database_url)
 
 
+def apply_reloadable_settings(
+    new_settings: TomlSettings, loop: asyncio.AbstractEventLoop | None = None
+) -> None:
+    """Apply settings that can change without a restart.
+
+    Compiles [parser.digipos] rules into the processor registry and the
+    offload workers here, then applies the rest (``apply_loop_settings``)
+    on the event loop.
+
+    Args:
+        new_settings: The loaded settings
+        loop: The app's running event loop when called from another thread
+            (the config watcher's), None when called on the loop itself
+    """
+    parser_settings = new_settings.parser.get("digipos")
+    ProcessorFactory.register_processors(RuleSet.from_settings(parser_settings))
+    OFFLOADER.reload(ProcessorFactory.rules)
+    if loop is None:
+        apply_loop_settings(new_settings)
+        return
+
+    async def apply() -> None:
+        apply_loop_settings(new_settings)
+
+    # Refresher, upstream and report state belong to the loop, and asyncio
+    # objects are not thread-safe; wait so failures reach the watcher's log
+    asyncio.run_coroutine_threadsafe(apply(), loop).result()
+
+
+def apply_loop_settings(new_settings: TomlSettings) -> None:
+    """Apply the reloadable settings owned by the event loop (call on it).
+
+    Applies snapshot retention and refresh, the [upstream] breaker and
+    hedging policy and the [reports] policy, and refreshes the members used
+    to label request metrics and to deliver reports.
+    """
+    parser_settings = new_settings.parser.get("digipos")
+    if parser_settings:
+        SNAPSHOTS.configure(
+            parser_settings.snapshot_versions, parser_settings.snapshot_compression
+        )
+        REFRESHER.configure(
+            parser_settings.snapshot_ttl,
+            parser_settings.snapshot_max_age,
+            parser_settings.refresh_hot_rate,
+            parser_settings.refresh_jitter,
+        )
+    UPSTREAM.configure(new_settings.upstream)
+    set_members(new_settings.members)
+    REPORTS.configure(new_settings.reports)
+    REPORTS.sync(
+        "config",
+        {
+            member.name: (member.report_url, member.ipaddress)
+            for member in new_settings.members
+            if member.is_allowed and member.report_url
+        },
+    )
+
+
 @asynccontextmanager
 @logger.catch()
-async def lifespan(app: FastAPI):  # noqa: RUF029
+async def lifespan(app: FastAPI):
     """Lifespan for application."""
     logger.info("Starting up...")
     logger.info(f"Database path: {DB_PATH}")
     app.state.db = get_db(str(DB_PATH))
+    INSTRUMENTATION.configure(
+        enabled=settings.application.instrumentation,
+        sample_rate=settings.application.instrumentation_sample_rate,
+    )
+    apply_reloadable_settings(settings)
+    parser_settings = settings.parser.get("digipos")
+    if parser_settings:
+        await OFFLOADER.start(
+            workers=parser_settings.offload_workers,
+            threshold=parser_settings.offload_threshold,
+            max_pending=parser_settings.offload_max_pending,
+        )
+    UPSTREAM.start(settings.digipos)
+    if settings.digipos:
+        REFRESHER.start(refresh_catalog_async, snapshot_age)
+    # Members added through the API report too
+    REPORTS.sync(
+        "db",
+        {
+            member.name: (str(member.report_url), str(member.ip_address))
+            for member in TinyDBMemberRepository(app.state.db).get_all_members()
+            if member.is_active
+        },
+    )
+    REPORTS.start()
+    # Rule changes in config.toml are recompiled off the request path
+    config_watcher = ConfigWatcher(
+        on_change=partial(apply_reloadable_settings, loop=asyncio.get_running_loop())
+    )
+    config_watcher.start()
     yield
 
     logger.info("Shutting down...")
+    config_watcher.stop()
+    await REPORTS.stop()
+    await REFRESHER.stop()
+    await UPSTREAM.aclose()
+    OFFLOADER.shutdown()
     app.state.db.close()
     app.state.db = None
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(RequestMetricsMiddleware)
 
 
 @app.exception_handler(AppExceptionError)
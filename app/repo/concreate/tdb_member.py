@@ -1,6 +1,7 @@
 from typing import Any
 
 from app.custom.exceptions import MemberGenericError
+from app.db.tiny_db import timed_operation
 from app.repo.interfaces.intf_member import MemberRepository
 from app.schemas.sch_member import MemberCreate, MemberInDB, MemberUpdate
 from loguru import logger
@@ -12,6 +13,7 @@ class TinyDBMemberRepository(MemberRepository):
         self.db = db
         self.table = self.db.table("members")
 
+    @timed_operation("members", "get_all_members")
     def get_all_members(self) -> list[MemberInDB]:
         try:
             members = self.table.all()
@@ -26,6 +28,7 @@ class TinyDBMemberRepository(MemberRepository):
             logger.error(f"TinyDB error getting all members: {e}")
             raise MemberGenericError(message="Repository error") from e
 
+    @timed_operation("members", "get_member_by_id")
     def get_member_by_id(self, member_id: int) -> MemberInDB | None:
         try:
             member_doc = self.table.get(doc_id=member_id)
@@ -39,6 +42,7 @@ class TinyDBMemberRepository(MemberRepository):
             logger.error(f"TinyDB error getting member by id {member_id}: {e}")
             raise MemberGenericError(message="Repository error") from e
 
+    @timed_operation("members", "get_member_by_username")
     def get_member_by_username(self, member_username: str) -> list[MemberInDB]:
         try:
             members = self.table.search(where("name") == member_username)
@@ -55,6 +59,7 @@ class TinyDBMemberRepository(MemberRepository):
             )
             raise MemberGenericError(message="Repository error") from e
 
+    @timed_operation("members", "add_member")
     def add_member(self, member_data: MemberCreate) -> MemberInDB:
         try:
             # Gunakan mode="json" agar Pydantic menangani konversi
@@ -70,6 +75,7 @@ class TinyDBMemberRepository(MemberRepository):
             logger.error(f"TinyDB error adding member {member_data.name}: {e}")
             raise MemberGenericError(message="Repository error") from e
 
+    @timed_operation("members", "update_member")
     def update_member(
         self, member_id: int, member_data: MemberUpdate
     ) -> MemberInDB | None:
@@ -87,6 +93,7 @@ class TinyDBMemberRepository(MemberRepository):
             logger.error(f"TinyDB error updating member {member_id}: {e}")
             raise MemberGenericError(message="Repository error") from e
 
+    @timed_operation("members", "delete_member")
     def delete_member(self, member_id: int) -> list[int]:
         try:
             return self.table.remove(doc_ids=[member_id])
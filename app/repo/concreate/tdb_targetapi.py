@@ -3,6 +3,7 @@
 from typing import Any
 
 from app.custom.exceptions import TargetAPIGenericError
+from app.db.tiny_db import timed_operation
 from app.repo.interfaces.intf_target import TargetApiRepository
 from app.schemas.sch_targetapi import TargetApiCreate, TargetApiINDB, TargetApiUpdate
 from loguru import logger
@@ -14,6 +15,7 @@ class TinyDBTargetApiRepository(TargetApiRepository):
         self.db = db
         self.table = self.db.table("targetapis")
 
+    @timed_operation("targetapis", "get_all_target_apis")
     def get_all_target_apis(self) -> list[TargetApiINDB]:
         try:
             targetsapis: Any = self.table.all()
@@ -28,6 +30,7 @@ class TinyDBTargetApiRepository(TargetApiRepository):
             logger.error(f"Error fetching all target APIs: {e}")
             raise TargetAPIGenericError() from e
 
+    @timed_operation("targetapis", "get_target_api_by_id")
     def get_target_api_by_id(self, target_api_id: int) -> TargetApiINDB | None:
         try:
             target_doc = self.table.get(doc_id=target_api_id)
@@ -41,6 +44,7 @@ class TinyDBTargetApiRepository(TargetApiRepository):
             logger.error(f"Error fetching target API by id {target_api_id}: {e}")
             raise TargetAPIGenericError(message="Repository error") from e
 
+    @timed_operation("targetapis", "get_target_api_by_username")
     def get_target_api_by_username(self, username: str) -> TargetApiINDB | None:
         try:
             targetapi = self.table.get(where("username") == username)
@@ -54,6 +58,7 @@ class TinyDBTargetApiRepository(TargetApiRepository):
             logger.error(f"Error fetching target API by username {username}: {e}")
             raise TargetAPIGenericError(message="Repository error") from e
 
+    @timed_operation("targetapis", "create_target_api")
     def create_target_api(self, target_api: TargetApiCreate) -> TargetApiINDB:
         try:
             data = target_api.model_dump(mode="json")
@@ -63,6 +68,7 @@ class TinyDBTargetApiRepository(TargetApiRepository):
             logger.error(f"Error creating target API: {e}")
             raise TargetAPIGenericError() from e
 
+    @timed_operation("targetapis", "update_target_api")
     def update_target_api(
         self, target_api_id: int, target_api: TargetApiUpdate
     ) -> TargetApiINDB:
@@ -78,6 +84,7 @@ class TinyDBTargetApiRepository(TargetApiRepository):
             logger.error(f"Error updating target API: {e}")
             raise TargetAPIGenericError(message="Repository error") from e
 
+    @timed_operation("targetapis", "delete_target_api")
     def delete_target_api(self, target_api_id: int) -> None:
         try:
             self.table.remove(where("id") == target_api_id)
@@ -4,26 +4,100 @@ Contains the core processing pipeline and abstract methods
 that must be implemented by specific processor types.
 """
 
+import hashlib
 import json
-import re
 from abc import ABC, abstractmethod
+from collections import Counter
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Iterator, Mapping
 from typing import Any
 
 from loguru import logger
 
-from app.custom.log_utils import log_execution_time, logger_wraps
-
-# Character limit constant
+from app.custom.exceptions import ParserInvalidPayloadError
+from app.custom.log_utils import INSTRUMENTATION, instrumented
+from app.services.digipos.columnar import COLUMNAR_MIN_PRODUCTS, filter_columns
+from app.services.digipos.delta import Delta, product_fingerprint
+from app.services.digipos.exclusions import (
+    PRODUCTNAME,
+    QUOTA_METADATA,
+    SUBCATEGORY,
+    ExclusionRules,
+)
+from app.services.digipos.json_stream import ArrayItemReader
+from app.services.digipos.pagination import paginate
+from app.services.digipos.product import Product, decode_product
+from app.services.digipos.quota_rewriter import (
+    DEFAULT_QUOTA_REWRITER,
+    OPTIMIZATION_TIERS,
+    TIER_NONE,
+    TIER_STRIP,
+    QuotaRewriter,
+)
+from app.services.digipos.snapshots import SNAPSHOT_COMPRESSION, CatalogSnapshot
+
+# Default output budget, overridden by [parser.digipos] max_responses
 MAX_CHAR_LIMIT = 7000
 
+# Constant metric labels, so recording them allocates nothing
+_RULE_LABELS = {
+    rule: (("rule", rule),) for rule in (SUBCATEGORY, PRODUCTNAME, QUOTA_METADATA)
+}
+_TIER_LABELS = {
+    tier: (("tier", str(tier)),) for tier in (TIER_NONE, *OPTIMIZATION_TIERS)
+}
+
 
 class BaseProcessor(ABC):
     """Abstract base class for all response processors."""
 
-    def __init__(self, category: str, processor_type: str):
+    # Top-level key holding the product list in the upstream response
+    products_key: str = "paket"
+    # Filter large catalogs column-wise (set by ProcessorFactory, needs NumPy)
+    columnar: bool = False
+
+    def __init__(
+        self,
+        category: str,
+        processor_type: str,
+        max_chars: int = MAX_CHAR_LIMIT,
+        exclusions: ExclusionRules | None = None,
+        quota_rewriter: QuotaRewriter | None = None,
+    ):
+        """Set up the processor with compiled rules.
+
+        Args:
+            category: Category handled by this processor
+            processor_type: "RECHARGE" or "ACTIVATION"
+            max_chars: Output budget
+            exclusions: Compiled config exclusions (None compiles the
+                ``get_exclude_*`` lists)
+            quota_rewriter: Rewriter for ``optimize_quota`` (None uses the
+                shared default rules)
+        """
         self.category = category
         self.processor_type = processor_type
+        self.max_chars = max_chars
         self.logger = logger.bind(category=category, processor_type=processor_type)
+        # Exclusion lists are compiled once per processor, not per response
+        if exclusions is None:
+            exclusions = ExclusionRules(
+                self.get_exclude_subcategories(),
+                self.get_exclude_productnames(),
+                self.get_exclude_quota_metadata(),
+            )
+        self.exclusions = exclusions
+        self.quota_rewriter = (
+            DEFAULT_QUOTA_REWRITER if quota_rewriter is None else quota_rewriter
+        )
+
+    @property
+    def rules_version(self) -> str:
+        """Identify everything that shapes this processor's output."""
+        return hashlib.blake2b(
+            f"{self.processor_type}|{self.exclusions.fingerprint}|"
+            f"{self.quota_rewriter.fingerprint}|{self.max_chars}".encode(),
+            digest_size=8,
+        ).hexdigest()
 
     @abstractmethod
     def get_exclude_subcategories(self) -> list[str]:
@@ -41,144 +115,311 @@ class BaseProcessor(ABC):
         pass
 
     @abstractmethod
-    def optimize_quota(self, quota: str) -> str:
-        """Apply processor-specific quota optimization."""
+    def optimize_quota(self, quota: str, tier: int = TIER_STRIP) -> str:
+        """Apply processor-specific quota optimization up to ``tier``."""
         pass
 
     @abstractmethod
-    def format_product_output(self, product: dict[str, Any]) -> str:
+    def format_product_output(self, product: Product) -> str:
         """Format individual product for output."""
         pass
 
-    @log_execution_time
-    @logger_wraps()
-    def process_response(self, response_data: str) -> str:
-        """Main processing pipeline - same for all processor types."""
-        # 1. Check character limit first
-        char_count = len(response_data)
-        self.logger.info(f"Response character count: {char_count}")
-
-        data = json.loads(response_data)
-
-        # 2. Always apply filtering (to clean irrelevant data)
-        self.logger.info("Applying filters to clean data...")
-
-        # Filter by subcategory
-        filtered_data = self._filter_by_subcategory(data)
-
-        # Filter by product name patterns
-        filtered_data = self._filter_by_productname(filtered_data)
-
-        # Filter by quota metadata patterns
-        filtered_data = self._filter_by_quota_metadata(filtered_data)
+    @instrumented("parser.process_response")
+    def process_response(self, response_data: str | bytes) -> str:
+        """Main processing pipeline - same for all processor types.
+
+        ``response_data`` may be the raw body bytes (UTF-8/16/32 JSON), which
+        ``json.loads`` decodes itself without an intermediate ``str`` copy.
+        Stage timings and sizes are recorded in ``INSTRUMENTATION``.
+        """
+        return "".join(self._render_products(response_data))
+
+    @instrumented("parser.process_pages")
+    def process_pages(
+        self, response_data: str | bytes, page_size: int | None = None
+    ) -> tuple[str, ...]:
+        """Same pipeline as ``process_response``, cut into pages.
+
+        Pages hold whole products and at most ``page_size`` characters
+        (default ``max_chars``); joined they equal ``process_response``.
+        """
+        return paginate(
+            self._render_products(response_data), page_size or self.max_chars
+        )
 
-        # 3. Apply text optimization only if needed
-        if char_count <= MAX_CHAR_LIMIT:
-            self.logger.info("Response within limit, skipping text optimization")
-            final_data = filtered_data
+    @instrumented("parser.process_delta")
+    def process_delta(
+        self,
+        response_data: str | bytes,
+        previous: Mapping[Any, bytes] | None = None,
+    ) -> Delta:
+        """Same pipeline as ``process_response``, for changed products only.
+
+        Products whose fingerprint differs from ``previous`` (added or
+        changed) are formatted as usual, within the output budget; products
+        in ``previous`` but no longer in the catalog follow as removal
+        markers. ``previous=None`` is a full resync: every product is sent.
+        """
+        products = self._decode_products(response_data)
+        fingerprints = {p.product_id: product_fingerprint(p) for p in products}
+        if previous is None:
+            upserts, added, removed = products, len(products), []
         else:
-            self.logger.info("Response exceeds limit, applying text optimization")
-            final_data = self._optimize_quotas(filtered_data)
+            upserts = [
+                p
+                for p in products
+                if previous.get(p.product_id) != fingerprints[p.product_id]
+            ]
+            added = sum(1 for p in upserts if p.product_id not in previous)
+            removed = [pid for pid in previous if pid not in fingerprints]
+
+        output_parts = self._format_products(upserts)
+        output_parts.extend(map(self.format_removed_output, removed))
+        final_output = "".join(output_parts)
+        self._record_output_stats(len(response_data), len(final_output))
+        return Delta(
+            final_output,
+            fingerprints,
+            added,
+            len(upserts) - added,
+            len(removed),
+            full=previous is None,
+        )
 
-        # Final character check
-        final_output = self._format_output(final_data)
-        final_char_count = len(final_output)
-        self.logger.info(f"Final output character count: {final_char_count}")
+    def decode_catalog(self, response_data: str | bytes) -> list[Product]:
+        """Decode every product of a payload, before any exclusion."""
+        data = self._load(response_data)
+        return [
+            p if isinstance(p, Product) else Product.from_dict(p)
+            for p in data.get(self.products_key, [])
+        ]
+
+    def snapshot_catalog(
+        self, response_data: str | bytes, codec: str = SNAPSHOT_COMPRESSION
+    ) -> CatalogSnapshot:
+        """Decode a payload into a compressed catalog snapshot."""
+        return CatalogSnapshot.build(
+            self.category, self.decode_catalog(response_data), codec
+        )
 
+    @instrumented("parser.process_snapshot")
+    def process_snapshot(self, snapshot: CatalogSnapshot) -> str:
+        """Same pipeline as ``process_response``, from a catalog snapshot."""
+        with INSTRUMENTATION.timer("parser.decode"):
+            products = snapshot.products()
+        with INSTRUMENTATION.timer("parser.filter"):
+            products = self._select_products(products)
+        final_output = "".join(self._format_products(products))
+        self._record_output_stats(snapshot.size, len(final_output))
         return final_output
 
-    def _filter_by_subcategory(self, data: dict[str, Any]) -> dict[str, Any]:
-        """Filter products by excluded subcategories."""
-        exclude_list = self.get_exclude_subcategories()
-        if not exclude_list or not any(
-            exclude_list
-        ):  # Skip if empty or all empty strings
-            return data
-
-        original_count = len(data.get("paket", []))
-        filtered_paket = []
-
-        for product in data.get("paket", []):
-            subcategory = product.get("productSubCategory", "")
-            if subcategory not in exclude_list:
-                filtered_paket.append(product)
-
-        data["paket"] = filtered_paket
-        self.logger.info(
-            f"Subcategory filter: {original_count} → {len(filtered_paket)} products"
-        )
-        return data
-
-    def _filter_by_productname(self, data: dict[str, Any]) -> dict[str, Any]:
-        """Filter products by excluded product name patterns."""
-        exclude_patterns = self.get_exclude_productnames()
-        if not exclude_patterns or not any(
-            exclude_patterns
-        ):  # Skip if empty or all empty strings
-            return data
-
-        original_count = len(data.get("paket", []))
-        filtered_paket = []
-
-        for product in data.get("paket", []):
-            product_name = product.get("productName", "")
-            should_exclude = any(
-                re.match(rf"^{re.escape(pattern)}", product_name, re.IGNORECASE)
-                for pattern in exclude_patterns
-                if pattern.strip()
+    def format_removed_output(self, product_id: Any) -> str:
+        """Format the removal marker of a product no longer in the catalog.
+
+        Format: #id|- (a product line always has a ``name(quota)`` field)
+        """
+        return f"#{product_id}|-"
+
+    def _render_products(self, response_data: str | bytes) -> list[str]:
+        """Decode, filter, optimize and format; one output string per product."""
+        output_parts = self._format_products(self._decode_products(response_data))
+        self._record_output_stats(len(response_data), sum(map(len, output_parts)))
+        return output_parts
+
+    def _load(self, response_data: str | bytes) -> dict[str, Any]:
+        """Decode the payload's top-level object.
+
+        Product objects become compact records while decoding.
+
+        Raises:
+            ValueError: If the payload is not valid JSON (or not UTF-8)
+            ParserInvalidPayloadError: If its root is not an object
+        """
+        with INSTRUMENTATION.timer("parser.decode"):
+            data = json.loads(response_data, object_hook=decode_product)
+        if not isinstance(data, dict):
+            raise ParserInvalidPayloadError(
+                message="Upstream payload is not a JSON object.",
+                context={"category": self.category, "root": type(data).__name__},
             )
-
-            if not should_exclude:
-                filtered_paket.append(product)
-
-        data["paket"] = filtered_paket
-        self.logger.info(
-            f"Product name filter: {original_count} → {len(filtered_paket)} products"
-        )
         return data
 
-    def _filter_by_quota_metadata(self, data: dict[str, Any]) -> dict[str, Any]:
-        """Filter products by excluded quota metadata patterns."""
-        exclude_patterns = self.get_exclude_quota_metadata()
-        if not exclude_patterns or not any(
-            exclude_patterns
-        ):  # Skip if empty or all empty strings
-            return data
-
-        original_count = len(data.get("paket", []))
-        filtered_paket = []
-
-        for product in data.get("paket", []):
-            quota = product.get("quota", "")
-            should_exclude = any(
-                pattern in quota for pattern in exclude_patterns if pattern.strip()
+    def _decode_products(self, response_data: str | bytes) -> list[Product]:
+        """Decode the payload and drop excluded products."""
+        data = self._load(response_data)
+        with INSTRUMENTATION.timer("parser.filter"):
+            return self._select_products(data.get(self.products_key, []))
+
+    def _format_products(self, products: list[Product]) -> list[str]:
+        """Format products, optimizing quotas only as far as the budget needs."""
+        instrumentation = INSTRUMENTATION
+
+        # 1. Format as-is to measure the output
+        with instrumentation.timer("parser.format"):
+            output_parts = [self.format_product_output(p) for p in products]
+
+        # 2. Optimize only as far as needed to fit the output budget
+        with instrumentation.timer("parser.optimize"):
+            tier = self._apply_budget(products, sum(map(len, output_parts)))
+        if tier != TIER_NONE:
+            with instrumentation.timer("parser.format"):
+                output_parts = [self.format_product_output(p) for p in products]
+        return output_parts
+
+    def _record_output_stats(self, chars_in: int, chars_out: int) -> None:
+        """Count response and output sizes."""
+        instrumentation = INSTRUMENTATION
+        instrumentation.incr("parser.chars_in", chars_in)
+        instrumentation.incr("parser.chars_out", chars_out)
+        if instrumentation.sampled():
+            self.logger.debug(
+                "Response {} chars -> output {} chars", chars_in, chars_out
             )
 
-            if not should_exclude:
-                filtered_paket.append(product)
-
-        data["paket"] = filtered_paket
-        self.logger.info(
-            f"Quota metadata filter: {original_count} → {len(filtered_paket)} products"
-        )
-        return data
-
-    def _optimize_quotas(self, data: dict[str, Any]) -> dict[str, Any]:
-        """Apply quota optimization to all products."""
-        for product in data.get("paket", []):
-            original_quota = product.get("quota", "")
-            optimized_quota = self.optimize_quota(original_quota)
-            product["quota"] = optimized_quota
+    async def stream_response(
+        self, chunks: AsyncIterable[bytes], size: int | None = None
+    ) -> AsyncIterator[str]:
+        """Streaming pipeline - filter, optimize and format as the body arrives.
+
+        Decodes the product array chunk by chunk, so neither the payload nor
+        the product list is ever held whole and memory stays flat whatever
+        the catalog size. Yields the formatted products completed by each
+        chunk.
+
+        Unlike ``process_response``, the output size is unknown until the
+        end, so there is no tiered budget: quotas get full optimization
+        (``TIER_STRIP``) unless ``size`` shows the payload itself fits
+        ``max_chars``. The text then differs from ``process_response``
+        whenever a cheaper tier would have fit the budget.
+
+        Args:
+            chunks: The raw JSON response body
+            size: Declared body size in bytes, None if unknown
+
+        Raises:
+            ValueError: If the body is not valid JSON (or not UTF-8)
+        """
+        tier = TIER_NONE if size is not None and size <= self.max_chars else TIER_STRIP
+        INSTRUMENTATION.incr("parser.tier", 1, _TIER_LABELS[tier])
+        reader = ArrayItemReader(self.products_key)
+        dropped: Counter[str] = Counter()
+        total = chars_out = 0
+
+        async def batches() -> AsyncIterator[list[Any]]:
+            async for chunk in chunks:
+                yield reader.feed(chunk)
+            yield reader.close()
+
+        async for items in batches():
+            total += len(items)
+            text = self._format_batch(items, tier, dropped)
+            del items
+            if text:
+                chars_out += len(text)
+                yield text
+
+        self._record_filter_stats(total, dropped)
+        self._record_output_stats(reader.size, chars_out)
+
+    def _format_batch(
+        self, items: list[dict[str, Any]], tier: int, dropped: Counter[str]
+    ) -> str:
+        """Filter, optimize to ``tier`` and format streamed product dicts."""
+        exclusions = self.exclusions
+        output_parts = []
+        for item in items:
+            product = Product.from_dict(item)
+            rule = exclusions.match(product)
+            if rule is not None:
+                dropped[rule] += 1
+                continue
+            if tier != TIER_NONE:
+                product.quota = self.optimize_quota(product.quota, tier)
+            output_parts.append(self.format_product_output(product))
+        return "".join(output_parts)
 
-        self.logger.info(f"Optimized quotas for {len(data.get('paket', []))} products")
-        return data
+    def _filter_products(
+        self, products: Iterable[Product | dict[str, Any]]
+    ) -> Iterator[Product]:
+        """Yield products not excluded by any rule, counting drops per rule."""
+        exclusions = self.exclusions
+        dropped: Counter[str] = Counter()
+        total = 0
+
+        for product in products:
+            total += 1
+            if not isinstance(product, Product):
+                product = Product.from_dict(product)
+            rule = exclusions.match(product)
+            if rule is not None:
+                dropped[rule] += 1
+                continue
+            yield product
+
+        self._record_filter_stats(total, dropped)
+
+    def _select_products(
+        self, products: list[Product | dict[str, Any]]
+    ) -> list[Product]:
+        """Filter a decoded product list, column-wise when it pays off."""
+        if self.columnar and len(products) >= COLUMNAR_MIN_PRODUCTS:
+            records = [
+                p if isinstance(p, Product) else Product.from_dict(p) for p in products
+            ]
+            try:
+                kept, dropped = filter_columns(records, self.exclusions)
+            except TypeError:
+                pass  # unhashable field values: let the row-wise path decide
+            else:
+                self._record_filter_stats(len(records), dropped)
+                return kept
+        return list(self._filter_products(products))
+
+    def _record_filter_stats(self, total: int, dropped: Counter[str]) -> None:
+        """Count products in/out and drops per rule."""
+        instrumentation = INSTRUMENTATION
+        instrumentation.incr("parser.products_in", total)
+        instrumentation.incr("parser.products_out", total - dropped.total())
+        for rule, count in dropped.items():
+            instrumentation.incr("parser.dropped", count, _RULE_LABELS[rule])
+        if instrumentation.sampled():
+            self.logger.debug(
+                "Filters: {} → {} products (dropped: {})",
+                total,
+                total - dropped.total(),
+                dict(dropped),
+            )
 
-    def _format_output(self, data: dict[str, Any]) -> str:
-        """Format final output using processor-specific formatting."""
-        output_parts = []
+    def _apply_budget(self, products: list[Product], output_size: int) -> int:
+        """Rewrite quotas with the cheapest tier that fits ``max_chars``.
+
+        Only quotas change between tiers, so the output size of each tier is
+        derived from the quota length deltas instead of re-formatting.
+
+        Returns:
+            The applied tier (TIER_NONE if the output already fits)
+        """
+        if output_size <= self.max_chars:
+            INSTRUMENTATION.incr("parser.tier", 1, _TIER_LABELS[TIER_NONE])
+            return TIER_NONE
+
+        quotas = [product.quota for product in products]
+        for tier in OPTIMIZATION_TIERS:
+            optimized = [self.optimize_quota(quota, tier) for quota in quotas]
+            tier_size = output_size + sum(
+                len(new) - len(old)
+                for old, new in zip(quotas, optimized, strict=True)
+                if new is not old
+            )
+            if tier_size <= self.max_chars:
+                break
 
-        for product in data.get("paket", []):
-            formatted = self.format_product_output(product)
-            output_parts.append(formatted)
+        for product, quota in zip(products, optimized, strict=True):
+            product.quota = quota
 
-        return "".join(output_parts)
+        INSTRUMENTATION.incr("parser.tier", 1, _TIER_LABELS[tier])
+        if tier_size > self.max_chars:
+            self.logger.warning(
+                f"Output still exceeds limit after full optimization: {tier_size}"
+            )
+        return tier
@@ -0,0 +1,121 @@
+"""Bounded, thread-safe LRU cache used by the digipos pipeline.
+
+Entries are bounded both by count and by total size (as measured by
+``sizeof``), optionally expire after ``ttl`` seconds, least recently used
+entries are evicted first, and hit/miss/eviction counters are kept for
+monitoring.
+"""
+
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from threading import Lock
+from time import monotonic
+from typing import Any
+
+
+class LRUCache:
+    """Size-aware LRU cache with optional TTL and hit/miss/eviction counters."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_size: int | None = None,
+        sizeof: Callable[[Any, Any], int] | None = None,
+        ttl: float | None = None,
+        clock: Callable[[], float] = monotonic,
+    ):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.ttl = ttl
+        self._sizeof = sizeof or (lambda key, value: 1)  # noqa: ARG005
+        self._clock = clock
+        # key -> (value, size, expires_at)
+        self._data: OrderedDict[Hashable, tuple[Any, int, float | None]] = OrderedDict()
+        self._lock = Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for ``key`` (and mark it recently used)."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[2] is not None and entry[2] <= self._clock():
+                del self._data[key]
+                self.size -= entry[1]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store ``value``, evicting least recently used entries if needed."""
+        entry_size = self._sizeof(key, value)
+        if self.max_size is not None and entry_size > self.max_size:
+            return  # would evict everything else and still not fit
+
+        expires_at = self._clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._data[key] = (value, entry_size, expires_at)
+            self.size += entry_size
+
+            while len(self._data) > self.max_entries or (
+                self.max_size is not None and self.size > self.max_size
+            ):
+                _, (_, evicted_size, _) = self._data.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        """Drop ``key`` if present."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                self.size -= entry[1]
+
+    def take_counters(self) -> dict[str, int]:
+        """Return the hit/miss/eviction/expiration counts and zero them."""
+        with self._lock:
+            counts = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+            self.hits = self.misses = self.evictions = self.expirations = 0
+        return counts
+
+    def clear(self) -> None:
+        """Drop every entry (counters are kept)."""
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def stats(self) -> dict[str, int | float]:
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "size": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
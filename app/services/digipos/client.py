@@ -0,0 +1,446 @@
+"""Pooled async client for the Digipos upstream API.
+
+One ``DigiposClient`` per ``[[digipos]]`` account keeps a pool of
+keep-alive connections to its ``base_url``, so polling the catalog does not
+pay a TCP (and TLS) handshake per request. Every attempt is bounded by the
+account's ``time_out``; transport errors and retryable statuses are retried
+up to ``retries`` times with full-jitter exponential backoff.
+
+Account credentials go in request headers, never in the query string, so
+they stay out of request URLs and of anything that logs or reports them.
+
+Responses are returned as raw bytes, which the trim pipeline and the
+snapshot store decode directly.
+
+``UpstreamClients.fetch_catalog`` can hedge scheduled calls against tail
+latency: a call still running after the recent ``hedge_percentile``
+latency gets a duplicate on a second account, and the first response
+wins. Hedges are capped at ``hedge_budget`` of the calls, so upstream
+load grows by a few percent rather than doubling.
+"""
+
+import asyncio
+import random
+from collections import deque
+from collections.abc import AsyncIterator, Iterable, Mapping, MutableSequence
+from contextlib import asynccontextmanager
+from threading import Lock
+from time import perf_counter
+from typing import Any
+
+import httpx
+from loguru import logger
+
+from app.config.config import DigiposSettings, UpstreamSettings
+from app.custom.exceptions import (
+    UpstreamGenericError,
+    UpstreamNotConfiguredError,
+    UpstreamTimeoutError,
+)
+from app.custom.log_utils import INSTRUMENTATION
+from app.services.digipos.scheduler import EJECT_LATENCY_RATIO, AccountScheduler
+
+# Backoff before retry n (0-based) is uniform in [0, min(MAX, BASE * 2**n)]
+BACKOFF_BASE = 0.2  # seconds
+BACKOFF_MAX = 5.0  # seconds
+# Statuses worth another attempt; anything else is returned or raised as-is
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Recent call latencies the hedge delay is taken from, and how many are
+# needed before hedging starts
+HEDGE_WINDOW = 256
+HEDGE_MIN_SAMPLES = 20
+# Request headers carrying the account credentials
+CREDENTIAL_HEADERS = {
+    "username": "X-Digipos-Username",
+    "password": "X-Digipos-Password",
+    "pin": "X-Digipos-Pin",
+}
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter delay before retry ``attempt`` (0-based)."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+class DigiposClient:
+    """Keep-alive connection pool and retry policy of one upstream account."""
+
+    def __init__(
+        self,
+        settings: DigiposSettings,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        """Create the pool (connections open lazily, on first use).
+
+        Args:
+            settings: The account, its pool limits and retry policy
+            transport: Replacement transport (e.g. ``httpx.MockTransport``)
+        """
+        self.settings = settings
+        self.account = settings.username
+        self.retries = settings.retries
+        self._labels = (("account", self.account),)
+        self._client = httpx.AsyncClient(
+            base_url=settings.base_url,
+            headers=self.credentials,
+            timeout=httpx.Timeout(settings.time_out),
+            limits=httpx.Limits(
+                max_connections=settings.max_connections,
+                max_keepalive_connections=settings.max_keepalive_connections,
+                keepalive_expiry=settings.keepalive_expiry,
+            ),
+            transport=transport,
+        )
+        self._lock = Lock()
+        self.requests = 0
+        self.retried = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.connections_opened = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    async def _trace(self, event: str, info: dict[str, Any]) -> None:  # noqa: ARG002
+        """Trace hook of httpcore, counts new connections (the rest reuse one)."""
+        if event == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections_opened += 1
+
+    @property
+    def credentials(self) -> dict[str, str]:
+        """Credential headers sent with every request (empty pin omitted)."""
+        headers = {
+            CREDENTIAL_HEADERS["username"]: self.settings.username,
+            CREDENTIAL_HEADERS["password"]: self.settings.password,
+        }
+        if self.settings.pin:
+            headers[CREDENTIAL_HEADERS["pin"]] = self.settings.pin
+        return headers
+
+    async def request(
+        self,
+        method: str,
+        path: str = "",
+        params: Mapping[str, Any] | None = None,
+    ) -> httpx.Response:
+        """Send a request, retrying transport errors and retryable statuses.
+
+        Args:
+            method: HTTP method
+            path: Path relative to ``base_url``
+            params: Query parameters
+
+        Returns:
+            The first non-retryable response (its status is not checked)
+
+        Raises:
+            UpstreamTimeoutError: If the last attempt timed out
+            UpstreamGenericError: If the last attempt failed otherwise, or
+                still got a retryable status
+        """
+        extensions = {"trace": self._trace}
+        error: httpx.TransportError | None = None
+        status = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                with self._lock:
+                    self.retried += 1
+                INSTRUMENTATION.incr("upstream.retries", 1, self._labels)
+                await asyncio.sleep(backoff_delay(attempt - 1))
+
+            start = perf_counter()
+            try:
+                response = await self._client.request(
+                    method, path, params=params, extensions=extensions
+                )
+            except httpx.TransportError as e:
+                timed_out = isinstance(e, httpx.TimeoutException)
+                self._record_attempt(
+                    perf_counter() - start, "timeout" if timed_out else "error"
+                )
+                error = e
+                continue
+
+            self._record_attempt(perf_counter() - start, str(response.status_code))
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            error, status = None, response.status_code
+
+        context = {"account": self.account, "path": path, "attempts": attempt + 1}
+        if isinstance(error, httpx.TimeoutException):
+            raise UpstreamTimeoutError(context=context, cause=error) from error
+        if error is not None:
+            raise UpstreamGenericError(
+                context={**context, "detail": str(error)}, cause=error
+            ) from error
+        raise UpstreamGenericError(context={**context, "status": status})
+
+    async def fetch_catalog(
+        self, category: str, path: str = "", params: Mapping[str, Any] | None = None
+    ) -> bytes:
+        """Fetch the raw product catalog of ``category``.
+
+        Raises:
+            UpstreamGenericError: If the request fails or is not a 2xx
+            UpstreamTimeoutError: If the request times out
+        """
+        response = await self.request(
+            "GET", path, params={"category": category, **(params or {})}
+        )
+        if not response.is_success:
+            raise UpstreamGenericError(
+                context={
+                    "account": self.account,
+                    "category": category,
+                    "status": response.status_code,
+                }
+            )
+        return response.content
+
+    def _record_attempt(self, elapsed: float, outcome: str) -> None:
+        """Count one attempt; ``outcome`` is a status, "timeout" or "error"."""
+        with self._lock:
+            self.requests += 1
+            if outcome == "timeout":
+                self.timeouts += 1
+            elif outcome == "error":
+                self.failed += 1
+            self.latency_total += elapsed
+            self.latency_max = max(self.latency_max, elapsed)
+        INSTRUMENTATION.observe("upstream.request", elapsed, self._labels)
+        INSTRUMENTATION.incr(
+            "upstream.responses", 1, (*self._labels, ("outcome", outcome))
+        )
+
+    async def aclose(self) -> None:
+        """Close every pooled connection."""
+        await self._client.aclose()
+
+    def stats(self) -> dict[str, int | float]:
+        """Return a snapshot of the attempt and connection counters."""
+        with self._lock:
+            requests = self.requests
+            return {
+                "requests": requests,
+                "retried": self.retried,
+                "failed": self.failed,
+                "timeouts": self.timeouts,
+                "connections_opened": self.connections_opened,
+                "connection_reuse": (
+                    1 - self.connections_opened / requests if requests else 0.0
+                ),
+                "latency_avg": self.latency_total / requests if requests else 0.0,
+                "latency_max": self.latency_max,
+            }
+
+
+class UpstreamClients:
+    """The clients of every configured account, by username."""
+
+    def __init__(self):
+        self._clients: dict[str, DigiposClient] = {}
+        self.scheduler = AccountScheduler()
+        self.hedge = False
+        self.hedge_percentile = 95.0
+        self.hedge_budget = 0.1
+        self._latencies: deque[float] = deque(maxlen=HEDGE_WINDOW)
+        self.hedge_calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def configure(self, settings: UpstreamSettings) -> None:
+        """Apply the [upstream] breaker and hedging policy.
+
+        Raises:
+            ValueError: If a value is out of range
+        """
+        if (
+            not 0 < settings.hedge_percentile < 100
+            or not 0 <= settings.hedge_budget <= 1
+        ):
+            raise ValueError(
+                f"Invalid hedge policy: {settings.hedge_percentile}, "
+                f"{settings.hedge_budget}"
+            )
+        self.scheduler.configure_breaker(
+            settings.breaker_failures, settings.breaker_cooldown
+        )
+        self.hedge = settings.hedge
+        self.hedge_percentile = settings.hedge_percentile
+        self.hedge_budget = settings.hedge_budget
+
+    def start(
+        self,
+        accounts: Iterable[DigiposSettings],
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        """Create a client per account (call once at application startup)."""
+        for account in accounts:
+            if account.username not in self._clients:
+                self._clients[account.username] = DigiposClient(account, transport)
+                self.scheduler.add(
+                    account.username,
+                    weight=account.weight,
+                    rate_limit=account.rate_limit,
+                    burst=account.burst,
+                    slow_after=account.time_out * EJECT_LATENCY_RATIO,
+                )
+        if self._clients:
+            logger.info(f"Upstream clients started: {', '.join(self._clients)}")
+
+    async def aclose(self) -> None:
+        """Close every client's connections."""
+        clients, self._clients = self._clients, {}
+        self.scheduler.clear()
+        for client in clients.values():
+            await client.aclose()
+
+    @property
+    def accounts(self) -> list[str]:
+        return list(self._clients)
+
+    def get(self, account: str | None = None) -> DigiposClient:
+        """Client of ``account`` (None for the first configured one).
+
+        Raises:
+            UpstreamNotConfiguredError: If there is no such account
+        """
+        if account is None:
+            client = next(iter(self._clients.values()), None)
+        else:
+            client = self._clients.get(account)
+        if client is None:
+            raise UpstreamNotConfiguredError(context={"account": account})
+        return client
+
+    @asynccontextmanager
+    async def acquire(self, account: str | None = None) -> AsyncIterator[DigiposClient]:
+        """Client for one upstream call, picked by the account scheduler.
+
+        Args:
+            account: Use this account's client, None to route the call to
+                the least loaded healthy account with rate to spare
+
+        Yields:
+            The chosen account's client
+
+        Raises:
+            UpstreamNotConfiguredError: If there is no such account
+            UpstreamBusyError: If every eligible account is rate limited
+        """
+        async with self.scheduler.acquire(account) as username:
+            yield self._clients[username]
+
+    async def fetch_catalog(
+        self,
+        category: str,
+        account: str | None = None,
+        params: Mapping[str, Any] | None = None,
+    ) -> bytes:
+        """Fetch the raw catalog of ``category`` through the scheduler.
+
+        Scheduled calls (no ``account``) are hedged when enabled, with at
+        least two accounts and enough latency samples.
+
+        Raises:
+            UpstreamNotConfiguredError: If there is no such account
+            UpstreamCircuitOpenError: If every eligible breaker is open
+            UpstreamBusyError: If every eligible account is rate limited
+            UpstreamGenericError: If the request fails or is not a 2xx
+            UpstreamTimeoutError: If the request times out
+        """
+        delay = self.hedge_delay() if account is None else None
+        if delay is None:
+            return await self._fetch(category, account, params, [])
+
+        self.hedge_calls += 1
+        used: list[str] = []
+        primary = asyncio.ensure_future(self._fetch(category, None, params, used))
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            # Not hedged when the primary is done, still queued for a token
+            # (upstream is not what is slow) or the budget is spent
+            if done or not used or self.hedged >= self.hedge_budget * self.hedge_calls:
+                return await primary
+            hedge = asyncio.ensure_future(
+                self._fetch(category, None, params, used, wait=False)
+            )
+            return await self._race(primary, hedge, used)
+        finally:
+            primary.cancel()
+
+    async def _race(
+        self, primary: asyncio.Future, hedge: asyncio.Future, used: list[str]
+    ) -> bytes:
+        """First successful response of the primary and its hedge."""
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                            INSTRUMENTATION.incr("upstream.hedge_wins")
+                        return task.result()
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            if len(used) > 1:
+                self.hedged += 1
+                INSTRUMENTATION.incr("upstream.hedged")
+
+    async def _fetch(
+        self,
+        category: str,
+        account: str | None,
+        params: Mapping[str, Any] | None,
+        used: MutableSequence[str],
+        wait: bool = True,
+    ) -> bytes:
+        """One scheduled fetch; appends its account to ``used``."""
+        async with self.scheduler.acquire(account, exclude=used, wait=wait) as name:
+            used.append(name)
+            start = perf_counter()
+            body = await self._clients[name].fetch_catalog(category, params=params)
+        self._latencies.append(perf_counter() - start)
+        return body
+
+    def hedge_delay(self) -> float | None:
+        """Latency after which a scheduled call is hedged, None if not now."""
+        samples = len(self._latencies)
+        if not self.hedge or len(self._clients) < 2 or samples < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(samples - 1, int(samples * self.hedge_percentile / 100))]
+
+    def stats(self) -> dict[str, int | float]:
+        """Counters summed over every account."""
+        totals: dict[str, int | float] = {
+            "accounts": len(self._clients),
+            "requests": 0,
+            "retried": 0,
+            "failed": 0,
+            "timeouts": 0,
+            "connections_opened": 0,
+        }
+        for client in self._clients.values():
+            stats = client.stats()
+            for key in totals.keys() - {"accounts"}:
+                totals[key] += stats[key]
+        return {
+            **totals,
+            **self.scheduler.stats(),
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": self.hedged / self.hedge_calls if self.hedge_calls else 0.0,
+            "hedge_win_rate": self.hedge_wins / self.hedged if self.hedged else 0.0,
+            "hedge_delay": self.hedge_delay() or 0.0,
+        }
+
+
+# Started in the app lifespan from the [[digipos]] accounts
+UPSTREAM = UpstreamClients()
@@ -0,0 +1,115 @@
+"""Columnar product filtering for large catalogs (optional, needs NumPy).
+
+The row-wise path runs ``ExclusionRules.match`` once per product. Here the
+same rules run per column instead:
+
+- subcategory and quota values repeat heavily, so those columns are
+  dictionary-encoded and each rule runs once per *distinct* value; the
+  per-row result is a single NumPy gather
+- product names only matter up to the longest excluded prefix, so they
+  are cut to that length and encoded the same way
+
+Rules are combined in the row-wise order (subcategory, name, quota), so
+drop counts per rule match too, and surviving products keep their order:
+the output is identical to the row-wise path.
+
+Install with ``pip install mkit-trimmer[columnar]``; without NumPy the
+processors keep filtering row by row.
+"""
+
+from collections import Counter
+from collections.abc import Callable
+from typing import Any
+
+from app.services.digipos.exclusions import (
+    PRODUCTNAME,
+    QUOTA_METADATA,
+    SUBCATEGORY,
+    ExclusionRules,
+)
+from app.services.digipos.product import Product
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+HAS_NUMPY = np is not None
+
+# Below this many products building the columns costs more than it saves
+COLUMNAR_MIN_PRODUCTS = 2000
+
+
+def _distinct_mask(values: list[Any], predicate: Callable[[Any], bool]):
+    """Evaluate ``predicate`` once per distinct value, return a row mask.
+
+    Raises:
+        TypeError: If a value is unhashable
+    """
+    index: dict[Any, int] = {}
+    codes = np.fromiter(
+        (index.setdefault(value, len(index)) for value in values),
+        dtype=np.intp,
+        count=len(values),
+    )
+    hits = np.fromiter(map(predicate, index), dtype=bool, count=len(index))
+    return hits[codes]
+
+
+def _prefix_mask(names: list[Any], exclusions: ExclusionRules):
+    """Row mask of names starting with any excluded prefix (ignoring case).
+
+    The trie never reads past its longest pattern, so only that many
+    leading characters matter; those repeat across names far more than
+    whole names do, and are dictionary-encoded like the other columns.
+    """
+    longest = max(map(len, exclusions.name_prefixes))
+    return _distinct_mask(
+        [name[:longest] for name in names], exclusions.name_trie.match
+    )
+
+
+def filter_columns(
+    products: list[Product], exclusions: ExclusionRules
+) -> tuple[list[Product], Counter[str]]:
+    """Drop excluded products using column-wise masks.
+
+    Returns:
+        The kept products (in order) and the number dropped per rule
+
+    Raises:
+        TypeError: If a subcategory or quota value is unhashable or a name
+            is not a string (callers fall back to the row-wise path)
+    """
+    excluded = np.zeros(len(products), dtype=bool)
+    dropped: Counter[str] = Counter()
+
+    masks = []
+    if exclusions.subcategories is not None:
+        subcategories = [product.subcategory for product in products]
+        masks.append(
+            (
+                SUBCATEGORY,
+                _distinct_mask(subcategories, exclusions.subcategories.__contains__),
+            )
+        )
+    if exclusions.name_trie:
+        names = [product.product_name for product in products]
+        masks.append((PRODUCTNAME, _prefix_mask(names, exclusions)))
+    if exclusions.quota_patterns:
+        quotas = [product.quota for product in products]
+        masks.append(
+            (QUOTA_METADATA, _distinct_mask(quotas, exclusions.quota_excluded))
+        )
+
+    for rule, mask in masks:
+        # A product counts against the first rule that excludes it
+        count = int(np.count_nonzero(mask & ~excluded))
+        if count:
+            dropped[rule] = count
+        excluded |= mask
+
+    if not dropped:
+        return products, dropped
+    kept = np.flatnonzero(~excluded).tolist()
+    return [products[i] for i in kept], dropped
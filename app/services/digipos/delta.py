@@ -0,0 +1,54 @@
+"""Delta output: only the products that changed since a member's last trim.
+
+Members poll the same category over and over, and on a stable catalog
+almost every product is the same as last time. For each (member, category)
+the server keeps the fingerprints of the last output, productId -> hash of
+the fields a product line shows (name, quota, total and price). The next
+trim sends only added and changed products in the usual format, followed by
+``#id|-`` removal markers; a resync (or an unknown or expired state) sends
+the whole catalog again.
+"""
+
+import hashlib
+from dataclasses import dataclass
+from typing import Any
+
+from app.services.digipos.product import Product
+
+# Fingerprints are only compared for equality, 8 bytes is plenty
+FINGERPRINT_SIZE = 8
+
+
+def product_fingerprint(product: Product) -> bytes:
+    """Hash of the fields that appear in a product's output line.
+
+    Taken before quota optimization, so a tier change (the catalog growing
+    or shrinking) does not mark unchanged products as changed.
+    """
+    return hashlib.blake2b(
+        f"{product.product_name}\x1f{product.quota}\x1f"
+        f"{product.total}\x1f{product.price}".encode(),
+        digest_size=FINGERPRINT_SIZE,
+    ).digest()
+
+
+@dataclass(frozen=True, slots=True)
+class Delta:
+    """Delta output of one trim.
+
+    Attributes:
+        text: Added and changed products, then removal markers
+        fingerprints: productId -> fingerprint of the whole current catalog,
+            the state the next delta is computed against
+        added: Products not in the previous output
+        changed: Products whose fingerprint changed
+        removed: Products no longer in the catalog
+        full: Whether this is a full resync (every product sent)
+    """
+
+    text: str
+    fingerprints: dict[Any, bytes]
+    added: int
+    changed: int
+    removed: int
+    full: bool = False
@@ -0,0 +1,82 @@
+"""Compiled exclusion rules for product filtering.
+
+Each processor compiles its ``get_exclude_*`` lists once into an
+``ExclusionRules`` instance, which is then used as a single predicate
+for every product instead of three separate filter passes.
+"""
+
+import hashlib
+from collections.abc import Iterable
+
+from app.services.digipos.matchers import AhoCorasick, PrefixTrie
+from app.services.digipos.product import Product
+
+# Rule names, in the order they are checked (also used as counter keys)
+SUBCATEGORY = "subcategory"
+PRODUCTNAME = "productname"
+QUOTA_METADATA = "quota_metadata"
+
+# Below this many quota patterns a plain ``in`` loop (C speed) beats walking
+# the automaton in Python; above it the automaton's flat cost wins
+AUTOMATON_MIN_PATTERNS = 32
+
+
+class ExclusionRules:
+    """Exclusion lists compiled into one predicate."""
+
+    def __init__(
+        self,
+        subcategories: Iterable[str],
+        productnames: Iterable[str],
+        quota_metadata: Iterable[str],
+    ):
+        subcategories = list(subcategories)
+        productnames = list(productnames)
+        quota_metadata = list(quota_metadata)
+        # Identifies the rule set (used in result cache keys)
+        self.fingerprint = hashlib.blake2b(
+            repr((subcategories, productnames, quota_metadata)).encode(),
+            digest_size=8,
+        ).hexdigest()
+
+        # Skip if empty or all empty strings (same as the old per-pass check)
+        self.subcategories = frozenset(subcategories) if any(subcategories) else None
+
+        self.name_prefixes = tuple(p for p in productnames if p.strip())
+        self.name_trie = PrefixTrie(self.name_prefixes)
+
+        self.quota_patterns = tuple(p for p in quota_metadata if p.strip())
+        self.quota_automaton = (
+            AhoCorasick(self.quota_patterns)
+            if len(self.quota_patterns) >= AUTOMATON_MIN_PATTERNS
+            else None
+        )
+
+    def match(self, product: Product) -> str | None:
+        """Return the name of the first rule excluding ``product``, or None."""
+        if self.subcategories is not None:
+            try:
+                if product.subcategory in self.subcategories:
+                    return SUBCATEGORY
+            except TypeError:
+                pass  # unhashable upstream value, equal to no configured name
+
+        if self.name_trie and self.name_trie.match(product.product_name):
+            return PRODUCTNAME
+
+        # Inlined quota_excluded: this runs once per product
+        if self.quota_automaton is not None:
+            if self.quota_automaton.search(product.quota):
+                return QUOTA_METADATA
+        elif self.quota_patterns:
+            quota = product.quota
+            if any(pattern in quota for pattern in self.quota_patterns):
+                return QUOTA_METADATA
+
+        return None
+
+    def quota_excluded(self, quota: str) -> bool:
+        """True if ``quota`` contains any quota metadata pattern."""
+        if self.quota_automaton is not None:
+            return self.quota_automaton.search(quota)
+        return any(pattern in quota for pattern in self.quota_patterns)
@@ -3,13 +3,26 @@
 Routes categories to the correct processor type:
 - RECHARGE: For mobile number categories (DATA, VOICE_SMS, etc.)
 - ACTIVATION: For VCR/VF categories
+
+Processors are built once per category by ``register_processors`` (called
+at application startup and on config reloads) and looked up with
+``get_processor``. A processor holds no per-request state, so one instance
+is shared by every request.
 """
 
+from threading import Lock
+from types import MappingProxyType
 from typing import ClassVar
 
+from loguru import logger
+
 from app.services.digipos.actvcr_parser import ActivationProcessor
 from app.services.digipos.base_parser import BaseProcessor
+from app.services.digipos.columnar import HAS_NUMPY
+from app.services.digipos.exclusions import ExclusionRules
+from app.services.digipos.quota_rewriter import DEFAULT_QUOTA_REWRITER, QuotaRewriter
 from app.services.digipos.recharge_parser import RechargeProcessor
+from app.services.digipos.rules import RuleSet
 
 
 class ProcessorFactory:
@@ -32,21 +45,112 @@ class ProcessorFactory:
         "VF",
     }
 
+    # category -> shared processor, replaced as a whole (never mutated)
+    _processors: ClassVar[MappingProxyType[str, BaseProcessor]] = MappingProxyType({})
+    _register_lock: ClassVar[Lock] = Lock()
+    # Rules the current registry was compiled from, and their quota rewriter
+    rules: ClassVar[RuleSet] = RuleSet()
+    quota_rewriter: ClassVar[QuotaRewriter] = DEFAULT_QUOTA_REWRITER
+
     @classmethod
-    def create_processor(cls, category: str) -> BaseProcessor:
-        """Create processor for given category."""
+    def register_processors(cls, rules: RuleSet | None = None) -> None:
+        """Build one processor per supported category from ``rules``.
+
+        All compilation (exclusion matchers, quota patterns, fingerprints)
+        happens here, so request handling only does a dict lookup. The
+        registry is swapped in as a whole: concurrent lookups see either the
+        old or the new set, and requests already holding an old processor
+        finish with it. Registering the current rules again is a no-op.
+
+        Args:
+            rules: Parser rules (None uses the built-in defaults)
+        """
+        rules = RuleSet() if rules is None else rules
+        if cls._processors and rules.version == cls.rules.version:
+            return
+        if rules.columnar and not HAS_NUMPY:
+            logger.warning("Columnar filtering needs numpy, filtering row by row")
+
+        quota_rewriter = cls._build_quota_rewriter(rules)
+        processors = {
+            category: cls.create_processor(category, rules, quota_rewriter)
+            for category in cls.get_supported_categories()
+        }
+        cls._processors = MappingProxyType(processors)
+        cls.rules = rules
+        cls.quota_rewriter = quota_rewriter
+        logger.info(f"Registered {len(processors)} processors, rules {rules.version}")
+
+    @classmethod
+    def get_processor(cls, category: str) -> BaseProcessor:
+        """Get the shared processor for given category."""
+        processor = cls._processors.get(category.upper())
+        if processor is not None:
+            return processor
+
+        # Not registered yet (e.g. used outside the app): register once
+        if not cls._processors:
+            with cls._register_lock:
+                if not cls._processors:
+                    cls.register_processors()
+            return cls.get_processor(category)
+
+        raise ValueError(
+            f"Unsupported category: {category}. "
+            f"Supported: {cls.RECHARGE_CATEGORIES | cls.ACTIVATION_CATEGORIES}"
+        )
+
+    @classmethod
+    def _build_quota_rewriter(cls, rules: RuleSet) -> QuotaRewriter:
+        """Compile the quota rules, keeping the current rewriter if unchanged.
+
+        Reusing the current instance keeps its memo warm across reloads
+        that did not touch units or abbreviations.
+        """
+        if rules.units is None and rules.abbreviations is None:
+            return DEFAULT_QUOTA_REWRITER
+        rewriter = QuotaRewriter(rules.units, rules.abbreviations)
+        for current in (cls.quota_rewriter, DEFAULT_QUOTA_REWRITER):
+            if current.fingerprint == rewriter.fingerprint:
+                return current
+        return rewriter
+
+    @classmethod
+    def create_processor(
+        cls,
+        category: str,
+        rules: RuleSet | None = None,
+        quota_rewriter: QuotaRewriter | None = None,
+    ) -> BaseProcessor:
+        """Create a new processor for given category (prefer get_processor)."""
         category_upper = category.upper()
+        rules = RuleSet() if rules is None else rules
 
         if category_upper in cls.RECHARGE_CATEGORIES:
-            return RechargeProcessor(category_upper)
+            processor_cls = RechargeProcessor
         elif category_upper in cls.ACTIVATION_CATEGORIES:
-            return ActivationProcessor(category_upper)
+            processor_cls = ActivationProcessor
         else:
             raise ValueError(
                 f"Unsupported category: {category}. "
                 f"Supported: {cls.RECHARGE_CATEGORIES | cls.ACTIVATION_CATEGORIES}"
             )
 
+        # Config lists replace the processor's built-in get_exclude_* lists
+        lists = rules.exclusions.get(cls.get_processor_type(category_upper))
+        exclusions = (
+            ExclusionRules(
+                lists.subcategories, lists.productnames, lists.quota_metadata
+            )
+            if lists is not None
+            else None
+        )
+        processor = processor_cls(
+            category_upper, rules.max_chars, exclusions, quota_rewriter
+        )
+        processor.columnar = rules.columnar and HAS_NUMPY
+        return processor
+
     @classmethod
     def get_supported_categories(cls) -> set[str]:
         """Get all supported categories."""
@@ -0,0 +1,178 @@
+"""Incremental JSON reader for upstream catalog responses.
+
+``ArrayItemReader`` is fed the raw response body chunk by chunk (e.g. from
+``request.stream()``) and returns the elements of the product array
+(``paket`` or ``res``) as soon as each is complete. Only the undecoded
+tail of the body is buffered, so memory stays bounded by the chunk size
+and the largest single value, however large the catalog.
+"""
+
+import codecs
+import json
+import re
+from json.decoder import WHITESPACE
+from typing import Any
+
+_decoder = json.JSONDecoder()
+
+# Matches the rest of the buffer if it could still extend a number ("2" then ".5")
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*\Z")
+
+# Parser states: where the next token of the top-level object belongs
+_START = "start"
+_FIRST_KEY = "first_key"
+_KEY = "key"
+_COLON = "colon"
+_VALUE = "value"
+_FIRST_ITEM = "first_item"
+_ITEM = "item"
+_NEXT_ITEM = "next_item"
+_NEXT_KEY = "next_key"
+_END = "end"
+
+
+def _skip_ws(document: str, idx: int) -> int:
+    return WHITESPACE.match(document, idx).end()  # type: ignore[union-attr]
+
+
+def _expect(document: str, idx: int, char: str) -> int:
+    """Check ``char`` at ``idx`` and return the index after it."""
+    if document[idx : idx + 1] != char:
+        raise json.JSONDecodeError(f"Expecting '{char}'", document, idx)
+    return idx + 1
+
+
+class ArrayItemReader:
+    """Push parser for the elements of ``document[key]``.
+
+    Other top-level values are decoded and dropped. If the key is missing
+    (or not an array) nothing is returned, matching ``data.get(key, [])``
+    on a fully loaded document. A value cut by a chunk boundary is decoded
+    once the rest of it arrives.
+    """
+
+    def __init__(self, key: str):
+        """Start reading a new document.
+
+        Args:
+            key: Name of the top-level array to stream
+        """
+        self.key = key
+        self.size = 0  # bytes fed so far
+        self._text = codecs.getincrementaldecoder("utf-8-sig")()
+        self._buffer = ""
+        self._state = _START
+        self._name: str | None = None
+
+    def feed(self, data: bytes) -> list[Any]:
+        """Add the next chunk of the document.
+
+        Returns:
+            The array elements completed by this chunk
+
+        Raises:
+            json.JSONDecodeError: If the document is not valid JSON so far
+        """
+        self.size += len(data)
+        self._buffer += self._text.decode(data)
+        return self._parse(final=False)
+
+    def close(self) -> list[Any]:
+        """End the document.
+
+        Returns:
+            The array elements completed by the end of the document
+
+        Raises:
+            json.JSONDecodeError: If the document is incomplete or invalid
+        """
+        self._buffer += self._text.decode(b"", final=True)
+        items = self._parse(final=True)
+        if self._state != _END:
+            raise json.JSONDecodeError(
+                "Unexpected end of document", self._buffer, len(self._buffer)
+            )
+        return items
+
+    def _decode(self, buffer: str, idx: int, final: bool) -> tuple[Any, int] | None:
+        """Decode the value at ``idx``, None if it may continue in a later chunk."""
+        try:
+            value, end = _decoder.raw_decode(buffer, idx)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return None
+        # A number or literal at the end of the buffer may not be complete,
+        # nor may a number followed by the start of a fraction or exponent
+        if not final and _NUMBER_TAIL.match(buffer, end):
+            return None
+        return value, end
+
+    def _parse(self, final: bool) -> list[Any]:  # noqa: C901
+        buffer = self._buffer
+        idx = 0
+        items = []
+        while True:
+            idx = _skip_ws(buffer, idx)
+            if idx == len(buffer):
+                break
+            state = self._state
+            char = buffer[idx]
+
+            if state == _START:
+                idx = _expect(buffer, idx, "{")
+                self._state = _FIRST_KEY
+            elif state == _FIRST_KEY and char == "}":
+                idx += 1
+                self._state = _END
+            elif state in (_FIRST_KEY, _KEY):
+                decoded = self._decode(buffer, idx, final)
+                if decoded is None:
+                    break
+                name, end = decoded
+                if not isinstance(name, str):
+                    raise json.JSONDecodeError("Expecting property name", buffer, idx)
+                self._name, idx = name, end
+                self._state = _COLON
+            elif state == _COLON:
+                idx = _expect(buffer, idx, ":")
+                self._state = _VALUE
+            elif state == _VALUE and self._name == self.key and char == "[":
+                idx += 1
+                self._state = _FIRST_ITEM
+            elif state == _VALUE:
+                decoded = self._decode(buffer, idx, final)
+                if decoded is None:
+                    break
+                idx = decoded[1]
+                self._state = _NEXT_KEY
+            elif state == _FIRST_ITEM and char == "]":
+                idx += 1
+                self._state = _NEXT_KEY
+            elif state in (_FIRST_ITEM, _ITEM):
+                decoded = self._decode(buffer, idx, final)
+                if decoded is None:
+                    self._state = _ITEM
+                    break
+                item, idx = decoded
+                items.append(item)
+                self._state = _NEXT_ITEM
+            elif state == _NEXT_ITEM:
+                if char == "]":
+                    idx += 1
+                    self._state = _NEXT_KEY
+                else:
+                    idx = _expect(buffer, idx, ",")
+                    self._state = _ITEM
+            elif state == _NEXT_KEY:
+                if char == "}":
+                    idx += 1
+                    self._state = _END
+                else:
+                    idx = _expect(buffer, idx, ",")
+                    self._state = _KEY
+            else:
+                raise json.JSONDecodeError("Extra data", buffer, idx)
+
+        self._buffer = buffer[idx:]
+        return items
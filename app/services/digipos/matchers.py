@@ -0,0 +1,118 @@
+"""Pattern matchers built once per exclusion rule set.
+
+- PrefixTrie: case-insensitive "name starts with any pattern" check
+- AhoCorasick: "text contains any pattern" check
+
+Both walk the input once, so the cost per product depends on the length
+of the product name / quota, not on how many patterns are configured.
+"""
+
+from collections.abc import Iterable
+
+# Terminal marker stored inside trie nodes
+_END = ""
+
+# Dotted and dotless i, which re.IGNORECASE matches to both "i" and "I"
+_FOLD_EXCEPTIONS = {"\u0131": "i", "\u0130": "i"}
+
+
+def _fold(char: str) -> str:
+    """Case-fold a single character the way ``re.IGNORECASE`` compares it.
+
+    ``str.casefold`` where it keeps one character (so the long s folds like
+    "s" and the final sigma like a sigma), else ``str.lower``, else the
+    character itself.
+    """
+    folded = char.casefold()
+    if len(folded) != 1:
+        folded = char.lower()
+        if len(folded) != 1:
+            folded = char
+    return _FOLD_EXCEPTIONS.get(folded, folded)
+
+
+class PrefixTrie:
+    """Case-insensitive prefix matcher for product name patterns."""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._root: dict[str, dict] = {}
+        self.size = 0
+
+        for pattern in patterns:
+            if not pattern:
+                continue
+            node = self._root
+            for char in pattern:
+                node = node.setdefault(_fold(char), {})
+            if _END not in node:
+                node[_END] = {}
+                self.size += 1
+
+    def __bool__(self) -> bool:
+        return self.size > 0
+
+    def match(self, text: str) -> bool:
+        """Return True if ``text`` starts with any pattern (ignoring case)."""
+        node = self._root
+        for char in text:
+            node = node.get(_fold(char))
+            if node is None:
+                return False
+            if _END in node:
+                return True
+        return False
+
+
+class AhoCorasick:
+    """Aho-Corasick automaton for "contains any pattern" checks."""
+
+    def __init__(self, patterns: Iterable[str]):
+        # State 0 is the root; each state has goto edges, a fail link and
+        # a flag telling whether any pattern ends in it (or its fail chain)
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._hit: list[bool] = [False]
+        self.size = 0
+
+        for pattern in set(patterns):
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._hit.append(False)
+                state = next_state
+            self._hit[state] = True
+            self.size += 1
+
+        # Breadth-first pass to build fail links
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                if self._hit[self._fail[next_state]]:
+                    self._hit[next_state] = True
+                queue.append(next_state)
+
+    def __bool__(self) -> bool:
+        return self.size > 0
+
+    def search(self, text: str) -> bool:
+        """Return True if ``text`` contains any pattern."""
+        goto, fail, hit = self._goto, self._fail, self._hit
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if hit[state]:
+                return True
+        return False
@@ -0,0 +1,310 @@
+"""Process-pool offload for trimming large payloads.
+
+Trimming is pure CPU work, so a multi-megabyte catalog processed inside a
+FastAPI worker blocks every other request on that worker. ``TrimOffloader``
+sends payloads of ``threshold`` bytes or more to a pre-warmed
+``ProcessPoolExecutor`` and keeps small ones inline. The number of
+payloads waiting for or running in the pool is bounded by ``max_pending``.
+What a worker records (parser metrics, quota memo counters) is sent back
+with each result and merged into the server's instrumentation.
+
+Workers compile the processors when they start, and a config reload
+replaces the pool with one warmed on the new rules (off the event loop),
+so payloads never carry the rules or wait for a recompile. A pool broken
+by a dead worker (e.g. OOM-killed) is replaced and the payload is retried
+once on the new pool. A payload that may have killed a worker is never run
+inline, where it could take the server down with it.
+"""
+
+import asyncio
+import multiprocessing
+import time
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+from typing import Any
+
+from loguru import logger
+
+from app.custom.exceptions import ParserBusyError
+from app.custom.log_utils import INSTRUMENTATION
+from app.services.digipos.factory_parser import ProcessorFactory
+from app.services.digipos.rules import RuleSet
+
+# Defaults, overridden by [parser.digipos] offload_* settings
+OFFLOAD_THRESHOLD = 256_000  # bytes of the raw body
+OFFLOAD_WORKERS = 2
+OFFLOAD_MAX_PENDING = 8
+
+
+def _init_worker(rules: RuleSet, instrumentation: bool) -> None:
+    """Compile processors once per worker process."""
+    INSTRUMENTATION.configure(enabled=instrumentation)
+    ProcessorFactory.register_processors(rules)
+
+
+def _ping() -> None:
+    """No-op task used to make sure every worker has started."""
+
+
+def _trim(
+    category: str, response_data: str | bytes, method: str, args: tuple[Any, ...]
+) -> Any:
+    """Run the pipeline ``method`` of the category's processor."""
+    processor = ProcessorFactory.get_processor(category)
+    return getattr(processor, method)(response_data, *args)
+
+
+def _trim_in_worker(
+    category: str,
+    response_data: str | bytes,
+    method: str = "process_response",
+    args: tuple[Any, ...] = (),
+    rules: RuleSet | None = None,
+) -> tuple[Any, float, float, tuple[Any, ...]]:
+    """Run the pipeline in a worker and report when it started and finished.
+
+    ``rules`` are only sent while a reload is replacing the pool, for
+    payloads that reach a worker still on the previous rules. The metrics
+    the worker recorded since its last task are returned too.
+    """
+    started_at = time.time()
+    if rules is not None:
+        ProcessorFactory.register_processors(rules)
+    result = _trim(category, response_data, method, args)
+    finished_at = time.time()
+    cache = ProcessorFactory.quota_rewriter.cache
+    metrics = (
+        *INSTRUMENTATION.drain(),
+        cache.take_counters() if cache is not None else {},
+    )
+    return result, started_at, finished_at, metrics
+
+
+def _new_pool(workers: int, rules: RuleSet) -> tuple[ProcessPoolExecutor, list[Future]]:
+    """Spawn a pool compiling ``rules``, with a ping per worker to await.
+
+    Workers are spawned (not forked) so they never inherit the server's
+    threads or event loop.
+    """
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(rules, INSTRUMENTATION.enabled),
+    )
+    return pool, [pool.submit(_ping) for _ in range(workers)]
+
+
+class TrimOffloader:
+    """Runs large trims in a process pool and small ones inline."""
+
+    def __init__(self):
+        self.threshold = OFFLOAD_THRESHOLD
+        self.max_pending = OFFLOAD_MAX_PENDING
+        self.workers = OFFLOAD_WORKERS
+        self._pool: ProcessPoolExecutor | None = None
+        self._rules_version: str | None = None  # rules the pool's workers use
+        self._lock = Lock()
+        self.pending = 0
+        self.inline = 0
+        self.offloaded = 0
+        self.rejected = 0
+        self.failed = 0
+        self.restarts = 0
+        self.quota_cache: Counter[str] = Counter()  # workers' memo counters
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.execution_total = 0.0
+        self.execution_max = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._pool is not None
+
+    async def start(
+        self,
+        workers: int = OFFLOAD_WORKERS,
+        threshold: int = OFFLOAD_THRESHOLD,
+        max_pending: int = OFFLOAD_MAX_PENDING,
+    ) -> None:
+        """Start and pre-warm the pool (call once at application startup).
+
+        Each worker registers its processors (from the current
+        ``ProcessorFactory.rules``, so register those first) before the
+        first payload arrives; the event loop keeps running meanwhile.
+        """
+        if self._pool is not None:
+            return
+        self.workers = workers
+        self.threshold = threshold
+        self.max_pending = max_pending
+        rules = ProcessorFactory.rules
+        pool, pings = _new_pool(workers, rules)
+        await asyncio.gather(*map(asyncio.wrap_future, pings))
+        self._pool, self._rules_version = pool, rules.version
+        logger.info(
+            f"Trim offload pool started: {workers} workers, "
+            f"threshold {threshold} chars, max pending {max_pending}"
+        )
+
+    def reload(self, rules: RuleSet) -> None:
+        """Replace the pool with one warmed on ``rules`` (after a reload).
+
+        Blocks until the new workers have compiled the rules, so call it
+        off the event loop (the config watcher's thread). Payloads already
+        in the old pool finish there.
+        """
+        if self._pool is None or rules.version == self._rules_version:
+            return
+        pool, pings = _new_pool(self.workers, rules)
+        for future in pings:
+            future.result()
+        with self._lock:
+            old, self._pool = self._pool, pool
+            self._rules_version = rules.version
+        if old is not None:
+            old.shutdown(wait=False)
+        logger.info(f"Trim offload pool reloaded, rules {rules.version}")
+
+    def _replace_broken(self, broken: ProcessPoolExecutor) -> None:
+        """Swap a broken pool for a new one (once, however many noticed)."""
+        with self._lock:
+            if self._pool is not broken:
+                return
+            rules = ProcessorFactory.rules
+            self._pool, _ = _new_pool(self.workers, rules)
+            self._rules_version = rules.version
+            self.restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+        logger.error("Trim offload pool broken (worker died), started a new one")
+
+    def shutdown(self) -> None:
+        """Stop the pool, cancelling payloads that have not started yet."""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+            logger.info("Trim offload pool stopped")
+
+    async def run(
+        self,
+        category: str,
+        response_data: str | bytes,
+        method: str = "process_response",
+        *args: Any,
+        size: int | None = None,
+    ) -> Any:
+        """Trim ``response_data``, in the pool if it is large enough.
+
+        A pool found broken is replaced and the payload is retried there
+        once; if that pool breaks too the payload is rejected.
+
+        Args:
+            category: Category type (DATA, VOICE_SMS, VF, etc.)
+            response_data: Raw JSON response (string or undecoded bytes),
+                or a ``CatalogSnapshot`` for ``process_snapshot``
+            method: Processor pipeline to run (``process_response``,
+                ``process_pages``, ``process_delta``, ``snapshot_catalog``
+                or ``process_snapshot``)
+            *args: Extra arguments of ``method``, after the payload
+            size: Payload size in bytes compared with ``threshold``
+                (default ``len(response_data)``, bytes for a raw body)
+
+        Returns:
+            What ``method`` returns (the trimmed text by default)
+
+        Raises:
+            ParserBusyError: If ``max_pending`` large payloads are in flight,
+                or the payload broke the pool twice
+            ValueError: If category is not supported
+        """
+        if size is None:
+            size = len(response_data)
+        if self._pool is None or size < self.threshold:
+            with self._lock:
+                self.inline += 1
+            return _trim(category, response_data, method, args)
+
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise ParserBusyError(
+                    context={"category": category, "pending": self.pending}
+                )
+            self.pending += 1
+
+        rules = ProcessorFactory.rules
+        submitted_at = time.time()
+        try:
+            for retry in (False, True):
+                try:
+                    # Under the lock, so a reload cannot shut the pool down
+                    # in between
+                    with self._lock:
+                        pool = self._pool
+                        # Rules changed but the pool is not replaced yet: send them
+                        stale = rules if rules.version != self._rules_version else None
+                        future = pool.submit(
+                            _trim_in_worker,
+                            category,
+                            response_data,
+                            method,
+                            args,
+                            stale,
+                        )
+                    outcome = await asyncio.wrap_future(future)
+                    break
+                except BrokenProcessPool as e:
+                    with self._lock:
+                        self.failed += 1
+                    self._replace_broken(pool)
+                    if retry:
+                        raise ParserBusyError(
+                            message="Trim worker died, try again later.",
+                            context={"category": category, "size": size},
+                        ) from e
+                    logger.warning(f"Retrying {category} payload ({size}) on new pool")
+                except Exception:
+                    with self._lock:
+                        self.failed += 1
+                    raise
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+        result, started_at, finished_at, (counters, timings, cache_counts) = outcome
+        INSTRUMENTATION.merge(counters, timings)
+        queue_wait = max(started_at - submitted_at, 0.0)
+        execution = finished_at - started_at
+        with self._lock:
+            self.offloaded += 1
+            self.quota_cache.update(cache_counts)
+            self.queue_wait_total += queue_wait
+            self.queue_wait_max = max(self.queue_wait_max, queue_wait)
+            self.execution_total += execution
+            self.execution_max = max(self.execution_max, execution)
+        return result
+
+    def quota_cache_stats(self) -> dict[str, int]:
+        """Return the quota memo counters reported back by the workers."""
+        with self._lock:
+            return dict(self.quota_cache)
+
+    def stats(self) -> dict[str, int | float]:
+        """Return a snapshot of the offload counters (times in seconds)."""
+        with self._lock:
+            done = self.offloaded
+            return {
+                "running": self.is_running,
+                "pending": self.pending,
+                "inline": self.inline,
+                "offloaded": done,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "restarts": self.restarts,
+                "queue_wait_avg": self.queue_wait_total / done if done else 0.0,
+                "queue_wait_max": self.queue_wait_max,
+                "execution_avg": self.execution_total / done if done else 0.0,
+                "execution_max": self.execution_max,
+            }
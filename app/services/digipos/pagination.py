@@ -0,0 +1,83 @@
+"""Split trimmed output into pages that fit one downstream message.
+
+The output budget (``max_chars``) is what one downstream message can carry.
+When a catalog is still longer after full optimization, the formatted
+products are packed into pages of at most ``page_size`` characters, cut
+only between products, so every page is a valid trimmed response on its
+own. Joining all pages gives exactly the unpaginated output.
+
+Later pages are fetched with an opaque cursor naming the cached result and
+the page index; they are slices of the cached pages, never a re-parse.
+"""
+
+import base64
+import binascii
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class Page:
+    """One page of a paginated result.
+
+    Attributes:
+        text: Page content
+        number: Page number, starting at 1
+        count: Number of pages in the result
+        next_cursor: Cursor of the next page (None on the last page)
+    """
+
+    text: str
+    number: int
+    count: int
+    next_cursor: str | None
+
+
+def paginate(parts: Iterable[str], page_size: int) -> tuple[str, ...]:
+    """Pack formatted products into pages of at most ``page_size`` chars.
+
+    Products are never split: a single product longer than ``page_size``
+    gets a page of its own. An empty result is one empty page.
+    """
+    pages: list[str] = []
+    current: list[str] = []
+    current_size = 0
+    for part in parts:
+        if current and current_size + len(part) > page_size:
+            pages.append("".join(current))
+            current = []
+            current_size = 0
+        current.append(part)
+        current_size += len(part)
+    if current or not pages:
+        pages.append("".join(current))
+    return tuple(pages)
+
+
+def encode_cursor(result_id: str, index: int) -> str:
+    """Opaque cursor for page ``index`` (0-based) of a cached result."""
+    raw = f"{result_id}:{index}".encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, int] | None:
+    """Return ``(result_id, index)`` of a cursor, or None if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        result_id, index = raw.decode().split(":")
+        page = int(index)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if page < 0:
+        return None
+    return result_id, page
+
+
+def page_at(pages: tuple[str, ...], result_id: str, index: int) -> Page | None:
+    """Build page ``index`` of ``pages`` (None if out of range)."""
+    if not 0 <= index < len(pages):
+        return None
+    next_cursor = (
+        encode_cursor(result_id, index + 1) if index + 1 < len(pages) else None
+    )
+    return Page(pages[index], index + 1, len(pages), next_cursor)
@@ -3,27 +3,495 @@
 Clean API for FastAPI integration.
 """
 
-from app.custom.log_utils import log_execution_time, logger_wraps
+import hashlib
+import time
+from collections.abc import AsyncIterable, AsyncIterator
+from functools import partial
+
+from loguru import logger
+
+from app.custom.exceptions import (
+    ParserCursorNotFoundError,
+    ParserSnapshotNotFoundError,
+    UpstreamGenericError,
+)
+from app.custom.log_utils import INSTRUMENTATION, instrumented
+from app.services.digipos.cache import LRUCache
+from app.services.digipos.client import UPSTREAM
+from app.services.digipos.delta import Delta
 from app.services.digipos.factory_parser import ProcessorFactory
+from app.services.digipos.offload import TrimOffloader
+from app.services.digipos.pagination import Page, decode_cursor, page_at
+from app.services.digipos.refresher import CatalogRefresher
+from app.services.digipos.singleflight import SingleFlight
+from app.services.digipos.snapshots import CatalogSnapshot, SnapshotStore
+
+# Trimmed results keyed by (category, rules version, payload digest).
+# Upstream catalogs change a few times per hour, so a short TTL is enough.
+RESULT_CACHE_TTL = 300  # seconds
+RESULT_CACHE_ENTRIES = 256
+RESULT_CACHE_CHARS = 16_000_000
+
+RESULT_CACHE = LRUCache(
+    RESULT_CACHE_ENTRIES,
+    RESULT_CACHE_CHARS,
+    sizeof=lambda key, result: len(result),  # noqa: ARG005
+    ttl=RESULT_CACHE_TTL,
+)
+
+# Paginated results keyed by result id; cursors point into these, so later
+# pages are slices of the cached pages rather than re-parses.
+PAGE_CACHE_ENTRIES = 256
+PAGE_CACHE_CHARS = 16_000_000
+
+PAGE_CACHE = LRUCache(
+    PAGE_CACHE_ENTRIES,
+    PAGE_CACHE_CHARS,
+    sizeof=lambda key, pages: sum(map(len, pages)),  # noqa: ARG005
+    ttl=RESULT_CACHE_TTL,
+)
+
+# Delta state per (member, category): (rules version, fingerprints of the
+# last output). Bounded by total products tracked; an evicted or expired
+# state just makes the member's next delta a full resync.
+DELTA_STATE_TTL = 3600  # seconds
+DELTA_STATE_ENTRIES = 1024
+DELTA_STATE_PRODUCTS = 2_000_000
+
+DELTA_STATE = LRUCache(
+    DELTA_STATE_ENTRIES,
+    DELTA_STATE_PRODUCTS,
+    sizeof=lambda key, state: len(state[1]),  # noqa: ARG005
+    ttl=DELTA_STATE_TTL,
+)
+
+# Constant metric labels of ``parser.delta``
+_DELTA_LABELS = (("mode", "delta"),)
+_DELTA_FULL_LABELS = (("mode", "full"),)
+
+# Last parsed catalogs per category (configured from [parser.digipos])
+SNAPSHOTS = SnapshotStore()
+
+# Concurrent identical upstream fetches (and their trims) run once
+REFRESH_FLIGHTS = SingleFlight("refresh")
+FETCH_FLIGHTS = SingleFlight("fetch_and_trim")
+
+# Keeps hot categories' snapshots young; started in the app lifespan
+REFRESHER = CatalogRefresher()
 
+# Large payloads are trimmed in a process pool once started (app lifespan)
+OFFLOADER = TrimOffloader()
 
-@log_execution_time
-@logger_wraps()
-def process_category_response(category: str, response_data: str) -> str:
+
+def response_digest(response_data: str | bytes) -> str:
+    """Content hash of a raw upstream response (bytes are hashed as-is)."""
+    if isinstance(response_data, str):
+        response_data = response_data.encode()
+    return hashlib.blake2b(response_data, digest_size=16).hexdigest()
+
+
+@instrumented("parser.process_category_response")
+def process_category_response(category: str, response_data: str | bytes) -> str:
     """Main entry point for processing category responses.
 
+    Results are cached by content, so repeated identical payloads skip the
+    whole pipeline until the entry expires or the processor rules change.
+
+    Args:
+        category: Category type (DATA, VOICE_SMS, VF, etc.)
+        response_data: Raw JSON response (string or undecoded bytes)
+
+    Returns:
+        Processed response string
+
+    Raises:
+        ValueError: If category is not supported
+    """
+    processor = ProcessorFactory.get_processor(category)
+
+    # Identical payload + identical rules -> identical output
+    key = (processor.category, processor.rules_version, response_digest(response_data))
+    result = RESULT_CACHE.get(key)
+    if result is None:
+        result = processor.process_response(response_data)
+        RESULT_CACHE.put(key, result)
+    return result
+
+
+@instrumented("parser.process_category_response_async")
+async def process_category_response_async(
+    category: str, response_data: str | bytes
+) -> str:
+    """Async entry point - large payloads are trimmed in the process pool.
+
+    Same result (and result cache) as ``process_category_response``, but
+    payloads above the offload threshold run in ``OFFLOADER``'s worker
+    processes so they do not block the event loop. Small payloads, or all
+    payloads when the pool is not started, run inline.
+
+    Args:
+        category: Category type (DATA, VOICE_SMS, VF, etc.)
+        response_data: Raw JSON response (string or undecoded bytes)
+
+    Returns:
+        Processed response string
+
+    Raises:
+        ValueError: If category is not supported
+        ParserBusyError: If too many large payloads are already in flight
+    """
+    processor = ProcessorFactory.get_processor(category)
+
+    key = (processor.category, processor.rules_version, response_digest(response_data))
+    result = RESULT_CACHE.get(key)
+    if result is None:
+        result = await OFFLOADER.run(processor.category, response_data)
+        RESULT_CACHE.put(key, result)
+    return result
+
+
+@instrumented("parser.paginate_category_response_async")
+async def paginate_category_response_async(
+    category: str, response_data: str | bytes
+) -> Page:
+    """Async entry point returning the first page of the trimmed output.
+
+    The output is cut between products into pages of at most the
+    processor's ``max_chars``. Pages are cached for ``RESULT_CACHE_TTL``
+    seconds; ``Page.next_cursor`` fetches the next one with ``get_page``.
+
+    Args:
+        category: Category type (DATA, VOICE_SMS, VF, etc.)
+        response_data: Raw JSON response (string or undecoded bytes)
+
+    Returns:
+        Page 1 of the trimmed output
+
+    Raises:
+        ValueError: If category is not supported
+        ParserBusyError: If too many large payloads are already in flight
+    """
+    processor = ProcessorFactory.get_processor(category)
+
+    result_id = hashlib.blake2b(
+        f"{processor.category}|{processor.rules_version}|"
+        f"{response_digest(response_data)}".encode(),
+        digest_size=16,
+    ).hexdigest()
+    pages = PAGE_CACHE.get(result_id)
+    if pages is None:
+        pages = await OFFLOADER.run(
+            processor.category, response_data, "process_pages", processor.max_chars
+        )
+        PAGE_CACHE.put(result_id, pages)
+    return page_at(pages, result_id, 0)
+
+
+@instrumented("parser.delta_category_response_async")
+async def delta_category_response_async(
+    member: str, category: str, response_data: str | bytes, resync: bool = False
+) -> Delta:
+    """Async entry point returning only what changed since the last delta.
+
+    The member's previous output is compared by fingerprint; the first
+    delta of a member and category, or one after ``resync``, an expired
+    state or a rules change, sends the full catalog. The new fingerprints
+    replace the member's state, so every delta is against the last one
+    returned.
+
+    Args:
+        member: Member name (or the client address of an unknown member)
+        category: Category type (DATA, VOICE_SMS, VF, etc.)
+        response_data: Raw JSON response (string or undecoded bytes)
+        resync: Send the full catalog regardless of the previous state
+
+    Returns:
+        Added and changed products and removal markers
+
+    Raises:
+        ValueError: If category is not supported
+        ParserBusyError: If too many large payloads are already in flight
+    """
+    processor = ProcessorFactory.get_processor(category)
+    rules_version = processor.rules_version
+
+    key = (member, processor.category)
+    state = None if resync else DELTA_STATE.get(key)
+    previous = state[1] if state is not None and state[0] == rules_version else None
+    delta = await OFFLOADER.run(
+        processor.category, response_data, "process_delta", previous
+    )
+    DELTA_STATE.put(key, (rules_version, delta.fingerprints))
+    INSTRUMENTATION.incr(
+        "parser.delta", 1, _DELTA_FULL_LABELS if delta.full else _DELTA_LABELS
+    )
+    return delta
+
+
+def get_page(cursor: str) -> Page:
+    """Get a later page of a paginated result from its cursor.
+
+    Raises:
+        ParserCursorNotFoundError: If the cursor is malformed, or its result
+            has expired or been evicted
+    """
+    decoded = decode_cursor(cursor)
+    if decoded is not None:
+        result_id, index = decoded
+        pages = PAGE_CACHE.get(result_id)
+        if pages is not None:
+            page = page_at(pages, result_id, index)
+            if page is not None:
+                return page
+    raise ParserCursorNotFoundError(context={"cursor": cursor})
+
+
+@instrumented("parser.ingest_catalog_async")
+async def ingest_catalog_async(
+    category: str, response_data: str | bytes
+) -> CatalogSnapshot:
+    """Parse an upstream catalog into a new snapshot of its category.
+
+    Decoding and compression run in the offload pool for large payloads.
+    A catalog identical to the latest snapshot only refreshes its
+    ``fetched_at``.
+
+    Args:
+        category: Category type (DATA, VOICE_SMS, VF, etc.)
+        response_data: Raw JSON response (string or undecoded bytes)
+
+    Returns:
+        The stored snapshot
+
+    Raises:
+        ValueError: If category is not supported
+        ParserBusyError: If too many large payloads are already in flight
+    """
+    processor = ProcessorFactory.get_processor(category)
+    snapshot = await OFFLOADER.run(
+        processor.category, response_data, "snapshot_catalog", SNAPSHOTS.codec
+    )
+    return SNAPSHOTS.add(snapshot)
+
+
+@instrumented("parser.refresh_catalog_async")
+async def refresh_catalog_async(
+    category: str, account: str | None = None
+) -> CatalogSnapshot:
+    """Fetch a category's catalog upstream and store it as a snapshot.
+
+    Concurrent refreshes of the same account and category share one fetch.
+
+    Args:
+        category: Category type (DATA, VOICE_SMS, VF, etc.)
+        account: ``[[digipos]]`` username to fetch with (None to let the
+            account scheduler pick)
+
+    Returns:
+        The stored snapshot
+
+    Raises:
+        ValueError: If category is not supported
+        UpstreamNotConfiguredError: If there is no such account
+        UpstreamCircuitOpenError: If every eligible breaker is open
+        UpstreamBusyError: If every eligible account is rate limited
+        UpstreamGenericError: If the upstream request fails
+        UpstreamTimeoutError: If the upstream request times out
+        ParserBusyError: If too many large payloads are already in flight
+    """
+    processor = ProcessorFactory.get_processor(category)
+    return await REFRESH_FLIGHTS.run(
+        (account, processor.category),
+        partial(_refresh_catalog, account, processor.category),
+    )
+
+
+async def _refresh_catalog(account: str | None, category: str) -> CatalogSnapshot:
+    body = await UPSTREAM.fetch_catalog(category, account)
+    return await ingest_catalog_async(category, body)
+
+
+@instrumented("parser.fetch_and_trim_async")
+async def fetch_and_trim_async(
+    category: str, account: str | None = None, destination: str | None = None
+) -> str:
+    """Fetch a catalog upstream and trim it.
+
+    Concurrent calls for the same (account, category, destination) share
+    one fetch and one trim; a catalog without destination also becomes
+    the category's latest snapshot.
+
+    Args:
+        category: Category type (DATA, VOICE_SMS, VF, etc.)
+        account: ``[[digipos]]`` username to fetch with (None to let the
+            account scheduler pick)
+        destination: Destination number the catalog is asked for, if any
+
+    Returns:
+        Processed response string
+
+    Raises:
+        ValueError: If category is not supported
+        UpstreamNotConfiguredError: If there is no such account
+        UpstreamCircuitOpenError: If every eligible breaker is open
+        UpstreamBusyError: If every eligible account is rate limited
+        UpstreamGenericError: If the upstream request fails
+        UpstreamTimeoutError: If the upstream request times out
+        ParserBusyError: If too many large payloads are already in flight
+    """
+    processor = ProcessorFactory.get_processor(category)
+    return await FETCH_FLIGHTS.run(
+        (account, processor.category, destination),
+        partial(_fetch_and_trim, account, processor.category, destination),
+    )
+
+
+async def _fetch_and_trim(
+    account: str | None, category: str, destination: str | None
+) -> str:
+    if destination is None:
+        snapshot = await refresh_catalog_async(category, account)
+        return await process_snapshot_async(category, snapshot.version)
+    body = await UPSTREAM.fetch_catalog(category, account, {"destination": destination})
+    return await process_category_response_async(category, body)
+
+
+def get_snapshot(category: str, version: str | None = None) -> CatalogSnapshot:
+    """Get snapshot ``version`` of a category (None for the latest).
+
+    Raises:
+        ValueError: If category is not supported
+        ParserSnapshotNotFoundError: If there is no such snapshot
+    """
+    category = ProcessorFactory.get_processor(category).category
+    if version is None:
+        snapshot = SNAPSHOTS.latest(category)
+    else:
+        snapshot = SNAPSHOTS.get(category, version)
+    if snapshot is None:
+        raise ParserSnapshotNotFoundError(
+            context={"category": category, "version": version}
+        )
+    return snapshot
+
+
+def list_snapshots(category: str) -> list[CatalogSnapshot]:
+    """Get the kept snapshots of a category, newest first.
+
+    Raises:
+        ValueError: If category is not supported
+    """
+    return SNAPSHOTS.versions(ProcessorFactory.get_processor(category).category)
+
+
+def snapshot_age(category: str) -> float | None:
+    """Seconds since the latest snapshot of a category was fetched.
+
+    Raises:
+        ValueError: If category is not supported
+    """
+    snapshot = SNAPSHOTS.latest(ProcessorFactory.get_processor(category).category)
+    return None if snapshot is None else time.time() - snapshot.fetched_at
+
+
+@instrumented("parser.serve_category_async")
+async def serve_category_async(category: str) -> str:
+    """Trim the latest snapshot of a category, stale-while-revalidate.
+
+    A snapshot older than the refresher's ``ttl`` is still served, and the
+    category refreshed in the background. Only with no snapshot, or one
+    past ``max_age``, does the request wait for upstream (and falls back
+    to the old snapshot if that fails). Without upstream accounts this is
+    ``process_snapshot_async`` of the latest snapshot.
+
+    Args:
+        category: Category type (DATA, VOICE_SMS, VF, etc.)
+
+    Returns:
+        Processed response string
+
+    Raises:
+        ValueError: If category is not supported
+        ParserSnapshotNotFoundError: If there is no snapshot to serve
+        UpstreamGenericError: If there is no snapshot and fetching fails
+        ParserBusyError: If too many large payloads are already in flight
+    """
+    category = ProcessorFactory.get_processor(category).category
+    REFRESHER.touch(category)
+    age = snapshot_age(category)
+    if REFRESHER.running and (age is None or age >= REFRESHER.max_age):
+        try:
+            snapshot = await refresh_catalog_async(category)
+        except UpstreamGenericError:
+            if age is None:
+                raise
+            logger.warning(
+                f"Refresh of {category} failed, serving a {age:.0f}s old snapshot"
+            )
+        else:
+            return await process_snapshot_async(category, snapshot.version)
+    elif age is not None and age >= REFRESHER.ttl:
+        REFRESHER.revalidate(category)
+        INSTRUMENTATION.incr("parser.stale_served")
+    return await process_snapshot_async(category)
+
+
+@instrumented("parser.process_snapshot_async")
+async def process_snapshot_async(category: str, version: str | None = None) -> str:
+    """Trim a stored catalog snapshot (None for the latest).
+
+    Results share the result cache, keyed by snapshot version, so serving
+    the latest snapshot to every request trims it once per rules version.
+
     Args:
         category: Category type (DATA, VOICE_SMS, VF, etc.)
-        response_data: Raw JSON response string
+        version: Snapshot version to replay (None for the latest)
 
     Returns:
         Processed response string
 
     Raises:
         ValueError: If category is not supported
+        ParserSnapshotNotFoundError: If there is no such snapshot
+        ParserBusyError: If too many large payloads are already in flight
     """
-    processor = ProcessorFactory.create_processor(category)
-    return processor.process_response(response_data)
+    processor = ProcessorFactory.get_processor(category)
+    snapshot = get_snapshot(processor.category, version)
+
+    key = (processor.category, processor.rules_version, f"snapshot:{snapshot.version}")
+    result = RESULT_CACHE.get(key)
+    if result is None:
+        result = await OFFLOADER.run(
+            processor.category, snapshot, "process_snapshot", size=snapshot.size
+        )
+        RESULT_CACHE.put(key, result)
+    return result
+
+
+def stream_category_response(
+    category: str, chunks: AsyncIterable[bytes], size: int | None = None
+) -> AsyncIterator[str]:
+    """Streaming entry point - yields formatted products as the body arrives.
+
+    Reads the body chunk by chunk (e.g. ``request.stream()``), so memory
+    stays flat for very large catalogs; meant for a ``StreamingResponse``.
+    Not cached, and quotas are not optimized by the tiered budget of
+    ``process_category_response`` (see ``BaseProcessor.stream_response``),
+    so the joined text can differ from it for payloads over the budget.
+
+    Args:
+        category: Category type (DATA, VOICE_SMS, VF, etc.)
+        chunks: Raw JSON response body
+        size: Declared body size in bytes, None if unknown
+
+    Returns:
+        Async iterator of formatted product text
+
+    Raises:
+        ValueError: If category is not supported
+    """
+    processor = ProcessorFactory.get_processor(category)
+    return processor.stream_response(chunks, size)
 
 
 def get_supported_categories() -> set[str]:
@@ -36,6 +504,65 @@ def get_processor_type(category: str) -> str:
     return ProcessorFactory.get_processor_type(category)
 
 
+def get_result_cache_stats() -> dict[str, int | float]:
+    """Get hit/miss/eviction counters of the trimmed result cache."""
+    return RESULT_CACHE.stats()
+
+
+def get_page_cache_stats() -> dict[str, int | float]:
+    """Get hit/miss/eviction counters of the paginated result cache."""
+    return PAGE_CACHE.stats()
+
+
+def get_delta_state_stats() -> dict[str, int | float]:
+    """Get hit/miss/eviction counters of the per-member delta state."""
+    return DELTA_STATE.stats()
+
+
+def get_snapshot_stats() -> dict[str, int | float]:
+    """Get snapshot counts and sizes of the catalog snapshot store."""
+    return SNAPSHOTS.stats()
+
+
+def get_upstream_stats() -> dict[str, int | float]:
+    """Get request and connection counters of the upstream clients."""
+    return UPSTREAM.stats()
+
+
+def get_flight_stats() -> dict[str, dict[str, int | float]]:
+    """Get in-flight and coalesced call counters, by flight."""
+    return {
+        flights.name: flights.stats() for flights in (REFRESH_FLIGHTS, FETCH_FLIGHTS)
+    }
+
+
+def get_refresher_stats() -> dict[str, int | float]:
+    """Return background refresh statistics."""
+    return REFRESHER.stats()
+
+
+def get_offload_stats() -> dict[str, int | float]:
+    """Get queue wait / execution time counters of the offload pool."""
+    return OFFLOADER.stats()
+
+
+def get_quota_cache_stats() -> dict[str, int | float]:
+    """Get hit/miss/eviction counters of the shared quota memo cache.
+
+    Lookups made by the offload workers' caches are counted too; entries
+    and size are the server process's cache.
+    """
+    cache = ProcessorFactory.quota_rewriter.cache
+    if cache is None:
+        return {}
+    stats = cache.stats()
+    for key, value in OFFLOADER.quota_cache_stats().items():
+        stats[key] += value
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+
 def is_category_supported(category: str) -> bool:
     """Check if category is supported."""
     try:
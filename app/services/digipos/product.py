@@ -0,0 +1,45 @@
+"""Compact product record used throughout the digipos pipeline.
+
+Upstream products carry many fields the trimmer never outputs. Only the
+fields used by filters and formatters are kept, in a slotted record, so
+per-product memory is a fraction of the decoded dict and attribute access
+replaces repeated ``.get("...", "")`` lookups.
+"""
+
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(slots=True)
+class Product:
+    """Fields the processors use; missing upstream fields default to ""."""
+
+    product_id: Any = ""
+    product_name: Any = ""
+    subcategory: Any = ""
+    quota: Any = ""
+    total: Any = ""
+    price: Any = ""
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "Product":
+        """Build a record from an upstream product dict."""
+        get = data.get
+        return cls(
+            get("productId", ""),
+            get("productName", ""),
+            get("productSubCategory", ""),
+            get("quota", ""),
+            get("total_", ""),
+            get("price", ""),
+        )
+
+
+def decode_product(obj: dict[str, Any]) -> Product | dict[str, Any]:
+    """``json.loads`` object hook: turn product objects into records.
+
+    Products are recognised by their ``productId`` key; every other object
+    (the envelope, VF ``req``) is returned unchanged. The full product dict
+    is dropped as soon as it is decoded, so it never piles up in memory.
+    """
+    return Product.from_dict(obj) if "productId" in obj else obj
@@ -0,0 +1,183 @@
+"""Single-pass quota rewriter shared by all processors.
+
+Replaces the chain of ``re.sub`` calls that used to live in every
+``optimize_quota`` with one compiled tokenizer. The rule set is compiled
+once when the rewriter is constructed, so the request path only pays for
+one scan per quota string.
+
+Rules are grouped in tiers, cheapest first, so callers can stop as soon
+as the output is small enough. Each tier includes the ones before it:
+
+- TIER_COMPACT: units ("30 Days" -> "30D") + whitespace/comma cleanup
+- TIER_ABBREVIATE: + word abbreviations ("Internet" -> "Net")
+- TIER_STRIP: + metadata stripping (the full optimization)
+
+Example (TIER_STRIP):
+Input: "DATA National/Internet 30 Days 12 GB Nasional, Local Data/Kuota Lokal Internet 30 Days 43 GB"
+Output: "Net 30D 12GB Nas,Kuota Lokal Net 30D 43GB"
+"""
+
+import hashlib
+import re
+from collections.abc import Mapping
+
+from app.services.digipos.cache import LRUCache
+
+# Default rules, same behaviour as the old per-processor regex chain
+DEFAULT_UNITS: dict[str, str] = {
+    "Days": "D",
+    "GB": "GB",
+    "MB": "MB",
+}
+DEFAULT_ABBREVIATIONS: dict[str, str] = {
+    "Internet": "Net",
+    "Nasional": "Nas",
+}
+
+# Optimization tiers (TIER_NONE keeps the quota untouched)
+TIER_NONE = 0
+TIER_COMPACT = 1
+TIER_ABBREVIATE = 2
+TIER_STRIP = 3
+OPTIMIZATION_TIERS = (TIER_COMPACT, TIER_ABBREVIATE, TIER_STRIP)
+
+# Memo bounds: quota strings repeat heavily across products and responses
+QUOTA_CACHE_ENTRIES = 4096
+QUOTA_CACHE_CHARS = 1_000_000
+
+
+def _entry_size(key: str | tuple[int, str], optimized: str) -> int:
+    """Cache entry size in chars (key is the quota or ``(tier, quota)``)."""
+    quota = key if isinstance(key, str) else key[1]
+    return len(quota) + len(optimized)
+
+
+class QuotaRewriter:
+    """Compiled quota rewrite rules applied in a single scan.
+
+    Results are memoized in a bounded LRU cache (``cache_entries=0``
+    disables it). The cache belongs to this rule set, so building a new
+    rewriter for new rules starts from an empty cache; ``invalidate()``
+    clears it explicitly.
+    """
+
+    def __init__(
+        self,
+        units: Mapping[str, str] | None = None,
+        abbreviations: Mapping[str, str] | None = None,
+        cache_entries: int = QUOTA_CACHE_ENTRIES,
+        cache_chars: int = QUOTA_CACHE_CHARS,
+    ):
+        units = DEFAULT_UNITS if units is None else units
+        abbreviations = (
+            DEFAULT_ABBREVIATIONS if abbreviations is None else abbreviations
+        )
+
+        # Lookup tables are keyed by lowercase text (rules are case-insensitive)
+        self._units = {key.lower(): value for key, value in units.items()}
+        self._words = {key.lower(): value for key, value in abbreviations.items()}
+        # Identifies the rule set (used in result cache keys)
+        self.fingerprint = hashlib.blake2b(
+            repr((sorted(units.items()), sorted(abbreviations.items()))).encode(),
+            digest_size=8,
+        ).hexdigest()
+
+        # Group 1/2: number and unit ("30 Days" -> "30D", "1.5 GB" -> "1.5GB")
+        # Group 3: word abbreviation ("Internet" -> "Net")
+        # An empty rule set compiles to an alternative that can never match
+        unit_names = "|".join(map(re.escape, units)) or "(?!)"
+        word_names = "|".join(map(re.escape, abbreviations)) or "(?!)"
+        token = r"\b(\d+(?:\.\d+)?)\s+({})\b|\b({})\b"
+        self._patterns = {
+            TIER_COMPACT: re.compile(token.format(unit_names, "(?!)"), re.IGNORECASE),
+            TIER_ABBREVIATE: re.compile(
+                token.format(unit_names, word_names), re.IGNORECASE
+            ),
+        }
+        self._patterns[TIER_STRIP] = self._patterns[TIER_ABBREVIATE]
+
+        self.cache = (
+            LRUCache(
+                cache_entries,
+                cache_chars,
+                sizeof=_entry_size,
+            )
+            if cache_entries
+            else None
+        )
+
+    def _replace(self, match: re.Match[str]) -> str:
+        """Translate a single matched token."""
+        unit = match[2]
+        if unit is not None:
+            return match[1] + self._units[unit.lower()]
+        return self._words[match[3].lower()]
+
+    @staticmethod
+    def clean_metadata(quota: str) -> str:
+        """Clean metadata from quota field using the "/" delimiter parsing.
+
+        Example:
+        Input: "DATA National/Internet 30 Days 12 GB Nasional, Local Data/Kuota Lokal Internet 30 Days 43 GB"
+        Output: "Internet 30 Days 12 GB Nasional,Kuota Lokal Internet 30 Days 43 GB"
+        """
+        cleaned_items = []
+
+        for item in quota.split(","):
+            item = item.strip()
+            if "/" in item:
+                # Take the part after '/' as the description
+                cleaned_items.append(item.split("/", 1)[1].strip())
+            elif item:  # If no '/', keep original item (if not empty)
+                cleaned_items.append(item)
+
+        return ",".join(cleaned_items)
+
+    @staticmethod
+    def _strip_items(quota: str) -> str:
+        """Strip every comma-separated item and drop empty ones."""
+        return ",".join(item for item in map(str.strip, quota.split(",")) if item)
+
+    def invalidate(self) -> None:
+        """Drop memoized results (e.g. after the rule set changed)."""
+        if self.cache is not None:
+            self.cache.clear()
+
+    def rewrite(self, quota: str, tier: int = TIER_STRIP) -> str:
+        """Return the quota optimized up to ``tier`` (memoized)."""
+        if not quota or tier == TIER_NONE:
+            return quota
+        if self.cache is None:
+            return self._rewrite(quota, tier)
+
+        # The full tier is by far the most common, keep its key a plain str
+        key = quota if tier == TIER_STRIP else (tier, quota)
+        optimized = self.cache.get(key)
+        if optimized is None:
+            optimized = self._rewrite(quota, tier)
+            self.cache.put(key, optimized)
+        return optimized
+
+    def _rewrite(self, quota: str, tier: int) -> str:
+        """Apply every rule of ``tier`` in one pass."""
+        if tier >= TIER_STRIP:
+            optimized = self.clean_metadata(quota)
+        else:
+            optimized = self._strip_items(quota)
+
+        # Units and abbreviations never span a comma, so one scan covers all
+        optimized = self._patterns[tier].sub(self._replace, optimized)
+
+        # Items are already stripped, so whitespace never touches a comma:
+        # collapse runs, then drop doubled, leading and trailing commas
+        optimized = " ".join(optimized.split()).replace(",,", ",")
+        if optimized.startswith(","):
+            optimized = optimized[1:]
+        if optimized.endswith(","):
+            optimized = optimized[:-1]
+
+        return optimized.strip()
+
+
+# Shared instance used by RechargeProcessor and ActivationProcessor
+DEFAULT_QUOTA_REWRITER = QuotaRewriter()
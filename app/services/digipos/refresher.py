@@ -0,0 +1,213 @@
+"""Stale-while-revalidate refresh of the hot categories' catalog snapshots.
+
+Members are served trims of the latest snapshot, so only a snapshot that
+is missing or too old makes a request wait on upstream. ``CatalogRefresher``
+keeps the snapshots young for the categories members actually ask for:
+
+- every served request ``touch``es its category; its request rate is a
+  count decaying over ``RATE_WINDOW`` (about requests per minute)
+- a background loop, run in the app lifespan, refreshes each hot category
+  (rate of at least ``hot_rate``) before its snapshot reaches ``ttl``, at
+  an age jittered per refresh so categories do not refresh in lockstep
+- a request finding a stale snapshot is still served it at once, and
+  ``revalidate`` refreshes the category in the background; only past
+  ``max_age`` (or with no snapshot yet) does it wait for upstream
+"""
+
+import asyncio
+import math
+import random
+from collections.abc import Awaitable, Callable
+from time import monotonic
+from typing import Any
+
+from loguru import logger
+
+from app.custom.log_utils import INSTRUMENTATION
+
+# How often the loop looks for categories due a refresh
+REFRESH_TICK = 1.0  # seconds
+# Request rates decay by 1/e over this window
+RATE_WINDOW = 60.0  # seconds
+# Categories whose rate falls below this are forgotten
+RATE_FLOOR = 0.01
+# Pause before retrying a category whose refresh failed
+RETRY_AFTER = 10.0  # seconds
+
+
+class CatalogRefresher:
+    """Tracks category request rates and refreshes hot ones in background."""
+
+    def __init__(self, tick: float = REFRESH_TICK):
+        self.tick = tick
+        self.ttl = 300.0
+        self.max_age = 3600.0
+        self.hot_rate = 6.0
+        self.jitter = 0.1
+        self._rates: dict[str, tuple[float, float]] = {}  # rate, when
+        self._due: dict[str, float] = {}  # snapshot age to refresh at
+        self._retry_at: dict[str, float] = {}
+        self._pending: dict[str, asyncio.Task] = {}
+        self._refresh: Callable[[str], Awaitable[Any]] | None = None
+        self._age: Callable[[str], float | None] | None = None
+        self._task: asyncio.Task | None = None
+        self.refreshes = 0
+        self.failures = 0
+        self.revalidations = 0
+
+    def configure(
+        self, ttl: float, max_age: float, hot_rate: float, jitter: float
+    ) -> None:
+        """Set the snapshot lifetimes, hot rate and refresh jitter.
+
+        Args:
+            ttl: Snapshot age (seconds) after which it is stale
+            max_age: Snapshot age (seconds) after which it is not served
+                before trying upstream
+            hot_rate: Requests per minute that make a category hot
+            jitter: Share of ``ttl`` the refresh age is spread over (0 - 1)
+
+        Raises:
+            ValueError: If a value is out of range
+        """
+        if ttl <= 0 or max_age < ttl or hot_rate < 0 or not 0 <= jitter < 1:
+            raise ValueError(
+                f"Invalid refresh policy: {ttl}, {max_age}, {hot_rate}, {jitter}"
+            )
+        self.ttl = ttl
+        self.max_age = max_age
+        self.hot_rate = hot_rate
+        self.jitter = jitter
+        self._due.clear()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(
+        self,
+        refresh: Callable[[str], Awaitable[Any]],
+        age: Callable[[str], float | None],
+    ) -> None:
+        """Start the background loop (call from the running app lifespan).
+
+        Args:
+            refresh: Fetches a category upstream into a new snapshot
+            age: Age (seconds) of a category's latest snapshot, None if none
+        """
+        if self._task is not None:
+            return
+        self._refresh = refresh
+        self._age = age
+        self._task = asyncio.create_task(self._run(), name="catalog-refresher")
+        logger.info(
+            f"Catalog refresher started (ttl {self.ttl:.0f}s, "
+            f"hot at {self.hot_rate:g}/min)"
+        )
+
+    async def stop(self) -> None:
+        """Stop the loop and cancel the refreshes in flight."""
+        task, self._task = self._task, None
+        tasks = [*self._pending.values()]
+        if task is not None:
+            tasks.append(task)
+        for pending in tasks:
+            pending.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._pending.clear()
+        self._refresh = None
+
+    def touch(self, category: str) -> None:
+        """Count a request for ``category``."""
+        now = monotonic()
+        self._rates[category] = (self.rate(category, now) + 1, now)
+
+    def rate(self, category: str, now: float | None = None) -> float:
+        """Decayed request count of ``category`` (about requests per minute)."""
+        if now is None:
+            now = monotonic()
+        rate, when = self._rates.get(category, (0.0, now))
+        return rate * math.exp((when - now) / RATE_WINDOW)
+
+    def hot(self) -> list[str]:
+        """Categories requested at least ``hot_rate`` times per minute.
+
+        Forgets the categories whose rate decayed below ``RATE_FLOOR``.
+        """
+        now = monotonic()
+        for category in list(self._rates):
+            if self.rate(category, now) < RATE_FLOOR:
+                del self._rates[category]
+                self._due.pop(category, None)
+        return self._hot(now)
+
+    def _hot(self, now: float) -> list[str]:
+        """Hot categories, without forgetting any (safe for metrics)."""
+        return [
+            category
+            for category in self._rates
+            if self.rate(category, now) >= self.hot_rate
+        ]
+
+    def revalidate(self, category: str) -> bool:
+        """Refresh ``category`` in the background unless already refreshing.
+
+        Returns:
+            Whether a refresh was started (never before ``start``)
+        """
+        if self._refresh is None or category in self._pending:
+            return False
+        if monotonic() < self._retry_at.get(category, 0.0):
+            return False
+        self.revalidations += 1
+        task = asyncio.create_task(self._refresh_category(category))
+        self._pending[category] = task
+        task.add_done_callback(lambda _: self._pending.pop(category, None))
+        return True
+
+    async def _refresh_category(self, category: str) -> None:
+        try:
+            await self._refresh(category)
+        except Exception:
+            self.failures += 1
+            self._retry_at[category] = monotonic() + RETRY_AFTER
+            INSTRUMENTATION.incr("refresher.refreshes", 1, (("outcome", "error"),))
+            logger.exception(f"Background refresh of {category} failed")
+        else:
+            self.refreshes += 1
+            self._retry_at.pop(category, None)
+            INSTRUMENTATION.incr("refresher.refreshes", 1, (("outcome", "ok"),))
+        finally:
+            # Draw a new jittered age for the next refresh
+            self._due.pop(category, None)
+
+    def _due_age(self, category: str) -> float:
+        """Snapshot age at which a hot category is refreshed ahead of ``ttl``."""
+        due = self._due.get(category)
+        if due is None:
+            spread = self.ttl * self.jitter
+            due = self.ttl - spread * random.random() - self.tick
+            self._due[category] = due
+        return due
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                for category in self.hot():
+                    age = self._age(category)
+                    if age is None or age >= self._due_age(category):
+                        self.revalidate(category)
+            except Exception:
+                logger.exception("Catalog refresher tick failed")
+
+    def stats(self) -> dict[str, int | float]:
+        """Return refresh counters and the number of hot categories."""
+        return {
+            "tracked": len(self._rates),
+            "hot": len(self._hot(monotonic())),
+            "in_flight": len(self._pending),
+            "revalidations": self.revalidations,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+        }
@@ -0,0 +1,87 @@
+"""Configurable parser rules loaded from ``[parser.digipos]``.
+
+A ``RuleSet`` is the plain description of everything the config can change
+in the pipeline: output budget, quota units and abbreviations, and
+exclusion lists per processor type. It holds no compiled state, so it can
+be compared, fingerprinted and pickled to offload workers.
+
+``ProcessorFactory.register_processors`` compiles a rule set into a new
+processor registry (at startup or on a config reload), never per request.
+"""
+
+import hashlib
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from functools import cached_property
+
+from app.config.config import DigiposParserSettings
+from app.services.digipos.base_parser import MAX_CHAR_LIMIT
+
+
+@dataclass(frozen=True)
+class ExclusionLists:
+    """Exclusion lists of one processor type, as written in config."""
+
+    subcategories: tuple[str, ...] = ()
+    productnames: tuple[str, ...] = ()
+    quota_metadata: tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    """Uncompiled parser rules.
+
+    Attributes:
+        max_chars: Output budget
+        units: Quota unit rules (None keeps ``DEFAULT_UNITS``)
+        abbreviations: Quota word rules (None keeps ``DEFAULT_ABBREVIATIONS``)
+        exclusions: Lists per processor type ("RECHARGE", "ACTIVATION");
+            a type without an entry keeps its processor's built-in lists
+        columnar: Filter large catalogs column-wise (needs NumPy)
+    """
+
+    max_chars: int = MAX_CHAR_LIMIT
+    units: Mapping[str, str] | None = None
+    abbreviations: Mapping[str, str] | None = None
+    exclusions: Mapping[str, ExclusionLists] = field(default_factory=dict)
+    columnar: bool = False
+
+    @cached_property
+    def version(self) -> str:
+        """Identify the rule set (equal rules give equal versions)."""
+        units = None if self.units is None else list(self.units.items())
+        abbreviations = (
+            None if self.abbreviations is None else list(self.abbreviations.items())
+        )
+        return hashlib.blake2b(
+            repr(
+                (
+                    self.max_chars,
+                    units,
+                    abbreviations,
+                    sorted(self.exclusions.items()),
+                    self.columnar,
+                )
+            ).encode(),
+            digest_size=8,
+        ).hexdigest()
+
+    @classmethod
+    def from_settings(cls, settings: DigiposParserSettings | None) -> "RuleSet":
+        """Build the rule set from ``[parser.digipos]`` (None gives defaults)."""
+        if settings is None:
+            return cls()
+        return cls(
+            max_chars=settings.max_responses,
+            units=settings.units,
+            abbreviations=settings.abbreviations,
+            exclusions={
+                processor_type.upper(): ExclusionLists(
+                    tuple(lists.subcategories),
+                    tuple(lists.productnames),
+                    tuple(lists.quota_metadata),
+                )
+                for processor_type, lists in settings.exclude.items()
+            },
+            columnar=settings.columnar,
+        )
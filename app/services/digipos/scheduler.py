@@ -0,0 +1,407 @@
+"""Routing and rate shaping of upstream calls across ``[[digipos]]`` accounts.
+
+``AccountScheduler`` picks the account for each upstream call:
+
+- only accounts with a token in their bucket are eligible, so each account
+  stays under its own ``rate_limit`` (with ``burst``) and is not throttled
+  upstream; when none has a token the call waits for the first refill
+- among those, the one with the fewest outstanding calls per unit of
+  ``weight`` wins (weighted least-outstanding-requests)
+- an account whose recent error rate or latency (EWMA) crosses the
+  ejection thresholds is ejected for a while, doubling on each repeat;
+  if every account is ejected, all of them are used again (better a
+  degraded upstream than none)
+- a circuit breaker per account opens after ``breaker_failures`` failed or
+  slow calls in a row; calls then fail fast instead of waiting out the
+  account's ``time_out``, and after ``breaker_cooldown`` a single probe
+  call decides whether it closes again (half-open)
+
+Aggregate throughput is the sum of the accounts' rates, so it grows with
+every account added to config.toml.
+"""
+
+import asyncio
+from collections import defaultdict
+from collections.abc import AsyncIterator, Callable, Collection
+from contextlib import asynccontextmanager
+from time import monotonic
+
+from loguru import logger
+
+from app.custom.exceptions import (
+    UpstreamBusyError,
+    UpstreamCircuitOpenError,
+    UpstreamGenericError,
+    UpstreamNotConfiguredError,
+)
+from app.custom.log_utils import INSTRUMENTATION
+
+# Longest a call waits for a token before giving up
+MAX_WAIT = 5.0  # seconds
+# Smoothing of the error rate and latency averages (weight of a new call)
+EWMA_ALPHA = 0.2
+# Ejection: judged after this many calls since the last (re)admission
+EJECT_MIN_CALLS = 5
+EJECT_ERROR_RATE = 0.5
+# Latency threshold, as a fraction of the account's time_out
+EJECT_LATENCY_RATIO = 0.8
+EJECT_BASE = 30.0  # seconds, doubled per consecutive ejection
+EJECT_MAX = 300.0  # seconds
+# Circuit breaker defaults, see UpstreamSettings
+BREAKER_FAILURES = 5
+BREAKER_COOLDOWN = 10.0  # seconds
+
+
+class TokenBucket:
+    """``rate`` tokens per second, holding at most ``capacity``."""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready(self, now: float) -> bool:
+        """Whether a token is available."""
+        self._refill(now)
+        return self.tokens >= 1
+
+    def take(self) -> None:
+        """Spend a token (check ``ready`` first)."""
+        self.tokens -= 1
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available."""
+        self._refill(now)
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """Closed, open after failures in a row, half-open after the cooldown.
+
+    Half-open lets one probe call through at a time: its success closes the
+    breaker, its failure opens it for another cooldown. Failures of calls
+    admitted before the breaker opened are ignored, so they cannot re-open
+    it or extend its cooldown.
+    """
+
+    __slots__ = ("failures", "open_until", "probing", "trips")
+
+    def __init__(self):
+        self.failures = 0
+        self.open_until: float | None = None
+        self.probing = False
+        self.trips = 0
+
+    def state(self, now: float) -> str:
+        """Return "closed", "open" or "half_open"."""
+        if self.open_until is None:
+            return "closed"
+        return "open" if now < self.open_until else "half_open"
+
+    def allows(self, now: float) -> bool:
+        """Whether a call may go through now."""
+        state = self.state(now)
+        return state == "closed" or (state == "half_open" and not self.probing)
+
+    def success(self) -> None:
+        """Close the breaker."""
+        self.failures = 0
+        self.open_until = None
+
+    def failure(
+        self, now: float, threshold: int, cooldown: float, probe: bool = False
+    ) -> bool:
+        """Count a failure; return whether it opened the breaker.
+
+        Args:
+            now: Current time
+            threshold: Failures in a row that open a closed breaker
+            cooldown: Seconds the breaker stays open
+            probe: Whether the failed call was the half-open probe
+        """
+        if self.open_until is not None and not probe:
+            return False  # admitted before the breaker opened
+        self.failures += 1
+        if self.open_until is None and self.failures < threshold:
+            return False
+        # Threshold reached, or the half-open probe failed
+        self.failures = 0
+        self.open_until = now + cooldown
+        self.trips += 1
+        return True
+
+
+class AccountSlot:
+    """Scheduling state of one account."""
+
+    __slots__ = (
+        "breaker",
+        "bucket",
+        "calls",
+        "ejected_until",
+        "ejections",
+        "error_rate",
+        "latency",
+        "name",
+        "outstanding",
+        "slow_after",
+        "weight",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        weight: float,
+        bucket: TokenBucket,
+        slow_after: float,
+    ):
+        self.name = name
+        self.weight = weight
+        self.bucket = bucket
+        self.slow_after = slow_after
+        self.outstanding = 0
+        self.calls = 0
+        self.error_rate = 0.0
+        self.latency = 0.0
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self.breaker = CircuitBreaker()
+
+    def load(self) -> float:
+        """Outstanding calls per unit of weight, counting the next one."""
+        return (self.outstanding + 1) / self.weight
+
+
+class AccountScheduler:
+    """Weighted least-outstanding routing, token buckets, ejection, breakers."""
+
+    def __init__(
+        self, max_wait: float = MAX_WAIT, clock: Callable[[], float] = monotonic
+    ):
+        self.max_wait = max_wait
+        self.breaker_failures = BREAKER_FAILURES
+        self.breaker_cooldown = BREAKER_COOLDOWN
+        self._clock = clock
+        self._slots: dict[str, AccountSlot] = {}
+        self._queues: defaultdict[str | None, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._turn = 0
+        self.throttled = 0
+        self.rejected = 0
+
+    def add(
+        self,
+        name: str,
+        weight: float = 1.0,
+        rate_limit: float = 10.0,
+        burst: int = 10,
+        slow_after: float = float("inf"),
+    ) -> None:
+        """Register an account.
+
+        Args:
+            name: Account username
+            weight: Share of the load relative to the other accounts
+            rate_limit: Calls per second the account may make
+            burst: Calls it may make at once after being idle
+            slow_after: Average latency (seconds) that gets it ejected
+
+        Raises:
+            ValueError: If weight or rate_limit is not above 0
+        """
+        if weight <= 0 or rate_limit <= 0:
+            raise ValueError(f"Invalid account policy: {weight}, {rate_limit}")
+        self._slots[name] = AccountSlot(
+            name,
+            weight,
+            TokenBucket(rate_limit, max(burst, 1), self._clock()),
+            slow_after,
+        )
+
+    def clear(self) -> None:
+        """Forget every account."""
+        self._slots.clear()
+        self._queues.clear()
+
+    def configure_breaker(self, failures: int, cooldown: float) -> None:
+        """Set the circuit breaker policy of every account.
+
+        Raises:
+            ValueError: If failures is below 1 or cooldown is negative
+        """
+        if failures < 1 or cooldown < 0:
+            raise ValueError(f"Invalid breaker policy: {failures}, {cooldown}")
+        self.breaker_failures = failures
+        self.breaker_cooldown = cooldown
+
+    @asynccontextmanager
+    async def acquire(
+        self,
+        account: str | None = None,
+        exclude: Collection[str] = (),
+        wait: bool = True,
+    ) -> AsyncIterator[str]:
+        """Reserve an account for one upstream call.
+
+        The call's ``UpstreamGenericError`` counts as a failure of the
+        account; finishing without one counts as a success (or, for the
+        breaker, a failure if it took longer than ``slow_after``).
+
+        Args:
+            account: Use this account (still rate limited and guarded by its
+                breaker, never ejected), None to let the scheduler pick
+            exclude: Accounts the scheduler must not pick
+            wait: Wait up to ``max_wait`` for a token, else fail at once
+
+        Yields:
+            The account's username
+
+        Raises:
+            UpstreamNotConfiguredError: If there is no such account
+            UpstreamCircuitOpenError: If every eligible breaker is open
+            UpstreamBusyError: If no token frees up in time
+        """
+        slot, probe = await self._reserve(account, exclude, wait)
+        start = self._clock()
+        try:
+            yield slot.name
+        except UpstreamGenericError:
+            self._record(slot, False, self._clock() - start, probe)
+            raise
+        else:
+            self._record(slot, True, self._clock() - start, probe)
+        finally:
+            slot.outstanding -= 1
+            if probe:
+                slot.breaker.probing = False
+
+    async def _reserve(
+        self, account: str | None, exclude: Collection[str], wait: bool
+    ) -> tuple[AccountSlot, bool]:
+        """Reserve an account; the flag tells whether the call is its probe."""
+        if not self._queues[account].locked():
+            slot, _, probe = self._try_reserve(account, exclude)
+            if slot is not None:
+                return slot, probe
+        if not wait:
+            raise UpstreamBusyError(context={"account": account, "max_wait": 0})
+
+        self.throttled += 1
+        INSTRUMENTATION.incr("upstream.throttled")
+        deadline = self._clock() + self.max_wait
+        # Waiters queue up (per target) so refills go out in arrival order
+        # instead of waking every waiter to race for one token
+        async with self._queues[account]:
+            while True:
+                slot, delay, probe = self._try_reserve(account, exclude)
+                if slot is not None:
+                    return slot, probe
+                if self._clock() + delay > deadline:
+                    self.rejected += 1
+                    raise UpstreamBusyError(
+                        context={"account": account, "max_wait": self.max_wait}
+                    )
+                await asyncio.sleep(delay)
+
+    def _try_reserve(
+        self, account: str | None, exclude: Collection[str]
+    ) -> tuple[AccountSlot | None, float, bool]:
+        """Reserve the least loaded ready account, else the wait for a token.
+
+        Returns:
+            The account (None if none is ready), the wait for a token, and
+            whether the call took the account's half-open probe
+        """
+        now = self._clock()
+        candidates = self._candidates(account, exclude, now)
+        ready = [slot for slot in candidates if slot.bucket.ready(now)]
+        if not ready:
+            return None, min(slot.bucket.wait_time(now) for slot in candidates), False
+        # Rotate the start so equally loaded accounts take turns
+        self._turn = (self._turn + 1) % len(ready)
+        slot = min(ready[self._turn :] + ready[: self._turn], key=AccountSlot.load)
+        slot.bucket.take()
+        slot.outstanding += 1
+        probe = slot.breaker.state(now) == "half_open"
+        if probe:
+            slot.breaker.probing = True
+        return slot, 0.0, probe
+
+    def _candidates(
+        self, account: str | None, exclude: Collection[str], now: float
+    ) -> list[AccountSlot]:
+        if account is not None:
+            slot = self._slots.get(account)
+            if slot is None:
+                raise UpstreamNotConfiguredError(context={"account": account})
+            slots = [slot]
+        elif self._slots:
+            slots = [s for s in self._slots.values() if s.name not in exclude]
+        else:
+            raise UpstreamNotConfiguredError(context={"account": account})
+
+        allowed = [s for s in slots if s.breaker.allows(now)]
+        if not allowed:
+            raise UpstreamCircuitOpenError(context={"account": account})
+        if account is not None:
+            return allowed
+        healthy = [s for s in allowed if s.ejected_until <= now]
+        return healthy or allowed
+
+    def _record(
+        self, slot: AccountSlot, ok: bool, latency: float, probe: bool = False
+    ) -> None:
+        """Update the account's breaker and averages, eject it if too bad."""
+        if ok and latency < slot.slow_after:
+            slot.breaker.success()
+        elif slot.breaker.failure(
+            self._clock(), self.breaker_failures, self.breaker_cooldown, probe
+        ):
+            logger.warning(
+                f"Circuit of upstream account {slot.name} open for "
+                f"{self.breaker_cooldown:.0f}s"
+            )
+            INSTRUMENTATION.incr("upstream.breaker_trips", 1, (("account", slot.name),))
+
+        slot.calls += 1
+        if slot.calls == 1:
+            slot.latency = latency
+        slot.error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - slot.error_rate)
+        slot.latency += EWMA_ALPHA * (latency - slot.latency)
+        if slot.calls < EJECT_MIN_CALLS:
+            return
+        if slot.error_rate < EJECT_ERROR_RATE and slot.latency < slot.slow_after:
+            slot.ejections = 0  # healthy since its last admission
+            return
+
+        duration = min(EJECT_MAX, EJECT_BASE * 2**slot.ejections)
+        logger.warning(
+            f"Ejecting upstream account {slot.name} for {duration:.0f}s "
+            f"(error rate {slot.error_rate:.2f}, latency {slot.latency:.2f}s)"
+        )
+        INSTRUMENTATION.incr("upstream.ejections", 1, (("account", slot.name),))
+        slot.ejected_until = self._clock() + duration
+        slot.ejections += 1
+        slot.calls = 0
+        slot.error_rate = 0.0
+        slot.latency = 0.0
+
+    def stats(self) -> dict[str, int | float]:
+        """Return account health and throttling counters."""
+        now = self._clock()
+        slots = list(self._slots.values())
+        return {
+            "healthy": sum(1 for s in slots if s.ejected_until <= now),
+            "ejected": sum(1 for s in slots if s.ejected_until > now),
+            "outstanding": sum(s.outstanding for s in slots),
+            "circuit_open": sum(1 for s in slots if s.breaker.state(now) != "closed"),
+            "breaker_trips": sum(s.breaker.trips for s in slots),
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+        }
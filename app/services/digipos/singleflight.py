@@ -0,0 +1,88 @@
+"""Single-flight coalescing of concurrent identical async calls.
+
+When a catalog goes stale, many members ask for the same category at once.
+``SingleFlight.run`` lets the first caller for a key start the work as a
+task; callers arriving while it runs wait for that same task and share its
+result (or exception) instead of starting their own.
+
+Cancellation is per waiter: a cancelled waiter leaves, the shared task
+keeps running for the others. Only when every waiter has left is the task
+cancelled, and its key is released at once, so a later caller starts fresh
+work instead of joining a dying task.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+from app.custom.log_utils import INSTRUMENTATION
+
+
+class _Call:
+    """A running call and the number of callers waiting for it."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time, shared by all its callers."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._labels = (("flight", name),)
+        self._calls: dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Return ``await func()``, joining a running call with the same key.
+
+        Raises:
+            Exception: Whatever the shared call raised, to every waiter
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(func()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._release(key, call))
+            self.calls += 1
+            INSTRUMENTATION.incr("singleflight.calls", 1, self._labels)
+        else:
+            self.coalesced += 1
+            INSTRUMENTATION.incr("singleflight.coalesced", 1, self._labels)
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                # Last waiter gone: nobody wants the result any more
+                self._release(key, call)
+                call.task.cancel()
+                self.cancelled += 1
+                INSTRUMENTATION.incr("singleflight.cancelled", 1, self._labels)
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _release(self, key: Hashable, call: _Call) -> None:
+        """Forget ``key`` if it still maps to ``call``."""
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> dict[str, int | float]:
+        """Return a snapshot of the call counters."""
+        return {
+            "in_flight": len(self._calls),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+        }
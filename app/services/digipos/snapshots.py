@@ -0,0 +1,202 @@
+"""Versioned store of parsed Digipos catalogs.
+
+A snapshot is one upstream catalog after decoding: every product (before
+any exclusion, so it stays valid when rules change) as a compact record,
+compressed with zlib or lzma. The store keeps the last ``max_versions``
+snapshots per category; trims can run from the latest one, so fetching
+and parsing upstream is decoupled from request handling, and older
+versions can be replayed for debugging.
+
+Snapshots are immutable and hold only bytes, so they are cheap to pass to
+offload workers and safe to share between requests: every trim decodes its
+own product records.
+"""
+
+import hashlib
+import json
+import lzma
+import time
+import zlib
+from collections import deque
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, replace
+from threading import Lock
+from typing import Any
+
+from app.services.digipos.product import Product
+
+# Defaults, overridden by [parser.digipos] snapshot_* settings
+SNAPSHOT_VERSIONS = 5
+SNAPSHOT_COMPRESSION = "zlib"
+
+# codec -> (compress, decompress)
+COMPRESSORS: dict[str, tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    "zlib": (zlib.compress, zlib.decompress),
+    "lzma": (lzma.compress, lzma.decompress),
+}
+
+# Record fields in the order they are encoded
+_FIELDS = Product.__slots__
+
+
+def encode_products(products: Iterable[Product]) -> bytes:
+    """Encode records as a JSON array of field rows."""
+    rows = [[getattr(product, name) for name in _FIELDS] for product in products]
+    return json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def decode_products(data: bytes) -> list[Product]:
+    """Inverse of ``encode_products``."""
+    return [Product(*row) for row in json.loads(data)]
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogSnapshot:
+    """One parsed catalog, compressed at rest.
+
+    Attributes:
+        category: Category of the catalog
+        version: Content hash of the normalized catalog (equal catalogs
+            get equal versions)
+        fetched_at: When the catalog was fetched (Unix time)
+        product_count: Number of products
+        size: Uncompressed size of the encoded catalog (bytes)
+        codec: Compression codec ("zlib" or "lzma")
+        data: Compressed encoded catalog
+    """
+
+    category: str
+    version: str
+    fetched_at: float
+    product_count: int
+    size: int
+    codec: str
+    data: bytes
+
+    @classmethod
+    def build(
+        cls,
+        category: str,
+        products: list[Product],
+        codec: str = SNAPSHOT_COMPRESSION,
+        fetched_at: float | None = None,
+    ) -> "CatalogSnapshot":
+        """Normalize and compress a decoded catalog."""
+        encoded = encode_products(products)
+        return cls(
+            category,
+            hashlib.blake2b(encoded, digest_size=8).hexdigest(),
+            time.time() if fetched_at is None else fetched_at,
+            len(products),
+            len(encoded),
+            codec,
+            COMPRESSORS[codec][0](encoded),
+        )
+
+    def encoded(self) -> bytes:
+        """Decompressed encoded catalog (a JSON array of field rows)."""
+        return COMPRESSORS[self.codec][1](self.data)
+
+    def products(self) -> list[Product]:
+        """Fresh product records (safe to mutate)."""
+        return decode_products(self.encoded())
+
+    def info(self) -> dict[str, Any]:
+        """Metadata without the catalog itself."""
+        return {
+            "category": self.category,
+            "version": self.version,
+            "fetched_at": self.fetched_at,
+            "product_count": self.product_count,
+            "size": self.size,
+            "compressed_size": len(self.data),
+            "codec": self.codec,
+        }
+
+
+class SnapshotStore:
+    """Last ``max_versions`` snapshots of every category, newest last."""
+
+    def __init__(
+        self,
+        max_versions: int = SNAPSHOT_VERSIONS,
+        codec: str = SNAPSHOT_COMPRESSION,
+    ):
+        self._lock = Lock()
+        self._snapshots: dict[str, deque[CatalogSnapshot]] = {}
+        self.configure(max_versions, codec)
+
+    def configure(self, max_versions: int, codec: str) -> None:
+        """Change retention and codec (kept snapshots keep their codec).
+
+        Raises:
+            ValueError: If ``max_versions`` < 1 or the codec is unknown
+        """
+        if max_versions < 1:
+            raise ValueError("max_versions must be at least 1")
+        if codec not in COMPRESSORS:
+            raise ValueError(f"Unknown snapshot compression: {codec}")
+        with self._lock:
+            self.max_versions = max_versions
+            self.codec = codec
+            for category, history in self._snapshots.items():
+                self._snapshots[category] = deque(history, maxlen=max_versions)
+
+    def add(self, snapshot: CatalogSnapshot) -> CatalogSnapshot:
+        """Store a snapshot, dropping the oldest beyond ``max_versions``.
+
+        A catalog identical to the latest one is not stored twice; the
+        latest snapshot is kept with the newer ``fetched_at`` instead.
+
+        Returns:
+            The stored snapshot
+        """
+        with self._lock:
+            history = self._snapshots.setdefault(
+                snapshot.category, deque(maxlen=self.max_versions)
+            )
+            if history and history[-1].version == snapshot.version:
+                latest = history.pop()
+                snapshot = replace(
+                    latest, fetched_at=max(latest.fetched_at, snapshot.fetched_at)
+                )
+            history.append(snapshot)
+            return snapshot
+
+    def latest(self, category: str) -> CatalogSnapshot | None:
+        """Newest snapshot of ``category``, if any."""
+        with self._lock:
+            history = self._snapshots.get(category)
+            return history[-1] if history else None
+
+    def get(self, category: str, version: str) -> CatalogSnapshot | None:
+        """Snapshot ``version`` of ``category``, if still kept."""
+        with self._lock:
+            for snapshot in self._snapshots.get(category, ()):
+                if snapshot.version == version:
+                    return snapshot
+            return None
+
+    def versions(self, category: str) -> list[CatalogSnapshot]:
+        """Kept snapshots of ``category``, newest first."""
+        with self._lock:
+            return list(reversed(self._snapshots.get(category, ())))
+
+    def clear(self) -> None:
+        """Drop every snapshot."""
+        with self._lock:
+            self._snapshots.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        """Return snapshot counts and sizes over all categories."""
+        with self._lock:
+            snapshots = [s for history in self._snapshots.values() for s in history]
+        size = sum(s.size for s in snapshots)
+        compressed = sum(len(s.data) for s in snapshots)
+        return {
+            "categories": len(self._snapshots),
+            "snapshots": len(snapshots),
+            "size": size,
+            "compressed_size": compressed,
+            "compression_ratio": size / compressed if compressed else 0.0,
+        }
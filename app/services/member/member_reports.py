@@ -0,0 +1,360 @@
+"""Batched delivery of member reports to their ``report_url``.
+
+Reports for a member go through a bounded queue drained by one worker task
+per member. The worker collects what arrives within ``batch_window``
+seconds (at most ``batch_size`` reports) and POSTs it as one JSON body over
+a keep-alive connection pool shared by every member on the same host, so a
+burst of reports costs a few requests on warm connections instead of a
+connection per report.
+
+A full queue pushes back on the producer: ``submit`` waits up to
+``enqueue_timeout`` for room, then raises ``MemberReportQueueFullError``.
+Failed deliveries are retried with full-jitter backoff; a batch that still
+fails is dropped and counted as failed.
+
+Members are synced per source (config.toml, the DB): a sync replaces the
+source's members, and a member no longer registered by any source stops
+receiving reports at once, its queued ones dropped.
+"""
+
+import asyncio
+from collections.abc import Mapping
+from threading import Lock
+from time import perf_counter
+from typing import Any
+
+import httpx
+from loguru import logger
+
+from app.config.config import ReportSettings
+from app.custom.exceptions import MemberNotFoundError, MemberReportQueueFullError
+from app.custom.log_utils import INSTRUMENTATION
+from app.services.digipos.client import RETRY_STATUSES, backoff_delay
+
+# How long ``stop`` waits for queued reports to be delivered
+DRAIN_TIMEOUT = 5.0  # seconds
+
+
+class _MemberQueue:
+    """Queue, worker and delivery counters of one member."""
+
+    __slots__ = (
+        "batches",
+        "delivered",
+        "dropped",
+        "failed",
+        "labels",
+        "latency_max",
+        "latency_total",
+        "name",
+        "queue",
+        "retried",
+        "worker",
+    )
+
+    def __init__(self, name: str, queue: asyncio.Queue):
+        self.name = name
+        self.labels = (("member", name),)
+        self.queue = queue
+        self.worker: asyncio.Task | None = None
+        self.batches = 0
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retried = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "queued": self.queue.qsize(),
+            "batches": self.batches,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "retried": self.retried,
+            "latency_avg": (
+                self.latency_total / self.delivered if self.delivered else 0.0
+            ),
+            "latency_max": self.latency_max,
+        }
+
+
+class ReportDispatcher:
+    """Per-member report queues, delivered in batches over pooled clients."""
+
+    def __init__(self):
+        # report_url and allowed client address by member, per source
+        self._sources: dict[str, dict[str, tuple[str, str]]] = {}
+        self._targets: dict[str, tuple[str, str]] = {}
+        self._queues: dict[str, _MemberQueue] = {}
+        self._clients: dict[tuple[str, str, int | None], httpx.AsyncClient] = {}
+        self._transport: httpx.AsyncBaseTransport | None = None
+        self._closing = False
+        self._lock = Lock()
+        self.connections_opened = 0
+        self.configure(ReportSettings())
+
+    def configure(self, settings: ReportSettings) -> None:
+        """Apply the [reports] batching, queue and retry policy.
+
+        The queue size applies to queues created afterwards; pooled clients
+        keep the timeout and limits they were created with.
+
+        Raises:
+            ValueError: If a value is out of range
+        """
+        if (
+            settings.batch_window < 0
+            or settings.batch_size < 1
+            or settings.queue_size < 1
+            or settings.retries < 0
+            or settings.max_connections < 1
+        ):
+            raise ValueError(f"Invalid report settings: {settings}")
+        self.batch_window = settings.batch_window
+        self.batch_size = settings.batch_size
+        self.queue_size = settings.queue_size
+        self.enqueue_timeout = settings.enqueue_timeout
+        self.retries = settings.retries
+        self.time_out = settings.time_out
+        self.max_connections = settings.max_connections
+
+    def start(self, transport: httpx.AsyncBaseTransport | None = None) -> None:
+        """Accept reports (workers and clients are created on first use).
+
+        Args:
+            transport: Replacement transport (e.g. ``httpx.MockTransport``)
+        """
+        self._transport = transport
+        self._closing = False
+        self._queues = {}
+
+    def sync(self, source: str, members: Mapping[str, tuple[str, str]]) -> None:
+        """Replace the members registered by ``source`` (call on the loop).
+
+        When sources register the same member, the source first synced
+        later wins. Members no longer registered by any source are retired:
+        their worker stops and their queued reports are dropped.
+
+        Args:
+            source: Where the members come from (e.g. "config", "db")
+            members: report_url and the client address allowed to queue
+                reports, by member name
+        """
+        self._sources[source] = dict(members)
+        targets: dict[str, tuple[str, str]] = {}
+        for registered in self._sources.values():
+            targets.update(registered)
+        for member in self._targets.keys() - targets.keys():
+            self._retire(member)
+        self._targets = targets
+
+    def _retire(self, member: str) -> None:
+        state = self._queues.pop(member, None)
+        if state is None:
+            return
+        if state.worker is not None:
+            state.worker.cancel()
+        if dropped := state.queue.qsize():
+            INSTRUMENTATION.incr("reports.dropped", dropped, state.labels)
+            logger.warning(f"Dropped {dropped} queued reports of removed {member}")
+
+    @property
+    def members(self) -> list[str]:
+        return list(self._targets)
+
+    def allows(self, member: str, client_ip: str) -> bool:
+        """Whether ``client_ip`` is the address registered for ``member``."""
+        target = self._targets.get(member)
+        return target is not None and target[1] == client_ip
+
+    async def submit(self, member: str, report: Any) -> int:
+        """Queue a report for delivery, waiting for room if the queue is full.
+
+        Args:
+            member: Registered member name
+            report: JSON-serializable report
+
+        Returns:
+            Reports queued for the member, this one included
+
+        Raises:
+            MemberNotFoundError: If the member has no registered report_url
+            MemberReportQueueFullError: If the queue stays full for
+                ``enqueue_timeout`` seconds, or the dispatcher is stopping
+        """
+        if member not in self._targets:
+            raise MemberNotFoundError(context={"member": member})
+        if self._closing:
+            raise MemberReportQueueFullError(context={"member": member})
+
+        state = self._queue(member)
+        item = (perf_counter(), report)
+        try:
+            state.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(state.queue.put(item), self.enqueue_timeout)
+            except TimeoutError as e:
+                state.dropped += 1
+                INSTRUMENTATION.incr("reports.dropped", 1, state.labels)
+                raise MemberReportQueueFullError(
+                    context={"member": member, "queue_size": state.queue.maxsize},
+                    cause=e,
+                ) from e
+        return state.queue.qsize()
+
+    def _queue(self, member: str) -> _MemberQueue:
+        state = self._queues.get(member)
+        if state is None:
+            state = _MemberQueue(member, asyncio.Queue(self.queue_size))
+            state.worker = asyncio.create_task(
+                self._work(state), name=f"reports-{member}"
+            )
+            self._queues[member] = state
+        return state
+
+    async def _work(self, state: _MemberQueue) -> None:
+        queue = state.queue
+        while True:
+            batch = [await queue.get()]
+            # Let the batch fill up, unless a full one is already waiting
+            if queue.qsize() < self.batch_size - 1:
+                await asyncio.sleep(self.batch_window)
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                await self._deliver(state, batch)
+            except Exception:
+                state.failed += len(batch)
+                logger.exception(f"Report delivery to {state.name} failed")
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _deliver(
+        self, state: _MemberQueue, batch: list[tuple[float, Any]]
+    ) -> None:
+        """POST a batch to the member's report_url, retrying failures."""
+        url, _ = self._targets[state.name]
+        client = self._client(url)
+        body = {"member": state.name, "reports": [report for _, report in batch]}
+        extensions = {"trace": self._trace}
+        error = ""
+        for attempt in range(self.retries + 1):
+            if attempt:
+                state.retried += 1
+                INSTRUMENTATION.incr("reports.retries", 1, state.labels)
+                await asyncio.sleep(backoff_delay(attempt - 1))
+            try:
+                response = await client.post(url, json=body, extensions=extensions)
+            except httpx.TransportError as e:
+                error = str(e) or type(e).__name__
+                continue
+            if response.is_success:
+                self._record_delivery(state, batch)
+                return
+            error = f"HTTP {response.status_code}"
+            if response.status_code not in RETRY_STATUSES:
+                break
+
+        state.failed += len(batch)
+        INSTRUMENTATION.incr("reports.failed", len(batch), state.labels)
+        logger.warning(
+            f"Dropped {len(batch)} reports for {state.name} after "
+            f"{attempt + 1} attempts: {error}"
+        )
+
+    def _record_delivery(
+        self, state: _MemberQueue, batch: list[tuple[float, Any]]
+    ) -> None:
+        now = perf_counter()
+        state.batches += 1
+        state.delivered += len(batch)
+        for queued_at, _ in batch:
+            latency = now - queued_at
+            state.latency_total += latency
+            state.latency_max = max(state.latency_max, latency)
+            INSTRUMENTATION.observe("reports.delivery", latency, state.labels)
+        INSTRUMENTATION.incr("reports.delivered", len(batch), state.labels)
+
+    def _client(self, url: str) -> httpx.AsyncClient:
+        """Keep-alive client of the URL's host, shared by its members."""
+        parsed = httpx.URL(url)
+        host = (parsed.scheme, parsed.host, parsed.port)
+        client = self._clients.get(host)
+        if client is None:
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.time_out),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                transport=self._transport,
+            )
+            self._clients[host] = client
+        return client
+
+    async def _trace(self, event: str, info: dict[str, Any]) -> None:  # noqa: ARG002
+        """Trace hook of httpcore, counts new connections."""
+        if event == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections_opened += 1
+
+    async def stop(self, timeout: float = DRAIN_TIMEOUT) -> None:
+        """Stop accepting reports, deliver the queued ones, close clients.
+
+        Args:
+            timeout: Seconds to wait for queued reports before dropping them
+        """
+        self._closing = True
+        queues = self._queues
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(state.queue.join() for state in queues.values())),
+                timeout,
+            )
+        except TimeoutError:
+            left = sum(state.queue.qsize() for state in queues.values())
+            logger.warning(f"Dropping {left} undelivered reports on shutdown")
+        workers = [state.worker for state in queues.values() if state.worker]
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def member_stats(self) -> dict[str, dict[str, int | float]]:
+        """Delivery counters and latency of each member reported to so far."""
+        return {name: state.stats() for name, state in self._queues.items()}
+
+    def stats(self) -> dict[str, int | float]:
+        """Counters summed over every member."""
+        totals: dict[str, int | float] = {
+            "members": len(self._targets),
+            "hosts": len(self._clients),
+            "connections_opened": self.connections_opened,
+            "queued": 0,
+            "batches": 0,
+            "delivered": 0,
+            "failed": 0,
+            "dropped": 0,
+            "retried": 0,
+        }
+        for stats in self.member_stats().values():
+            for key in (
+                "queued",
+                "batches",
+                "delivered",
+                "failed",
+                "dropped",
+                "retried",
+            ):
+                totals[key] += stats[key]
+        return totals
+
+
+# Started in the app lifespan; members synced from config.toml and the DB
+REPORTS = ReportDispatcher()
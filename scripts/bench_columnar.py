@@ -0,0 +1,89 @@
+# ruff: noqa: T201
+"""Benchmark: columnar (NumPy) vs row-wise product filtering.
+
+Runs the filter stage and the whole ``process_response`` both ways on
+synthetic catalogs, for a few exclusion rule sets, and checks that the
+outputs are identical. Needs the ``columnar`` extra (numpy).
+
+Usage:
+    python -m scripts.bench_columnar [--sizes 1000,10000,100000] [--rounds 5]
+"""
+
+import argparse
+import json
+from collections.abc import Callable
+from functools import partial
+from statistics import median
+from time import perf_counter
+
+from app.services.digipos.columnar import HAS_NUMPY
+from app.services.digipos.factory_parser import ProcessorFactory
+from app.services.digipos.product import decode_product
+from app.services.digipos.rules import ExclusionLists, RuleSet
+from loguru import logger
+from scripts.synthetic_catalog import build_catalog
+
+DEFAULT_SIZES = (500, 2_000, 10_000, 100_000)
+RULE_SETS = {
+    "default": ExclusionLists((), (), ("Music RBT/NSP",)),
+    "subcategories": ExclusionLists(("Malam", "Roaming"), (), ("Music RBT/NSP",)),
+    "40 name prefixes": ExclusionLists(
+        (), (*(f"Promo {i}" for i in range(39)), "kuota roaming"), ()
+    ),
+    "40 quota patterns": ExclusionLists(
+        (), (), (*(f"Bonus {i} GB" for i in range(39)), "Music RBT/NSP")
+    ),
+}
+
+
+def median_ms(rounds: int, func: Callable[[], object]) -> float:
+    """Median wall time of ``func`` in milliseconds."""
+    timings = []
+    for _ in range(rounds):
+        start = perf_counter()
+        func()
+        timings.append((perf_counter() - start) * 1000)
+    return median(timings)
+
+
+def processor_for(lists: ExclusionLists, columnar: bool):
+    """Fresh DATA processor for one rule set."""
+    rules = RuleSet(exclusions={"RECHARGE": lists}, columnar=columnar)
+    return ProcessorFactory.create_processor("DATA", rules)
+
+
+def main() -> None:
+    """Print filter-stage and end-to-end medians for every case."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)))
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    if not HAS_NUMPY:
+        raise SystemExit("numpy is not installed (pip install mkit-trimmer[columnar])")
+    logger.remove()
+
+    print(
+        f"{'rules':<18} {'products':>8} {'filter row':>11} {'filter col':>11} "
+        f"{'speedup':>8} {'total row':>10} {'total col':>10}"
+    )
+    for label, lists in RULE_SETS.items():
+        row = processor_for(lists, columnar=False)
+        col = processor_for(lists, columnar=True)
+        for products in map(int, args.sizes.split(",")):
+            body = build_catalog("DATA", products, seed=products)
+            assert row.process_response(body) == col.process_response(body), label
+
+            items = json.loads(body, object_hook=decode_product)["paket"]
+            filter_row = median_ms(args.rounds, partial(row._select_products, items))
+            filter_col = median_ms(args.rounds, partial(col._select_products, items))
+            total_row = median_ms(args.rounds, partial(row.process_response, body))
+            total_col = median_ms(args.rounds, partial(col.process_response, body))
+            print(
+                f"{label:<18} {products:>8} {filter_row:>9.2f}ms "
+                f"{filter_col:>9.2f}ms {filter_row / filter_col:>7.1f}x "
+                f"{total_row:>8.1f}ms {total_col:>8.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# ruff: noqa: T201
+"""Benchmark suite for process_category_response.
+
+Runs every category in ``ProcessorFactory`` on synthetic catalogs of each
+size and reports throughput, per-stage time (from ``INSTRUMENTATION``)
+and peak traced memory. Results are written as JSON so runs can be
+compared; ``--compare`` exits with status 1 when a case's best time got
+slower than ``--threshold`` against a previous result file.
+
+A small run of the suite, checked against an uncached pipeline, is part
+of the tests (``pytest -m performance``).
+
+Usage:
+    python -m scripts.bench_parser [--sizes 10,1000,100000] [--rounds 5]
+        [--categories DATA,VF] [--output FILE] [--compare BASELINE]
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tracemalloc
+from datetime import UTC, datetime
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+from app.custom.log_utils import INSTRUMENTATION
+from app.services.digipos.factory_parser import ProcessorFactory
+from app.services.digipos.parser_service import (
+    RESULT_CACHE,
+    process_category_response,
+)
+from loguru import logger
+from scripts.synthetic_catalog import build_catalog
+
+DEFAULT_SIZES = (10, 100, 1_000, 10_000, 100_000)
+DEFAULT_ROUNDS = 5
+# Small cases get extra rounds until they run this long, to tame noise
+MIN_CASE_SECONDS = 0.5
+MAX_ROUNDS = 1000
+RESULTS_DIR = Path(".benchmarks")
+STAGES = ("parser.decode", "parser.filter", "parser.format", "parser.optimize")
+
+
+def git_commit() -> str | None:
+    """Current commit, to tell result files apart."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_case(category: str, products: int, rounds: int) -> dict:
+    """Benchmark one category/size and return its result record."""
+    body = build_catalog(category, products, seed=products)
+
+    # Warm-up run also yields the output size and the round count
+    RESULT_CACHE.clear()
+    start = perf_counter()
+    output = process_category_response(category, body)
+    elapsed = perf_counter() - start
+    rounds = max(rounds, min(MAX_ROUNDS, int(MIN_CASE_SECONDS / elapsed)))
+
+    timings = []
+    INSTRUMENTATION.reset()
+    for _ in range(rounds):
+        RESULT_CACHE.clear()  # measure the pipeline, not cache hits
+        start = perf_counter()
+        process_category_response(category, body)
+        timings.append(perf_counter() - start)
+    stage_timings = INSTRUMENTATION.snapshot()["timings"]
+
+    # Separate run: tracing allocations slows the pipeline down
+    RESULT_CACHE.clear()
+    tracemalloc.start()
+    process_category_response(category, body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median_s = median(timings)
+    return {
+        "category": category,
+        "products": products,
+        "payload_bytes": len(body),
+        "output_chars": len(output),
+        "rounds": rounds,
+        "median_ms": median_s * 1000,
+        "min_ms": min(timings) * 1000,
+        "products_per_s": products / median_s,
+        "mb_per_s": len(body) / median_s / 1_000_000,
+        "stages_ms": {
+            stage.removeprefix("parser."): (
+                stage_timings[stage]["sum"] / rounds * 1000
+                if stage in stage_timings
+                else 0.0
+            )
+            for stage in STAGES
+        },
+        "peak_memory_mb": peak / 1_000_000,
+    }
+
+
+def compare(results: list[dict], baseline_file: Path, threshold: float) -> bool:
+    """Print best-time changes against ``baseline_file``; False on regression.
+
+    The best (min) time is compared rather than the median: it is the
+    least sensitive to other load on the machine.
+    """
+    baseline = {
+        (record["category"], record["products"]): record
+        for record in json.loads(baseline_file.read_text())["results"]
+    }
+    ok = True
+    print(f"\nCompared with {baseline_file} (threshold {threshold:.0%}):")
+    for record in results:
+        previous = baseline.get((record["category"], record["products"]))
+        if previous is None:
+            continue
+        change = record["min_ms"] / previous["min_ms"] - 1
+        regressed = change > threshold
+        ok = ok and not regressed
+        print(
+            f"{record['category']:<14} {record['products']:>7}  "
+            f"{previous['min_ms']:9.2f} -> {record['min_ms']:9.2f} ms "
+            f"({change:+.1%}){'  REGRESSION' if regressed else ''}"
+        )
+    return ok
+
+
+def parse_args() -> argparse.Namespace:
+    """Command line options."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default=",".join(map(str, DEFAULT_SIZES)),
+        help="comma-separated catalog sizes",
+    )
+    parser.add_argument(
+        "--categories",
+        default=",".join(sorted(ProcessorFactory.get_supported_categories())),
+        help="comma-separated categories (default: all)",
+    )
+    parser.add_argument(
+        "--rounds",
+        type=int,
+        default=DEFAULT_ROUNDS,
+        help="minimum timed runs per case",
+    )
+    parser.add_argument("--output", type=Path, help="result file (JSON)")
+    parser.add_argument("--compare", type=Path, help="previous result file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="allowed best-time slowdown for --compare (0.10 = 10%%)",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Run every case, save the results and optionally compare them."""
+    args = parse_args()
+    logger.remove()
+    INSTRUMENTATION.configure(enabled=True, sample_rate=0.0)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    categories = [category.upper() for category in args.categories.split(",")]
+
+    results = []
+    print(
+        f"{'category':<14} {'products':>8} {'median ms':>10} {'products/s':>11} "
+        f"{'MB/s':>7} {'decode':>8} {'filter':>8} {'format':>8} {'optimize':>8} "
+        f"{'peak MB':>8}"
+    )
+    for category in categories:
+        for products in sizes:
+            record = run_case(category, products, args.rounds)
+            results.append(record)
+            stages = record["stages_ms"]
+            print(
+                f"{category:<14} {products:>8} {record['median_ms']:>10.2f} "
+                f"{record['products_per_s']:>11.0f} {record['mb_per_s']:>7.1f} "
+                f"{stages['decode']:>8.2f} {stages['filter']:>8.2f} "
+                f"{stages['format']:>8.2f} {stages['optimize']:>8.2f} "
+                f"{record['peak_memory_mb']:>8.1f}"
+            )
+
+    started = datetime.now(UTC)
+    output = args.output or RESULTS_DIR / f"parser-{started:%Y%m%dT%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(
+        json.dumps(
+            {
+                "meta": {
+                    "timestamp": started.isoformat(),
+                    "commit": git_commit(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "rules_version": ProcessorFactory.rules.version,
+                    "rounds": args.rounds,
+                },
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    print(f"\nResults written to {output}")
+
+    if args.compare and not compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# ruff: noqa: T201
+"""Benchmark: bytes-native /trim/{category} vs a naive JSON-body endpoint.
+
+The naive endpoint lets FastAPI parse the body into a dict, then dumps it
+back to a string for the parser, the way a first version usually looks.
+
+Usage:
+    python -m scripts.bench_trim_endpoint [products] [rounds]
+"""
+
+import json
+import sys
+from time import perf_counter
+
+from app.api.trimmer import router as trimmer_router
+from app.services.digipos.parser_service import (
+    RESULT_CACHE,
+    process_category_response,
+)
+from fastapi import Body, FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+from loguru import logger
+from scripts.synthetic_catalog import build_catalog
+
+
+def build_app() -> FastAPI:
+    """App with the real trimmer router plus the naive endpoint."""
+    app = FastAPI()
+    app.include_router(trimmer_router)
+
+    @app.post("/naive/{category}", response_class=PlainTextResponse)
+    def naive_trim(category: str, payload: dict = Body(...)) -> str:
+        return process_category_response(category, json.dumps(payload))
+
+    return app
+
+
+def bench(client: TestClient, url: str, body: bytes, rounds: int) -> float:
+    """Return the median request time in milliseconds."""
+    timings = []
+    for _ in range(rounds):
+        RESULT_CACHE.clear()  # measure the full pipeline, not cache hits
+        start = perf_counter()
+        response = client.post(
+            url, content=body, headers={"content-type": "application/json"}
+        )
+        timings.append((perf_counter() - start) * 1000)
+        response.raise_for_status()
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def main() -> None:
+    """Run both endpoints on the same payload and print the medians."""
+    products = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    logger.remove()
+
+    body = build_catalog("DATA", products)
+    headers = {"content-type": "application/json"}
+    with TestClient(build_app()) as client:
+        raw = client.post("/trim/DATA", content=body, headers=headers).text
+        naive = client.post("/naive/DATA", content=body, headers=headers).text
+        assert raw == naive, "endpoints disagree"
+
+        bytes_ms = bench(client, "/trim/DATA", body, rounds)
+        naive_ms = bench(client, "/naive/DATA", body, rounds)
+
+    print(f"payload: {products} products, {len(body) / 1024:.0f} KiB")
+    print(f"bytes-native /trim : {bytes_ms:8.2f} ms (median of {rounds})")
+    print(f"naive JSON body    : {naive_ms:8.2f} ms (median of {rounds})")
+    print(f"speedup            : {naive_ms / bytes_ms:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# ruff: noqa: T201
+"""Local stand-in for the Digipos upstream API.
+
+Serves synthetic catalogs (``?category=DATA``) with optional latency and
+failure injection, so ``DigiposClient`` pooling, timeouts and retries can
+be exercised without the real upstream. Point a ``[[digipos]]`` account's
+``base_url`` at it, or run ``--check`` to drive scheduled clients of
+``--accounts`` accounts (each limited to ``--rate`` calls per second)
+against it and print their stats.
+
+Usage:
+    python -m scripts.fake_digipos [--port 8010] [--products 2000]
+        [--latency 0.05] [--fail-rate 0.1] [--check 50]
+        [--accounts 2] [--rate 10]
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+
+import uvicorn
+from app.config.config import DigiposSettings
+from app.services.digipos.client import UpstreamClients
+from fastapi import FastAPI, Response
+from loguru import logger
+from scripts.synthetic_catalog import build_catalog
+
+
+def build_app(products: int, latency: float, fail_rate: float) -> FastAPI:
+    """App serving one fixed synthetic catalog per category."""
+    app = FastAPI()
+    catalogs: dict[str, bytes] = {}
+    rng = random.Random(0)
+
+    @app.get("/")
+    async def catalog(category: str = "DATA") -> Response:
+        if latency:
+            await asyncio.sleep(latency)
+        if rng.random() < fail_rate:
+            return Response(status_code=503)
+        category = category.upper()
+        if category not in catalogs:
+            catalogs[category] = build_catalog(category, products, seed=1)
+        return Response(catalogs[category], media_type="application/json")
+
+    return app
+
+
+async def check(
+    port: int, requests: int, concurrency: int, accounts: int, rate: float
+) -> None:
+    """Fetch ``requests`` catalogs through scheduled clients, print stats."""
+    upstream = UpstreamClients()
+    upstream.start(
+        DigiposSettings(
+            username=f"check{i}",
+            password="check",
+            pin="",
+            base_url=f"http://127.0.0.1:{port}/",
+            time_out=5,
+            retries=3,
+            rate_limit=rate,
+            burst=1,
+        )
+        for i in range(accounts)
+    )
+    upstream.scheduler.max_wait = float("inf")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch() -> int:
+        async with semaphore, upstream.acquire() as client:
+            return len(await client.fetch_catalog("DATA"))
+
+    start = time.perf_counter()
+    sizes = await asyncio.gather(*(fetch() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    stats = upstream.stats()
+    await upstream.aclose()
+    print(
+        f"{requests} catalogs ({sizes[0]} bytes each) in {elapsed:.2f}s "
+        f"({requests / elapsed:.1f}/s over {accounts} accounts)"
+    )
+    for key, value in stats.items():
+        print(
+            f"  {key}: {value:.4g}" if isinstance(value, float) else f"  {key}: {value}"
+        )
+
+
+def main() -> None:
+    """Serve the stand-in, or serve it in the background and run ``--check``."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--check", type=int, default=0, metavar="REQUESTS")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--accounts", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=10.0)
+    args = parser.parse_args()
+
+    app = build_app(args.products, args.latency, args.fail_rate)
+    if not args.check:
+        uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+        return
+
+    logger.remove()
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        asyncio.run(
+            check(args.port, args.check, args.concurrency, args.accounts, args.rate)
+        )
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# ruff: noqa: T201
+"""Local stand-in for a member's report_url.
+
+Accepts report batches (``POST /{member}``) with optional latency and
+failure injection, and counts what it received, so the report dispatcher's
+batching, keep-alive pooling, backpressure and retries can be exercised
+without real members. Point a member's ``report_url`` at it, or run
+``--check`` to push reports for ``--members`` members through a
+``ReportDispatcher`` and print what was delivered.
+
+Usage:
+    python -m scripts.fake_report_receiver [--port 8020] [--latency 0.02]
+        [--fail-rate 0.1] [--check 1000] [--members 4]
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+from collections import Counter
+
+import uvicorn
+from app.config.config import ReportSettings
+from app.services.member.member_reports import ReportDispatcher
+from fastapi import FastAPI, Request, Response
+from loguru import logger
+
+
+def build_app(latency: float, fail_rate: float) -> tuple[FastAPI, Counter]:
+    """App accepting report batches; the counter tallies batches and reports."""
+    app = FastAPI()
+    received: Counter = Counter()
+    rng = random.Random(0)
+
+    @app.post("/{member}")
+    async def report(member: str, request: Request) -> Response:
+        if latency:
+            await asyncio.sleep(latency)
+        if rng.random() < fail_rate:
+            return Response(status_code=503)
+        body = await request.json()
+        received["batches"] += 1
+        received[member] += len(body["reports"])
+        return Response(status_code=204)
+
+    return app, received
+
+
+async def check(port: int, reports: int, members: int, received: Counter) -> None:
+    """Submit ``reports`` reports per member, drain, print delivery stats."""
+    dispatcher = ReportDispatcher()
+    dispatcher.configure(ReportSettings(queue_size=200, enqueue_timeout=10.0))
+    dispatcher.start()
+    names = [f"member{i}" for i in range(members)]
+    dispatcher.sync(
+        "check",
+        {name: (f"http://127.0.0.1:{port}/{name}", "127.0.0.1") for name in names},
+    )
+
+    async def produce(name: str) -> None:
+        for i in range(reports):
+            await dispatcher.submit(name, {"id": i, "status": "SUCCESS"})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(produce(name) for name in names))
+    await dispatcher.stop(timeout=60.0)
+    elapsed = time.perf_counter() - start
+
+    delivered = sum(received[name] for name in names)
+    print(
+        f"{reports * members} reports for {members} members in {elapsed:.2f}s: "
+        f"{delivered} received in {received['batches']} batches over "
+        f"{dispatcher.connections_opened} connections"
+    )
+    for name, stats in dispatcher.member_stats().items():
+        print(
+            f"  {name}: delivered {stats['delivered']}, failed {stats['failed']}, "
+            f"retried {stats['retried']}, batches {stats['batches']}, "
+            f"latency avg {stats['latency_avg'] * 1000:.1f}ms "
+            f"max {stats['latency_max'] * 1000:.1f}ms"
+        )
+
+
+def main() -> None:
+    """Serve the stand-in, or serve it in the background and run ``--check``."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8020)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--check", type=int, default=0, metavar="REPORTS")
+    parser.add_argument("--members", type=int, default=4)
+    args = parser.parse_args()
+
+    app, received = build_app(args.latency, args.fail_rate)
+    if not args.check:
+        uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+        return
+
+    logger.remove()
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        asyncio.run(check(args.port, args.check, args.members, received))
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Synthetic Digipos catalogs for benchmarks.
+
+Builds upstream-shaped responses (``{"to", "paket"}`` for recharge
+categories, ``{"req", "res"}`` for VF) with any number of products. Quotas
+are drawn from a fixed pool of shapes with a bounded number of distinct
+values, so repetition across products looks like a real catalog, and some
+products hit the default exclusion rules. Output is deterministic per seed.
+
+Usage:
+    python -m scripts.synthetic_catalog CATEGORY PRODUCTS > payload.json
+"""
+
+import json
+import random
+import sys
+
+from app.services.digipos.factory_parser import ProcessorFactory
+
+# Quota shapes seen upstream; "Music RBT/NSP" is excluded for recharge
+QUOTA_SHAPES = (
+    "DATA National/Internet {days} Days {gb} GB Nasional, "
+    "Local Data/Kuota Lokal Internet {days} Days {gb2} GB",
+    "DATA/Internet {gb} GB {days} Days, Bonus/ {mb} MB",
+    "Kuota Apps/YouTube {gb} GB {days} Days, DATA/Internet {mb} MB",
+    "Voice/Nelpon {minutes} Menit {days} Days, SMS/{sms} SMS",
+    "DATA National/Internet {days} Days {gb} GB Nasional",
+    "Music RBT/NSP {days} Days",
+    "Roaming/Internet Roaming {gb} GB {days} Days",
+    "",
+)
+PRODUCT_NAMES = (
+    "Combo Sakti",
+    "Internet OMG",
+    "Ketengan YouTube",
+    "Paket Malam",
+    "Kuota Roaming",
+    "Telpon Sesama",
+)
+SUBCATEGORIES = ("Combo", "Ketengan", "Malam", "Apps", "Roaming", "Voice")
+
+# Distinct quota strings per catalog (real catalogs repeat a few hundred)
+DISTINCT_QUOTAS = 300
+
+
+def build_quota_pool(rng: random.Random, size: int) -> list[str]:
+    """Render ``size`` quota strings from ``QUOTA_SHAPES``."""
+    return [
+        rng.choice(QUOTA_SHAPES).format(
+            days=rng.choice((1, 3, 7, 14, 30)),
+            gb=rng.choice((1, 1.5, 2, 5, 12, 25, 50)),
+            gb2=rng.choice((3, 10, 43)),
+            mb=rng.choice((100, 500, 750)),
+            minutes=rng.choice((60, 100, 300)),
+            sms=rng.choice((50, 100)),
+        )
+        for _ in range(size)
+    ]
+
+
+def build_products(
+    products: int, seed: int = 0, distinct_quotas: int = DISTINCT_QUOTAS
+) -> list[dict]:
+    """Build ``products`` upstream product dicts."""
+    rng = random.Random(seed)
+    quotas = build_quota_pool(rng, distinct_quotas)
+    items = []
+    for i in range(products):
+        price = rng.randrange(1_000, 250_000, 500)
+        items.append(
+            {
+                "productId": f"{seed:02d}{i:07d}",
+                "productName": f"{rng.choice(PRODUCT_NAMES)} {rng.randint(1, 99)}",
+                "productSubCategory": rng.choice(SUBCATEGORIES),
+                "quota": rng.choice(quotas),
+                "total_": price + rng.choice((0, 1_000, 2_500)),
+                "price": price,
+                # Fields the trimmer drops, present upstream
+                "validity": f"{rng.choice((1, 7, 30))} Hari",
+                "description": "Paket internet dengan kuota nasional dan lokal",
+                "isPromo": rng.random() < 0.1,
+            }
+        )
+    return items
+
+
+def build_catalog(
+    category: str,
+    products: int,
+    seed: int = 0,
+    distinct_quotas: int = DISTINCT_QUOTAS,
+) -> bytes:
+    """Build a raw upstream response body for ``category``.
+
+    Raises:
+        ValueError: If category is not supported
+    """
+    items = build_products(products, seed, distinct_quotas)
+    if ProcessorFactory.get_processor_type(category) == "ACTIVATION":
+        document = {"req": {"category": category.upper(), "to": "0812"}, "res": items}
+    else:
+        document = {"to": "081234567890", "paket": items}
+    return json.dumps(document).encode()
+
+
+def main() -> None:
+    """Write a catalog to stdout."""
+    category = sys.argv[1] if len(sys.argv) > 1 else "DATA"
+    products = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    sys.stdout.buffer.write(build_catalog(category, products))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""The parser benchmark suite (scripts/bench_parser) at a small size."""
+
+import json
+from pathlib import Path
+
+import pytest
+from app.services.digipos.factory_parser import ProcessorFactory
+from app.services.digipos.parser_service import process_category_response
+from app.services.digipos.quota_rewriter import QuotaRewriter
+from scripts import bench_parser
+from scripts.synthetic_catalog import build_catalog
+
+PRODUCTS = 300
+
+
+@pytest.fixture(scope="module")
+def results() -> list[dict]:
+    """One quick round of every category, as the script runs them."""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(bench_parser, "MIN_CASE_SECONDS", 0.0)
+        return [
+            bench_parser.run_case(category, PRODUCTS, rounds=1)
+            for category in sorted(ProcessorFactory.get_supported_categories())
+        ]
+
+
+@pytest.mark.performance
+def test_every_stage_is_measured(results: list[dict]) -> None:
+    for record in results:
+        assert record["rounds"] >= 1
+        assert record["output_chars"] > 0
+        assert record["products_per_s"] > 0
+        # Decode, filter and format run for every payload; optimize only
+        # when the output is over budget
+        stages = record["stages_ms"]
+        assert all(stages[stage] > 0 for stage in ("decode", "filter", "format"))
+
+
+@pytest.mark.performance
+@pytest.mark.parametrize(
+    "category", sorted(ProcessorFactory.get_supported_categories())
+)
+def test_benchmarked_output_matches_baseline(
+    results: list[dict], category: str
+) -> None:
+    """Cached, memoized pipeline == a fresh row-wise one without caches."""
+    body = build_catalog(category, PRODUCTS, seed=PRODUCTS)
+    baseline = ProcessorFactory.create_processor(
+        category, ProcessorFactory.rules, QuotaRewriter(cache_entries=0)
+    )
+    baseline.columnar = False
+
+    expected = baseline.process_response(body)
+
+    assert process_category_response(category, body) == expected
+    record = next(r for r in results if r["category"] == category)
+    assert record["output_chars"] == len(expected)
+
+
+@pytest.mark.performance
+def test_compare_flags_regressions(results: list[dict], tmp_path: Path) -> None:
+    baseline_file = tmp_path / "baseline.json"
+    baseline_file.write_text(json.dumps({"results": results}))
+    assert bench_parser.compare(results, baseline_file, threshold=0.10)
+
+    faster = [{**record, "min_ms": record["min_ms"] / 2} for record in results]
+    baseline_file.write_text(json.dumps({"results": faster}))
+    assert not bench_parser.compare(results, baseline_file, threshold=0.10)
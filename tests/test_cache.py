@@ -0,0 +1,125 @@
+"""LRU eviction, size cap and TTL of the pipeline caches."""
+
+import pytest
+from app.services.digipos.cache import LRUCache
+from app.services.digipos.parser_service import RESULT_CACHE, process_category_response
+from scripts.synthetic_catalog import build_catalog
+
+
+class Clock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.unit
+def test_least_recently_used_is_evicted_first() -> None:
+    cache = LRUCache(3)
+    for key in "abc":
+        cache.put(key, key.upper())
+    assert cache.get("a") == "A"  # "b" is now the least recently used
+
+    cache.put("d", "D")
+
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == ["A", "C", "D"]
+    assert cache.evictions == 1
+
+
+@pytest.mark.unit
+def test_total_size_is_capped() -> None:
+    cache = LRUCache(100, max_size=10, sizeof=lambda key, value: len(value))  # noqa: ARG005
+    cache.put("a", "x" * 4)
+    cache.put("b", "x" * 4)
+    cache.put("a", "x" * 2)  # replacing an entry frees its old size
+    assert cache.size == 6
+
+    cache.put("c", "x" * 5)
+
+    assert cache.get("b") is None
+    assert cache.size == 7
+    assert len(cache) == 2
+
+
+@pytest.mark.unit
+def test_entry_larger_than_the_cap_is_not_stored() -> None:
+    cache = LRUCache(100, max_size=10, sizeof=lambda key, value: len(value))  # noqa: ARG005
+    cache.put("a", "x" * 5)
+
+    cache.put("big", "x" * 11)
+
+    assert cache.get("big") is None
+    assert cache.get("a") == "x" * 5
+    assert cache.evictions == 0
+
+
+@pytest.mark.unit
+def test_entries_expire_after_ttl() -> None:
+    clock = Clock()
+    cache = LRUCache(10, ttl=30.0, clock=clock)
+    cache.put("a", 1)
+    clock.now = 29.9
+    assert cache.get("a") == 1
+
+    clock.now = 30.0
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.stats() == {
+        "entries": 0,
+        "size": 0,
+        "hits": 1,
+        "misses": 1,
+        "evictions": 0,
+        "expirations": 1,
+        "hit_ratio": 0.5,
+    }
+
+
+@pytest.mark.unit
+def test_put_restarts_the_ttl() -> None:
+    clock = Clock()
+    cache = LRUCache(10, ttl=30.0, clock=clock)
+    cache.put("a", 1)
+    clock.now = 20.0
+    cache.put("a", 2)
+    clock.now = 40.0
+    assert cache.get("a") == 2
+
+
+@pytest.mark.unit
+def test_take_counters_resets_them() -> None:
+    cache = LRUCache(1)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("b")
+    cache.put("b", 2)
+
+    assert cache.take_counters() == {
+        "hits": 1,
+        "misses": 1,
+        "evictions": 1,
+        "expirations": 0,
+    }
+    assert cache.take_counters() == dict.fromkeys(
+        ("hits", "misses", "evictions", "expirations"), 0
+    )
+
+
+@pytest.mark.unit
+def test_identical_payloads_hit_the_result_cache() -> None:
+    RESULT_CACHE.clear()
+    body = build_catalog("DATA", 200, seed=3)
+    hits = RESULT_CACHE.hits
+
+    first = process_category_response("DATA", body)
+    assert process_category_response("DATA", body) == first
+    assert process_category_response("DATA", body.decode()) == first
+    assert RESULT_CACHE.hits == hits + 2
+
+    process_category_response("DATA", build_catalog("DATA", 200, seed=4))
+    assert len(RESULT_CACHE) == 2
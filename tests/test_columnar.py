@@ -0,0 +1,45 @@
+"""The columnar (NumPy) filter must give the same output as the row-wise one."""
+
+import json
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from app.services.digipos.columnar import COLUMNAR_MIN_PRODUCTS, filter_columns
+from app.services.digipos.product import Product, decode_product
+from scripts.bench_columnar import RULE_SETS, processor_for
+from scripts.synthetic_catalog import build_catalog
+
+# Below and above the size where processors switch to the columnar path
+SIZES = (COLUMNAR_MIN_PRODUCTS // 4, COLUMNAR_MIN_PRODUCTS * 3)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("rules", list(RULE_SETS))
+def test_process_response_matches_row_wise(rules: str, size: int) -> None:
+    row = processor_for(RULE_SETS[rules], columnar=False)
+    col = processor_for(RULE_SETS[rules], columnar=True)
+    body = build_catalog("DATA", size, seed=size)
+    assert col.process_response(body) == row.process_response(body)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("rules", list(RULE_SETS))
+def test_filter_columns_matches_row_wise(rules: str) -> None:
+    exclusions = processor_for(RULE_SETS[rules], columnar=False).exclusions
+    body = build_catalog("DATA", COLUMNAR_MIN_PRODUCTS, seed=7)
+    products = [
+        p if isinstance(p, Product) else Product.from_dict(p)
+        for p in json.loads(body, object_hook=decode_product)["paket"]
+    ]
+
+    kept, dropped = filter_columns(products, exclusions)
+
+    reasons = [exclusions.match(p) for p in products]
+    assert kept == [
+        p for p, reason in zip(products, reasons, strict=True) if reason is None
+    ]
+    assert dropped == Counter(reason for reason in reasons if reason is not None)
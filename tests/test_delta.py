@@ -0,0 +1,107 @@
+"""Delta output: full first, then changes only, resync, and per-member state."""
+
+import json
+from collections.abc import Iterator
+
+import pytest
+from app.api.trimmer import delta_member
+from app.config.config import MemberSettings
+from app.custom.exceptions import MemberForbiddenError
+from app.custom.metrics import set_members
+from app.services.digipos import parser_service
+from app.services.digipos.cache import LRUCache
+from app.services.digipos.parser_service import delta_category_response_async
+from scripts.synthetic_catalog import build_products
+
+
+def catalog(products: list[dict]) -> bytes:
+    return json.dumps({"to": "081234567890", "paket": products}).encode()
+
+
+@pytest.fixture(autouse=True)
+def delta_state(monkeypatch: pytest.MonkeyPatch) -> LRUCache:
+    state = LRUCache(16)
+    monkeypatch.setattr(parser_service, "DELTA_STATE", state)
+    return state
+
+
+@pytest.fixture
+def members() -> Iterator[None]:
+    set_members(
+        MemberSettings(name=name, ipaddress="10.0.0.1", report_url="", is_allowed=True)
+        for name in ("alpha", "beta")
+    )
+    yield
+    set_members([])
+
+
+@pytest.mark.unit
+async def test_full_then_incremental_then_resync() -> None:
+    products = build_products(300, seed=2)
+    first = await delta_category_response_async("alpha", "DATA", catalog(products))
+    assert first.full
+    assert first.added == len(first.fingerprints) > 0
+    assert first.changed == first.removed == 0
+
+    unchanged = await delta_category_response_async("alpha", "DATA", catalog(products))
+    assert not unchanged.full
+    assert (unchanged.added, unchanged.changed, unchanged.removed) == (0, 0, 0)
+    assert unchanged.text == ""
+
+    kept = [p for p in products if p["productId"] in first.fingerprints]
+    changed, removed = kept[0], kept[1]
+    products = [
+        {**p, "price": p["price"] + 500} if p is changed else p
+        for p in products
+        if p is not removed
+    ]
+    products.append({**kept[2], "productId": "new-product"})
+    update = await delta_category_response_async("alpha", "DATA", catalog(products))
+    assert (update.added, update.changed, update.removed) == (1, 1, 1)
+    assert f"#{removed['productId']}|-" in update.text
+    assert "new-product" in update.text
+    assert len(update.fingerprints) == len(first.fingerprints)
+
+    resync = await delta_category_response_async(
+        "alpha", "DATA", catalog(products), resync=True
+    )
+    assert resync.full
+    assert resync.added == len(update.fingerprints)
+
+
+@pytest.mark.unit
+async def test_state_is_per_member_and_category() -> None:
+    body = catalog(build_products(100, seed=3))
+    await delta_category_response_async("alpha", "DATA", body)
+
+    assert not (await delta_category_response_async("alpha", "DATA", body)).full
+    assert (await delta_category_response_async("beta", "DATA", body)).full
+    assert (await delta_category_response_async("alpha", "VF", body)).full
+
+
+@pytest.mark.unit
+async def test_lost_state_makes_a_full_resync(delta_state: LRUCache) -> None:
+    body = catalog(build_products(100, seed=4))
+    await delta_category_response_async("alpha", "DATA", body)
+
+    delta_state.clear()
+
+    assert (await delta_category_response_async("alpha", "DATA", body)).full
+
+
+@pytest.mark.unit
+@pytest.mark.usefixtures("members")
+def test_members_behind_one_address_name_themselves() -> None:
+    assert delta_member("alpha", "10.0.0.1") == "alpha"
+    assert delta_member("beta", "10.0.0.1") == "beta"
+    with pytest.raises(MemberForbiddenError):
+        delta_member("alpha", "10.0.0.2")
+    with pytest.raises(MemberForbiddenError):
+        delta_member("gamma", "10.0.0.1")
+
+
+@pytest.mark.unit
+@pytest.mark.usefixtures("members")
+def test_member_defaults_to_the_client_address() -> None:
+    assert delta_member(None, "10.0.0.1") in {"alpha", "beta"}
+    assert delta_member(None, "10.0.0.9") == "10.0.0.9"
@@ -0,0 +1,63 @@
+"""Exclusion rules keep the baseline list and re.IGNORECASE semantics."""
+
+import re
+
+import pytest
+from app.config.config import ParserExclusionSettings
+from app.services.digipos.exclusions import PRODUCTNAME, SUBCATEGORY, ExclusionRules
+from app.services.digipos.matchers import PrefixTrie
+from app.services.digipos.product import Product
+from pydantic import ValidationError
+
+PATTERNS = ["Paket s", "KUOTA", "Ilimitado", "İnternet", "ΣΟΣ", "Straße", "µ"]
+NAMES = [
+    "paket \u017fuper",  # long s
+    "\u212auota",  # Kelvin sign
+    "\u0131limitado",  # dotless i
+    "internet",
+    "\u0130nternet",
+    "\u03c3\u03bf\u03c2",  # final sigma
+    "\u03c3\u03bf\u03c2x",
+    "STRASSE",
+    "stra\u00dfe 10GB",
+    "\u039c",  # Greek capital mu against the micro sign
+    "\u03bc",
+    "other",
+]
+
+
+def reference(pattern: str, name: str) -> bool:
+    """The baseline productname check."""
+    return bool(re.match(rf"^{re.escape(pattern)}", name, re.IGNORECASE))
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("name", NAMES)
+def test_prefix_trie_folds_like_ignorecase(name: str) -> None:
+    expected = any(reference(pattern, name) for pattern in PATTERNS)
+
+    assert PrefixTrie(PATTERNS).match(name) is expected
+
+
+@pytest.mark.unit
+def test_unhashable_subcategory_is_not_excluded() -> None:
+    rules = ExclusionRules(["Harian"], ["Promo"], [])
+
+    assert rules.match(Product(subcategory=["Harian"], product_name="x")) is None
+    assert rules.match(Product(subcategory={}, product_name="promo")) == PRODUCTNAME
+    assert rules.match(Product(subcategory="Harian")) == SUBCATEGORY
+
+
+@pytest.mark.unit
+def test_numeric_config_entries_are_text() -> None:
+    settings = ParserExclusionSettings(subcategories=[2024, "Harian"], productnames=[5])
+
+    assert settings.subcategories == ["2024", "Harian"]
+    assert settings.productnames == ["5"]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("value", [None, True, ["x"], {"a": 1}])
+def test_non_text_config_entries_are_rejected(value: object) -> None:
+    with pytest.raises(ValidationError):
+        ParserExclusionSettings(subcategories=[value])
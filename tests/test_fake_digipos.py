@@ -0,0 +1,114 @@
+"""Upstream clients against the local Digipos stand-in (scripts/fake_digipos)."""
+
+import asyncio
+import time
+from collections.abc import AsyncIterator, Callable, Iterable
+
+import pytest
+from app.config.config import DigiposSettings, UpstreamSettings
+from app.custom.exceptions import UpstreamGenericError
+from app.services.digipos import client as client_module
+from app.services.digipos.client import HEDGE_MIN_SAMPLES, UpstreamClients
+from fastapi import FastAPI
+from scripts.fake_digipos import build_app
+from scripts.synthetic_catalog import build_catalog
+
+PRODUCTS = 50
+
+
+def account(name: str, base_url: str, retries: int = 0) -> DigiposSettings:
+    return DigiposSettings(
+        username=name,
+        password="secret",
+        pin="",
+        base_url=base_url + "/",
+        time_out=5,
+        retries=retries,
+        rate_limit=1000.0,
+        burst=1000,
+    )
+
+
+@pytest.fixture
+async def upstream() -> AsyncIterator[UpstreamClients]:
+    clients = UpstreamClients()
+    yield clients
+    await clients.aclose()
+
+
+@pytest.fixture
+def no_backoff(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(client_module, "backoff_delay", lambda _: 0.0)
+
+
+def start(upstream: UpstreamClients, accounts: Iterable[DigiposSettings]) -> None:
+    upstream.start(accounts)
+    upstream.scheduler.max_wait = float("inf")
+
+
+@pytest.mark.unit
+async def test_sequential_calls_reuse_one_connection(
+    serve: Callable[[FastAPI], str], upstream: UpstreamClients
+) -> None:
+    start(upstream, [account("alpha", serve(build_app(PRODUCTS, 0.0, 0.0)))])
+
+    bodies = [await upstream.fetch_catalog("DATA") for _ in range(10)]
+
+    assert bodies == [build_catalog("DATA", PRODUCTS, seed=1)] * 10
+    stats = upstream.stats()
+    assert stats["requests"] == 10
+    assert stats["connections_opened"] == 1
+
+
+@pytest.mark.unit
+@pytest.mark.usefixtures("no_backoff")
+async def test_failed_attempts_are_retried(
+    serve: Callable[[FastAPI], str], upstream: UpstreamClients
+) -> None:
+    base_url = serve(build_app(PRODUCTS, 0.0, 0.3))
+    start(upstream, [account("alpha", base_url, retries=8)])
+
+    bodies = await asyncio.gather(*(upstream.fetch_catalog("VF") for _ in range(20)))
+
+    assert len(set(bodies)) == 1
+    stats = upstream.stats()
+    assert stats["retried"] > 0
+    assert stats["requests"] == 20 + stats["retried"]
+
+
+@pytest.mark.unit
+@pytest.mark.usefixtures("no_backoff")
+async def test_retries_are_bounded(
+    serve: Callable[[FastAPI], str], upstream: UpstreamClients
+) -> None:
+    start(upstream, [account("alpha", serve(build_app(PRODUCTS, 0.0, 1.0)), 2)])
+
+    with pytest.raises(UpstreamGenericError) as excinfo:
+        await upstream.fetch_catalog("DATA")
+
+    assert excinfo.value.context["attempts"] == 3
+    assert excinfo.value.context["status"] == 503
+    assert upstream.stats()["requests"] == 3
+
+
+@pytest.mark.unit
+async def test_slow_account_is_hedged(
+    serve: Callable[[FastAPI], str], upstream: UpstreamClients
+) -> None:
+    slow = serve(build_app(PRODUCTS, 0.5, 0.0))
+    fast = serve(build_app(PRODUCTS, 0.0, 0.0))
+    start(upstream, [account("slow", slow), account("fast", fast)])
+    upstream.configure(UpstreamSettings(hedge=True, hedge_budget=1.0))
+    # Recent latencies put the hedge delay at 20ms
+    upstream._latencies.extend([0.02] * HEDGE_MIN_SAMPLES)
+
+    started = time.perf_counter()
+    bodies = [await upstream.fetch_catalog("DATA") for _ in range(6)]
+    elapsed = time.perf_counter() - started
+
+    assert len(set(bodies)) == 1
+    stats = upstream.stats()
+    assert stats["hedged"] >= 1
+    assert stats["hedge_wins"] >= 1
+    # Without hedging, every call routed to the slow account would take 0.5s
+    assert elapsed < 0.5 * stats["hedge_wins"]
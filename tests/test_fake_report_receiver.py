@@ -0,0 +1,141 @@
+"""Report dispatcher against the local report receiver (scripts/fake_report_receiver)."""
+
+import asyncio
+from collections.abc import AsyncIterator, Callable
+
+import pytest
+from app.config.config import ReportSettings
+from app.custom.exceptions import MemberReportQueueFullError
+from app.services.member import member_reports
+from app.services.member.member_reports import ReportDispatcher
+from fastapi import FastAPI
+from scripts.fake_report_receiver import build_app
+
+MEMBERS = ("alpha", "beta", "gamma")
+
+
+@pytest.fixture
+async def dispatcher() -> AsyncIterator[ReportDispatcher]:
+    dispatcher = ReportDispatcher()
+    dispatcher.start()
+    yield dispatcher
+    await dispatcher.stop(timeout=0.1)
+
+
+@pytest.fixture
+def no_backoff(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(member_reports, "backoff_delay", lambda _: 0.0)
+
+
+def register(dispatcher: ReportDispatcher, base_url: str, *members: str) -> None:
+    dispatcher.sync(
+        base_url, {name: (f"{base_url}/{name}", "127.0.0.1") for name in members}
+    )
+
+
+async def submit_all(dispatcher: ReportDispatcher, reports: int) -> None:
+    async def produce(member: str) -> None:
+        for i in range(reports):
+            await dispatcher.submit(member, {"id": i, "status": "SUCCESS"})
+
+    await asyncio.gather(*(produce(member) for member in dispatcher.members))
+    await dispatcher.stop(timeout=10.0)
+
+
+@pytest.mark.unit
+async def test_reports_are_delivered_in_batches(
+    serve: Callable[[FastAPI], str], dispatcher: ReportDispatcher
+) -> None:
+    app, received = build_app(0.0, 0.0)
+    register(dispatcher, serve(app), *MEMBERS)
+    dispatcher.configure(ReportSettings(batch_window=0.02, batch_size=50))
+
+    await submit_all(dispatcher, 200)
+
+    assert {member: received[member] for member in MEMBERS} == dict.fromkeys(
+        MEMBERS, 200
+    )
+    stats = dispatcher.stats()
+    assert stats["delivered"] == 600
+    assert stats["failed"] == stats["dropped"] == 0
+    # At most batch_size reports per POST, and far fewer POSTs than reports
+    assert 12 <= received["batches"] == stats["batches"] <= 60
+
+
+@pytest.mark.unit
+async def test_members_share_one_pool_per_host(
+    serve: Callable[[FastAPI], str], dispatcher: ReportDispatcher
+) -> None:
+    first, first_received = build_app(0.0, 0.0)
+    second, second_received = build_app(0.0, 0.0)
+    dispatcher.configure(ReportSettings(batch_window=0.0, max_connections=1))
+    register(dispatcher, serve(first), *MEMBERS)
+    register(dispatcher, serve(second), "delta")
+
+    await submit_all(dispatcher, 50)
+
+    assert sum(first_received[m] for m in MEMBERS) + second_received["delta"] == 200
+    stats = dispatcher.stats()
+    # Every batch to a host reused its single keep-alive connection
+    assert stats["connections_opened"] == 2
+    assert stats["batches"] > 2
+
+
+@pytest.mark.unit
+@pytest.mark.usefixtures("no_backoff")
+async def test_failed_batches_are_retried(
+    serve: Callable[[FastAPI], str], dispatcher: ReportDispatcher
+) -> None:
+    app, received = build_app(0.0, 0.3)
+    register(dispatcher, serve(app), *MEMBERS)
+    dispatcher.configure(ReportSettings(batch_window=0.0, batch_size=10, retries=20))
+
+    await submit_all(dispatcher, 100)
+
+    stats = dispatcher.stats()
+    assert stats["delivered"] == 300
+    assert stats["failed"] == 0
+    assert stats["retried"] > 0
+    assert sum(received[member] for member in MEMBERS) == 300
+
+
+@pytest.mark.unit
+@pytest.mark.usefixtures("no_backoff")
+async def test_batches_failing_every_retry_are_dropped(
+    serve: Callable[[FastAPI], str], dispatcher: ReportDispatcher
+) -> None:
+    app, received = build_app(0.0, 1.0)
+    register(dispatcher, serve(app), "alpha")
+    dispatcher.configure(ReportSettings(batch_window=0.05, batch_size=100, retries=2))
+
+    await submit_all(dispatcher, 10)
+
+    stats = dispatcher.member_stats()["alpha"]
+    assert stats["delivered"] == 0
+    assert stats["failed"] == 10
+    assert stats["retried"] == 2
+    assert received["batches"] == 0
+
+
+@pytest.mark.unit
+async def test_full_queue_pushes_back(
+    serve: Callable[[FastAPI], str], dispatcher: ReportDispatcher
+) -> None:
+    app, _ = build_app(0.5, 0.0)
+    register(dispatcher, serve(app), "alpha")
+    dispatcher.configure(
+        ReportSettings(
+            batch_window=0.0, batch_size=1, queue_size=5, enqueue_timeout=0.05
+        )
+    )
+
+    # The worker takes one report and waits on the slow receiver
+    await dispatcher.submit("alpha", {"id": 0})
+    await asyncio.sleep(0.05)
+    for i in range(5):
+        await dispatcher.submit("alpha", {"id": i + 1})
+
+    with pytest.raises(MemberReportQueueFullError):
+        await dispatcher.submit("alpha", {"id": 6})
+    assert dispatcher.member_stats()["alpha"]["dropped"] == 1
+    assert dispatcher.member_stats()["alpha"]["queued"] == 5
@@ -0,0 +1,102 @@
+"""ArrayItemReader must yield what ``json.loads`` gives, however the body is cut."""
+
+import json
+
+import pytest
+from app.services.digipos.json_stream import ArrayItemReader
+
+DOCUMENTS = [
+    '{"paket": []}',
+    '{"paket": [1, 2.5, -3e2, 12345678901234567890]}',
+    '{"paket": [true, false, null, "x"]}',
+    '{"to": "081234567890", "paket": [{"productName": "Kuota 1 GB", "price": 1000}]}',
+    '{"req": {"category": "BYU", "to": "0812"}, "res": [{"a": [1, {"b": "]}"}]}]}',
+    ' \n{ "paket" : [ {"q": "Internet\\u00a030 Days"} , {"q": "Kuota \\"x\\""} ] } \n',
+    '{"paket": [{"productName": "Paket Malam é€\U0001f600"}], "count": 1}',
+    '{"paket": [10, 200, 3000], "total": 3210}',
+    '{"other": [1, 2], "paket": [3], "after": {"paket": [4]}}',
+    "\ufeff" + '{"paket": [{"a": 1}, {"a": 2}]}',
+]
+
+MISSING = [
+    "{}",
+    '{"to": "0812"}',
+    '{"pakets": [1, 2], "res": {"paket": [1]}}',
+]
+
+INVALID = [
+    "",
+    "[1, 2]",
+    '{"paket": [1, 2',
+    '{"paket": [1, 2]',
+    '{"paket": [1 2]}',
+    '{"paket": [1, 2],}',
+    '{"paket": [01]}',
+    '{"paket": [1]} {}',
+    "{paket: [1]}",
+    '{"paket" [1]}',
+    '{"paket": [tru]}',
+    '{"paket": [1], "x": 12',
+]
+
+CHUNK_SIZES = (1, 7, None)
+
+
+def read(document: bytes, key: str, chunk_size: int | None) -> list:
+    reader = ArrayItemReader(key)
+    chunk_size = chunk_size or len(document) or 1
+    items = []
+    for start in range(0, len(document), chunk_size):
+        items.extend(reader.feed(document[start : start + chunk_size]))
+    items.extend(reader.close())
+    assert reader.size == len(document)
+    return items
+
+
+def key_of(document: str) -> str:
+    return "res" if '"res"' in document else "paket"
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_items_match_json_loads(document: str, chunk_size: int | None) -> None:
+    key = key_of(document)
+    expected = json.loads(document.encode())[key]
+    assert read(document.encode(), key, chunk_size) == expected
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("document", MISSING)
+def test_missing_key_yields_nothing(document: str, chunk_size: int | None) -> None:
+    assert read(document.encode(), "paket", chunk_size) == []
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("document", INVALID)
+def test_invalid_or_truncated_raises(document: str, chunk_size: int | None) -> None:
+    with pytest.raises(json.JSONDecodeError):
+        read(document.encode(), "paket", chunk_size)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("chunk_size", (1, 7))
+def test_multibyte_characters_split_across_chunks(chunk_size: int) -> None:
+    document = json.dumps(
+        {"paket": [{"productName": "€" * 5 + "\U0001f600" * 3}]},
+        ensure_ascii=False,
+    ).encode()
+    assert read(document, "paket", chunk_size) == json.loads(document)["paket"]
+
+
+@pytest.mark.unit
+def test_items_returned_as_soon_as_complete() -> None:
+    reader = ArrayItemReader("paket")
+    assert reader.feed(b'{"paket": [{"a": 1}, {"a"') == [{"a": 1}]
+    assert reader.feed(b": 2}, 3") == [{"a": 2}]
+    # A number at the end of a chunk may continue in the next one
+    assert reader.feed(b"4") == []
+    assert reader.feed(b"]}") == [34]
+    assert reader.close() == []
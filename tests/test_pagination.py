@@ -0,0 +1,121 @@
+"""Page packing, cursors and page expiry of the paginated output mode."""
+
+import pytest
+from app.custom.exceptions import ParserCursorNotFoundError
+from app.services.digipos import parser_service
+from app.services.digipos.cache import LRUCache
+from app.services.digipos.factory_parser import ProcessorFactory
+from app.services.digipos.pagination import (
+    decode_cursor,
+    encode_cursor,
+    page_at,
+    paginate,
+)
+from app.services.digipos.parser_service import (
+    get_page,
+    paginate_category_response_async,
+)
+from scripts.synthetic_catalog import build_catalog
+
+
+class Clock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    """Fresh page cache on a fake clock."""
+    clock = Clock()
+    monkeypatch.setattr(
+        parser_service,
+        "PAGE_CACHE",
+        LRUCache(16, ttl=parser_service.RESULT_CACHE_TTL, clock=clock),
+    )
+    return clock
+
+
+@pytest.mark.unit
+def test_pages_hold_whole_products_within_the_size() -> None:
+    parts = ["aaaa\n", "bb\n", "cccccc\n", "d\n", "eeeeeeeeeeee\n", "f\n"]
+
+    pages = paginate(parts, 10)
+
+    assert pages == ("aaaa\nbb\n", "cccccc\nd\n", "eeeeeeeeeeee\n", "f\n")
+    assert "".join(pages) == "".join(parts)
+    # Only a product longer than the size by itself exceeds it
+    assert [len(page) <= 10 for page in pages] == [True, True, False, True]
+
+
+@pytest.mark.unit
+def test_empty_output_is_one_empty_page() -> None:
+    assert paginate([], 10) == ("",)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("index", [0, 1, 12345])
+def test_cursor_round_trip(index: int) -> None:
+    assert decode_cursor(encode_cursor("0123abcd", index)) == ("0123abcd", index)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("cursor", ["", "!!!", "bm9jb2xvbg", "YTp4", "YTotMQ", "//8"])
+def test_malformed_cursor_is_rejected(cursor: str) -> None:
+    assert decode_cursor(cursor) is None
+
+
+@pytest.mark.unit
+def test_page_at_links_pages_in_order() -> None:
+    pages = ("a", "b", "c")
+
+    first = page_at(pages, "id", 0)
+    last = page_at(pages, "id", 2)
+
+    assert (first.text, first.number, first.count) == ("a", 1, 3)
+    assert decode_cursor(first.next_cursor) == ("id", 1)
+    assert last.next_cursor is None
+    assert page_at(pages, "id", 3) is None
+
+
+@pytest.mark.unit
+async def test_cursors_walk_the_pages_in_order(clock: Clock) -> None:  # noqa: ARG001
+    body = build_catalog("DATA", 3000, seed=5)
+    processor = ProcessorFactory.get_processor("DATA")
+
+    page = await paginate_category_response_async("DATA", body)
+    texts = [page.text]
+    while page.next_cursor is not None:
+        page = get_page(page.next_cursor)
+        texts.append(page.text)
+
+    assert page.count == len(texts) > 1
+    assert [len(text) <= processor.max_chars for text in texts] == [True] * len(texts)
+    assert "".join(texts) == "".join(processor.process_pages(body))
+
+
+@pytest.mark.unit
+async def test_cursor_expires_with_its_pages(clock: Clock) -> None:
+    body = build_catalog("DATA", 3000, seed=6)
+    page = await paginate_category_response_async("DATA", body)
+    assert get_page(page.next_cursor).number == 2
+
+    clock.now += parser_service.RESULT_CACHE_TTL
+
+    with pytest.raises(ParserCursorNotFoundError):
+        get_page(page.next_cursor)
+
+
+@pytest.mark.unit
+async def test_cursor_past_the_last_page_is_rejected(clock: Clock) -> None:  # noqa: ARG001
+    page = await paginate_category_response_async(
+        "DATA", build_catalog("DATA", 3000, seed=7)
+    )
+    result_id, _ = decode_cursor(page.next_cursor)
+
+    with pytest.raises(ParserCursorNotFoundError):
+        get_page(encode_cursor(result_id, page.count))
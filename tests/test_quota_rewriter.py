@@ -0,0 +1,135 @@
+"""QuotaRewriter must match the legacy per-processor ``re.sub`` chain."""
+
+import random
+import re
+
+import pytest
+from app.services.digipos.quota_rewriter import (
+    OPTIMIZATION_TIERS,
+    TIER_ABBREVIATE,
+    TIER_NONE,
+    TIER_STRIP,
+    QuotaRewriter,
+)
+
+
+def legacy_clean_metadata(quota: str, strip_metadata: bool) -> str:
+    """Old ``clean_quota_metadata`` ("/" parsing only on the full tier)."""
+    cleaned_items = []
+    for item in quota.split(","):
+        item = item.strip()
+        if strip_metadata and "/" in item:
+            cleaned_items.append(item.split("/", 1)[1].strip())
+        elif item:
+            cleaned_items.append(item)
+    return ",".join(cleaned_items)
+
+
+def legacy_optimize_quota(quota: str, tier: int = TIER_STRIP) -> str:
+    """Old ``optimize_quota`` chain, with the steps above ``tier`` left out."""
+    if not quota or tier == TIER_NONE:
+        return quota
+    optimized = legacy_clean_metadata(quota, tier >= TIER_STRIP)
+    optimized = re.sub(r"\b(\d+)\s+Days\b", r"\1D", optimized, flags=re.IGNORECASE)
+    optimized = re.sub(
+        r"\b(\d+(?:\.\d+)?)\s+GB\b", r"\1GB", optimized, flags=re.IGNORECASE
+    )
+    optimized = re.sub(r"\b(\d+)\s+MB\b", r"\1MB", optimized, flags=re.IGNORECASE)
+    if tier >= TIER_ABBREVIATE:
+        optimized = re.sub(r"\bInternet\b", "Net", optimized, flags=re.IGNORECASE)
+        optimized = re.sub(r"\bNasional\b", "Nas", optimized, flags=re.IGNORECASE)
+    optimized = re.sub(r"\s+", " ", optimized)
+    optimized = re.sub(r",\s*,", ",", optimized)
+    optimized = re.sub(r"^\s*,\s*", "", optimized)
+    optimized = re.sub(r"\s*,\s*$", "", optimized)
+    return optimized.strip()
+
+
+CASES = [
+    "",
+    "Internet 30 Days 12 GB Nasional",
+    "DATA National/Internet 30 Days 12 GB Nasional, Local Data/Kuota Lokal Internet 30 Days 43 GB",
+    "1.5 GB, 500 MB, 2.25 gb",
+    "12 GBps, 30 Dayss, 5 MBs",
+    "7 days, 30 DAYS, 1 Days",
+    "Unlimited",
+    "Unlimited Internet 30 Days",
+    "Kuota (Internet (Nasional) 10 GB) 30 Days",
+    "Bonus/(Chat (WA, Line)) 1 GB",
+    " , ,Internet ,, 1 GB ,",
+    "a/b/c 3 MB",
+    "InternetNasional 4 GB",
+    "1.5.2 GB",
+    "10\xa0GB\tInternet\n30 Days",
+]
+
+WORDS = [
+    "Internet",
+    "internet",
+    "Nasional",
+    "NASIONAL",
+    "Unlimited",
+    "Kuota",
+    "Lokal",
+    "(Chat",
+    "Apps)",
+    "Days",
+    "GB",
+    "MB",
+    "gb",
+    "x/y",
+    "/",
+    "(",
+    ")",
+]
+SEPARATORS = [" ", "  ", "\t", "\xa0", ",", ", ", " ,", ",,", "/"]
+
+
+def random_quota(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.randint(0, 12)):
+        roll = rng.random()
+        if roll < 0.35:
+            number = str(rng.randint(0, 999))
+            if rng.random() < 0.3:
+                number += f".{rng.randint(0, 99)}"
+            parts.append(number + rng.choice(SEPARATORS[:4]) + rng.choice(WORDS))
+        else:
+            parts.append(rng.choice(WORDS))
+        parts.append(rng.choice(SEPARATORS))
+    return "".join(parts)
+
+
+@pytest.fixture(scope="module")
+def rewriter() -> QuotaRewriter:
+    return QuotaRewriter(cache_entries=0)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("tier", (TIER_NONE, *OPTIMIZATION_TIERS))
+@pytest.mark.parametrize("quota", CASES)
+def test_rewrite_matches_legacy_chain(
+    rewriter: QuotaRewriter, quota: str, tier: int
+) -> None:
+    assert rewriter.rewrite(quota, tier) == legacy_optimize_quota(quota, tier)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("tier", OPTIMIZATION_TIERS)
+def test_rewrite_matches_legacy_chain_randomized(
+    rewriter: QuotaRewriter, tier: int
+) -> None:
+    rng = random.Random(20240601 + tier)
+    for _ in range(5000):
+        quota = random_quota(rng)
+        assert rewriter.rewrite(quota, tier) == legacy_optimize_quota(quota, tier), (
+            quota
+        )
+
+
+@pytest.mark.unit
+def test_memoized_rewrite_matches_uncached(rewriter: QuotaRewriter) -> None:
+    cached = QuotaRewriter()
+    for quota in CASES * 2:
+        for tier in OPTIMIZATION_TIERS:
+            assert cached.rewrite(quota, tier) == rewriter.rewrite(quota, tier)
@@ -0,0 +1,171 @@
+"""Token buckets and circuit breakers of the upstream account scheduler."""
+
+import asyncio
+
+import pytest
+from app.custom.exceptions import (
+    UpstreamBusyError,
+    UpstreamCircuitOpenError,
+    UpstreamGenericError,
+)
+from app.services.digipos.scheduler import AccountScheduler, CircuitBreaker, TokenBucket
+
+THRESHOLD = 3
+COOLDOWN = 10.0
+
+
+class Clock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock() -> Clock:
+    return Clock()
+
+
+@pytest.fixture
+def scheduler(clock: Clock) -> AccountScheduler:
+    scheduler = AccountScheduler(max_wait=0.0, clock=clock)
+    scheduler.add("alpha", rate_limit=1000.0, burst=1000)
+    scheduler.configure_breaker(THRESHOLD, COOLDOWN)
+    return scheduler
+
+
+async def fail(scheduler: AccountScheduler) -> None:
+    with pytest.raises(UpstreamGenericError):
+        async with scheduler.acquire("alpha"):
+            raise UpstreamGenericError
+
+
+@pytest.mark.unit
+def test_token_bucket_limits_rate() -> None:
+    bucket = TokenBucket(rate=2.0, capacity=3, now=0.0)
+    for _ in range(3):
+        assert bucket.ready(0.0)
+        bucket.take()
+    assert not bucket.ready(0.0)
+    assert bucket.wait_time(0.0) == pytest.approx(0.5)
+    assert not bucket.ready(0.4)
+    assert bucket.ready(0.5)
+    bucket.take()
+    # Idle time refills up to the capacity only
+    assert bucket.ready(100.0)
+    assert bucket.tokens == 3
+
+
+@pytest.mark.unit
+def test_breaker_closed_open_half_open_closed() -> None:
+    breaker = CircuitBreaker()
+    for _ in range(THRESHOLD - 1):
+        assert not breaker.failure(0.0, THRESHOLD, COOLDOWN)
+    assert breaker.state(0.0) == "closed"
+    assert breaker.failure(0.0, THRESHOLD, COOLDOWN)
+    assert breaker.state(0.0) == "open"
+    assert not breaker.allows(COOLDOWN - 1)
+
+    assert breaker.state(COOLDOWN) == "half_open"
+    assert breaker.allows(COOLDOWN)
+    # A failed probe opens it for another cooldown
+    assert breaker.failure(COOLDOWN, THRESHOLD, COOLDOWN, probe=True)
+    assert breaker.state(COOLDOWN) == "open"
+    assert breaker.state(2 * COOLDOWN) == "half_open"
+
+    breaker.success()
+    assert breaker.state(2 * COOLDOWN) == "closed"
+    assert breaker.trips == 2
+
+
+@pytest.mark.unit
+def test_breaker_ignores_failures_admitted_before_it_opened() -> None:
+    breaker = CircuitBreaker()
+    for _ in range(THRESHOLD):
+        breaker.failure(0.0, THRESHOLD, COOLDOWN)
+
+    # Late failures of calls started while closed: no re-trip, same cooldown
+    assert not breaker.failure(5.0, THRESHOLD, COOLDOWN)
+    assert not breaker.failure(COOLDOWN + 1, THRESHOLD, COOLDOWN)
+    assert breaker.open_until == COOLDOWN
+    assert breaker.trips == 1
+    assert breaker.state(COOLDOWN + 1) == "half_open"
+
+
+@pytest.mark.unit
+async def test_scheduler_breaker_cycle(
+    scheduler: AccountScheduler, clock: Clock
+) -> None:
+    for _ in range(THRESHOLD):
+        await fail(scheduler)
+    with pytest.raises(UpstreamCircuitOpenError):
+        async with scheduler.acquire("alpha"):
+            pass
+
+    clock.advance(COOLDOWN)
+    async with scheduler.acquire("alpha"):
+        # Half-open: only the probe goes through
+        with pytest.raises(UpstreamCircuitOpenError):
+            async with scheduler.acquire("alpha"):
+                pass
+    assert scheduler.stats()["circuit_open"] == 0
+    async with scheduler.acquire("alpha"):
+        pass
+    assert scheduler.stats()["breaker_trips"] == 1
+
+
+@pytest.mark.unit
+async def test_scheduler_in_flight_failure_does_not_extend_cooldown(
+    scheduler: AccountScheduler, clock: Clock
+) -> None:
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_call() -> None:
+        async with scheduler.acquire("alpha"):
+            started.set()
+            await release.wait()
+            raise UpstreamGenericError
+
+    in_flight = asyncio.create_task(slow_call())
+    await started.wait()
+    for _ in range(THRESHOLD):
+        await fail(scheduler)
+
+    clock.advance(COOLDOWN - 1)
+    release.set()
+    with pytest.raises(UpstreamGenericError):
+        await in_flight
+
+    clock.advance(1)
+    async with scheduler.acquire("alpha"):
+        pass
+    assert scheduler.stats()["breaker_trips"] == 1
+    assert scheduler.stats()["circuit_open"] == 0
+
+
+@pytest.mark.unit
+async def test_scheduler_rate_limits_each_account(clock: Clock) -> None:
+    scheduler = AccountScheduler(max_wait=0.0, clock=clock)
+    scheduler.add("alpha", rate_limit=2.0, burst=2)
+    for _ in range(2):
+        async with scheduler.acquire("alpha", wait=False):
+            pass
+    with pytest.raises(UpstreamBusyError):
+        async with scheduler.acquire("alpha", wait=False):
+            pass
+    # Waiting would take 0.5s, longer than max_wait
+    with pytest.raises(UpstreamBusyError):
+        async with scheduler.acquire("alpha"):
+            pass
+    assert scheduler.stats()["rejected"] == 1
+
+    clock.advance(0.5)
+    async with scheduler.acquire("alpha", wait=False) as account:
+        assert account == "alpha"
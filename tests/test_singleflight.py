@@ -0,0 +1,128 @@
+"""SingleFlight coalescing, error fan-out and cancellation."""
+
+import asyncio
+
+import pytest
+from app.services.digipos.singleflight import SingleFlight
+
+
+class Upstream:
+    """Counts calls and blocks each one until ``release`` is set."""
+
+    def __init__(self, result: object = "catalog", error: Exception | None = None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self) -> object:
+        self.calls += 1
+        self.started.set()
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+@pytest.mark.unit
+async def test_concurrent_callers_share_one_call() -> None:
+    flight = SingleFlight("test")
+    upstream = Upstream()
+
+    waiters = [asyncio.create_task(flight.run("DATA", upstream)) for _ in range(10)]
+    await upstream.started.wait()
+    upstream.release.set()
+
+    assert await asyncio.gather(*waiters) == ["catalog"] * 10
+    assert upstream.calls == 1
+    assert flight.stats() == {
+        "in_flight": 0,
+        "calls": 1,
+        "coalesced": 9,
+        "cancelled": 0,
+    }
+
+
+@pytest.mark.unit
+async def test_different_keys_do_not_coalesce() -> None:
+    flight = SingleFlight("test")
+    upstream = Upstream()
+
+    waiters = [asyncio.create_task(flight.run(key, upstream)) for key in ("DATA", "VF")]
+    await upstream.started.wait()
+    upstream.release.set()
+
+    await asyncio.gather(*waiters)
+    assert upstream.calls == 2
+
+
+@pytest.mark.unit
+async def test_every_waiter_sees_the_leaders_exception() -> None:
+    flight = SingleFlight("test")
+    upstream = Upstream(error=RuntimeError("upstream down"))
+
+    waiters = [asyncio.create_task(flight.run("DATA", upstream)) for _ in range(5)]
+    await upstream.started.wait()
+    upstream.release.set()
+
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert {str(r) for r in results} == {"upstream down"}
+    assert upstream.calls == 1
+    assert len(flight) == 0
+
+
+@pytest.mark.unit
+async def test_next_call_after_completion_starts_fresh() -> None:
+    flight = SingleFlight("test")
+    first = Upstream(error=RuntimeError("upstream down"))
+    first.release.set()
+    with pytest.raises(RuntimeError):
+        await flight.run("DATA", first)
+
+    second = Upstream(result="fresh")
+    second.release.set()
+    assert await flight.run("DATA", second) == "fresh"
+    assert second.calls == 1
+
+
+@pytest.mark.unit
+async def test_cancelling_the_leader_leaves_followers_running() -> None:
+    flight = SingleFlight("test")
+    upstream = Upstream()
+
+    leader = asyncio.create_task(flight.run("DATA", upstream))
+    await upstream.started.wait()
+    followers = [asyncio.create_task(flight.run("DATA", upstream)) for _ in range(3)]
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    upstream.release.set()
+
+    results = await asyncio.wait_for(asyncio.gather(*followers), timeout=1)
+    assert results == ["catalog"] * 3
+    assert upstream.calls == 1
+    assert flight.cancelled == 0
+
+
+@pytest.mark.unit
+async def test_last_waiter_leaving_cancels_the_call() -> None:
+    flight = SingleFlight("test")
+    upstream = Upstream()
+
+    waiters = [asyncio.create_task(flight.run("DATA", upstream)) for _ in range(2)]
+    await upstream.started.wait()
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+
+    assert flight.cancelled == 1
+    assert len(flight) == 0
+
+    # The key is free at once: a new caller does not join the dying call
+    fresh = Upstream(result="fresh")
+    fresh.release.set()
+    assert await asyncio.wait_for(flight.run("DATA", fresh), timeout=1) == "fresh"